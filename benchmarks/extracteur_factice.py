@@ -0,0 +1,121 @@
+"""
+Extracteur factice pour les benchmarks hors ligne
+
+Les informations renvoyées viennent des dictionnaires enregistrés dans
+fixtures/ ; les URLs des formats pointent vers le serveur local
+(serveur_local.MediaServer). Le reste du traitement (sélection des formats,
+téléchargement, hooks) est celui de yt-dlp, sans aucun accès réseau externe.
+
+    https://www.youtube.com/watch?v=bench000001           -> vidéo
+    https://www.youtube.com/playlist?list=PLbench_1_12    -> 12 vidéos à partir de bench000001
+"""
+
+import copy
+import json
+import os
+import re
+import time
+import urllib.parse
+
+import yt_dlp
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def fill(value, **fields):
+    """Remplace les {champs} dans toutes les chaînes d'une structure JSON"""
+    if isinstance(value, str):
+        for key, field in fields.items():
+            value = value.replace('{' + key + '}', str(field))
+        return value
+    if isinstance(value, list):
+        return [fill(item, **fields) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, **fields) for key, item in value.items()}
+    return value
+
+
+def video_id(number):
+    """ID de vidéo factice de 11 caractères, comme sur YouTube"""
+    return f'bench{number:06d}'
+
+
+def playlist_id(first, count):
+    return f'PLbench_{first}_{count}'
+
+
+class FakeCatalog:
+    """Catalogue des vidéos et playlists factices servies par un MediaServer
+
+    `scale` multiplie la taille de tous les formats (1.0 = tailles des
+    fixtures, ~3,7 Mo pour le format progressif 18). `latency` simule le
+    temps de réponse de YouTube à chaque extraction, en secondes.
+    """
+
+    def __init__(self, server, scale=1.0, latency=0.0):
+        self.server = server
+        self.scale = scale
+        self.latency = latency
+        self.extractions = 0
+        self._video = load_fixture('video.json')
+        self._playlist = load_fixture('playlist.json')
+
+    def video_url(self, number):
+        return f'https://www.youtube.com/watch?v={video_id(number)}'
+
+    def playlist_url(self, first, count):
+        return f'https://www.youtube.com/playlist?list={playlist_id(first, count)}'
+
+    def lookup(self, url):
+        """Dictionnaire d'informations brut pour une URL, ou None"""
+        self.extractions += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+        if 'list' in query:
+            match = re.fullmatch(r'PLbench_(\d+)_(\d+)', query['list'][0])
+            if match:
+                return self.playlist_info(int(match.group(1)), int(match.group(2)))
+        elif 'v' in query and re.fullmatch(r'bench\d{6}', query['v'][0]):
+            return self.video_info(query['v'][0])
+        return None
+
+    def video_info(self, vid):
+        info = fill(copy.deepcopy(self._video), id=vid)
+        for fmt in info['formats']:
+            fmt['filesize'] = int(fmt['filesize'] * self.scale)
+            fmt['url'] = self.server.media_url(f"{vid}/{fmt['format_id']}.{fmt['ext']}", fmt['filesize'])
+            fmt['protocol'] = 'http'
+        return info
+
+    def playlist_info(self, first, count):
+        template = copy.deepcopy(self._playlist)
+        entry = template.pop('entry')
+        info = fill(template, id=playlist_id(first, count))
+        info['entries'] = [fill(entry, video_id=video_id(number)) for number in range(first, first + count)]
+        info['playlist_count'] = count
+        return info
+
+
+def fake_youtubedl_class(catalog):
+    """Sous-classe de YoutubeDL dont l'extraction lit le catalogue factice"""
+
+    class FakeYoutubeDL(yt_dlp.YoutubeDL):
+        def extract_info(self, url, download=True, ie_key=None, extra_info=None,
+                         process=True, force_generic_extractor=False):
+            info = catalog.lookup(url)
+            if info is None:
+                self.report_error(f'URL inconnue du catalogue factice : {url}')
+                return None
+            if not process:
+                return info
+            return self.process_ie_result(info, download, extra_info or {})
+
+    return FakeYoutubeDL
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Benchmarks hors ligne du moteur de téléchargement
+
+Un serveur HTTP local sert des médias synthétiques et un extracteur factice
+renvoie des informations enregistrées : aucun accès réseau n'est nécessaire.
+Les résultats sont comparés à benchmarks/baseline.json ; le code de sortie
+vaut 1 si une mesure régresse au-delà de la tolérance.
+
+    python benchmarks/run.py
+    python benchmarks/run.py --only download_single,progress
+    python benchmarks/run.py --update-baseline
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moteur import (DownloadIndex, DownloadJob, JobJournal, MetadataCache, MetricsSink,  # noqa: E402
+                    PlaylistSnapshots, ProgressBus, YouTubeDownloader, YoutubeDLPool)
+from extracteur_factice import FakeCatalog, fake_youtubedl_class  # noqa: E402
+from serveur_local import MediaServer  # noqa: E402
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+MIB = 1024 * 1024
+
+# Débit par connexion du serveur local : imite un serveur distant et rend
+# les mesures de parallélisme indépendantes de la vitesse de la boucle locale
+SERVER_RATE = 16 * MIB
+
+
+class Bench:
+    """Environnement d'un scénario : dossier temporaire, catalogue et moteur isolés"""
+
+    def __init__(self, server, scale=1.0, latency=0.0, **downloader_options):
+        self.tmp = tempfile.mkdtemp(prefix='ytdp-bench-')
+        self.catalog = FakeCatalog(server, scale=scale, latency=latency)
+        self.downloader = YouTubeDownloader(
+            metadata_cache=MetadataCache(os.path.join(self.tmp, 'metadata.json')),
+            download_index=DownloadIndex(os.path.join(self.tmp, 'downloads.sqlite3')),
+            metrics_sink=MetricsSink(None, None),
+            temp_dir=os.path.join(self.tmp, 'temp'),
+            journal=JobJournal(os.path.join(self.tmp, 'jobs.sqlite3')),
+            playlist_snapshots=PlaylistSnapshots(os.path.join(self.tmp, 'playlists.sqlite3')),
+            ydl_pool=YoutubeDLPool(ydl_class=fake_youtubedl_class(self.catalog)),
+            **downloader_options
+        )
+        self.downloader.ydl_opts_base.update({'quiet': True, 'noprogress': True, 'no_warnings': True})
+        self.output = os.path.join(self.tmp, 'telechargements')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.downloader.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def downloaded_files(path):
+    """Fichiers téléchargés, hors dossiers cachés (stockage par contenu)"""
+    for root, dirs, names in os.walk(path):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in names:
+            yield os.path.join(root, name)
+
+
+def folder_size(path):
+    return sum(os.path.getsize(name) for name in downloaded_files(path))
+
+
+def bench_video_info(server, repeat):
+    """Latence de get_video_info() : extraction à froid, puis réponse du cache"""
+    cold, warm = [], []
+    with Bench(server) as bench:
+        for number in range(1, repeat * 10 + 1):
+            url = bench.catalog.video_url(number)
+            cold.append(timed(bench.downloader.get_video_info, url)[0])
+            warm.append(timed(bench.downloader.get_video_info, url)[0])
+    return {
+        'video_info_cold_ms': statistics.median(cold) * 1000,
+        'video_info_warm_ms': statistics.median(warm) * 1000,
+    }
+
+
+def bench_download_single(server, repeat):
+    """Débit de download() pour un fichier de 16 Mo, en une et quatre connexions"""
+    results = {}
+    for name, connections in (('download_single_mbps', 0), ('download_segmented_mbps', 4)):
+        rates = []
+        for attempt in range(repeat):
+            with Bench(server, scale=16 * MIB / 3904500, segmented_connections=connections) as bench:
+                elapsed, ok = timed(bench.downloader.download, bench.catalog.video_url(attempt + 1),
+                                    bench.output, quality='360p', format_type='mp4')
+                if not ok:
+                    raise RuntimeError(f"{name} : échec du téléchargement")
+                rates.append(folder_size(bench.output) / MIB / elapsed)
+        results[name] = statistics.median(rates)
+    return results
+
+
+def bench_playlist(server, repeat):
+    """Durée de download() d'une playlist de 12 vidéos de 2 Mo (3 workers)"""
+    durations = []
+    for _ in range(repeat):
+        with Bench(server, scale=2 * MIB / 3904500, max_workers=3) as bench:
+            elapsed, ok = timed(bench.downloader.download, bench.catalog.playlist_url(1, 12),
+                                bench.output, quality='360p', format_type='mp4', is_playlist=True)
+            if not ok or len(list(downloaded_files(bench.output))) != 12:
+                raise RuntimeError("playlist : téléchargement incomplet")
+            durations.append(elapsed)
+    return {'playlist_12_seconds': statistics.median(durations)}
+
+
+def bench_sync(server, repeat):
+    """Nouveau passage sur une playlist de 50 vidéos déjà téléchargée : complet, puis synchronisé"""
+    full, synced = [], []
+    for _ in range(repeat):
+        with Bench(server, scale=64 * 1024 / 3904500, max_workers=4) as bench:
+            url = bench.catalog.playlist_url(1, 50)
+            options = dict(quality='360p', format_type='mp4', is_playlist=True)
+            if not bench.downloader.download(url, bench.output, sync=True, **options):
+                raise RuntimeError("synchronisation : échec du premier passage")
+            full.append(timed(bench.downloader.download, url, bench.output, **options)[0])
+            elapsed, ok = timed(bench.downloader.download, url, bench.output, sync=True, **options)
+            if not ok or len(list(downloaded_files(bench.output))) != 50:
+                raise RuntimeError("synchronisation : téléchargement incomplet")
+            synced.append(elapsed)
+    return {
+        'playlist_50_repeat_seconds': statistics.median(full),
+        'playlist_50_sync_seconds': statistics.median(synced),
+    }
+
+
+def bench_concurrency(server, repeat):
+    """Débit total de 8 vidéos de 4 Mo selon le nombre de workers"""
+    results = {}
+    for workers in (1, 2, 4):
+        rates = []
+        for _ in range(repeat):
+            with Bench(server, scale=4 * MIB / 3904500, max_workers=workers) as bench:
+                urls = [bench.catalog.video_url(number) for number in range(1, 9)]
+                start = time.perf_counter()
+                jobs = bench.downloader.submit_many(urls, bench.output, quality='360p', format_type='mp4')
+                bench.downloader.scheduler.wait(jobs)
+                elapsed = time.perf_counter() - start
+                if any(job.status != DownloadJob.FINISHED for job in jobs):
+                    raise RuntimeError(f"parallélisme ({workers}) : échec d'un téléchargement")
+                rates.append(folder_size(bench.output) / MIB / elapsed)
+        results[f'concurrency_{workers}_mbps'] = statistics.median(rates)
+    results['concurrency_speedup_4'] = results['concurrency_4_mbps'] / results['concurrency_1_mbps']
+    return results
+
+
+def bench_progress(server, repeat):
+    """Coût du chemin de progression (hook du job, bus, lecture par l'interface)"""
+    events = 20000
+    update_costs, drain_costs = [], []
+    for _ in range(repeat):
+        bus = ProgressBus()
+        channel = bus.subscribe()
+        job = DownloadJob('https://www.youtube.com/watch?v=bench000001', '.',
+                          progress_callback=lambda d: None)
+        job.progress_bus = bus
+        d = {'status': 'downloading', 'filename': 'video.mp4', 'tmpfilename': 'video.mp4.part',
+             'total_bytes': events * 1024, 'speed': 1e6, 'eta': 1, 'info_dict': {}}
+
+        start = time.perf_counter()
+        drain_time = 0.0
+        for index in range(events):
+            d['downloaded_bytes'] = index * 1024
+            job.update_progress(d)
+            if index % 100 == 99:
+                # L'interface relit le canal toutes les 50 ms : ~100 événements par lecture
+                drain_start = time.perf_counter()
+                channel.drain()
+                drain_time += time.perf_counter() - drain_start
+        total = time.perf_counter() - start
+        update_costs.append((total - drain_time) / events)
+        drain_costs.append(drain_time / events)
+    return {
+        'progress_update_us': statistics.median(update_costs) * 1e6,
+        'progress_drain_us': statistics.median(drain_costs) * 1e6,
+    }
+
+
+BENCHMARKS = {
+    'video_info': bench_video_info,
+    'download_single': bench_download_single,
+    'playlist': bench_playlist,
+    'sync': bench_sync,
+    'concurrency': bench_concurrency,
+    'progress': bench_progress,
+}
+
+# Sens d'amélioration de chaque mesure
+HIGHER_IS_BETTER = ('_mbps', '_speedup_4')
+
+
+def is_higher_better(metric):
+    return metric.endswith(HIGHER_IS_BETTER)
+
+
+def compare(results, baseline, tolerance):
+    """Compare aux valeurs de référence, renvoie la liste des régressions"""
+    regressions = []
+    for metric, value in results.items():
+        reference = baseline.get(metric)
+        if not reference:
+            continue
+        ratio = value / reference
+        if is_higher_better(metric):
+            regressed = ratio < 1 - tolerance
+        else:
+            regressed = ratio > 1 + tolerance
+        if regressed:
+            regressions.append((metric, value, reference))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne du moteur de téléchargement")
+    parser.add_argument('--only', default=None,
+                        help=f"scénarios à lancer, séparés par des virgules ({', '.join(BENCHMARKS)})")
+    parser.add_argument('--repeat', type=int, default=3, help="répétitions par mesure (médiane, défaut : 3)")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="fichier de référence")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="écart toléré avant de signaler une régression (défaut : 0.25)")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="enregistrer les résultats comme nouvelle référence")
+    parser.add_argument('--output', default=None, help="écrire les résultats dans ce fichier JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Scénario inconnu : {', '.join(unknown)}")
+        return 2
+
+    results = {}
+    with MediaServer(rate_per_connection=SERVER_RATE) as server:
+        for name in names:
+            print(f"▶ {name}...", flush=True)
+            # Les messages du moteur ne doivent pas polluer le rapport
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                results.update(BENCHMARKS[name](server, args.repeat))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+
+    print()
+    print(f"{'mesure':<28}{'valeur':>12}{'référence':>12}{'écart':>9}")
+    for metric, value in results.items():
+        reference = baseline.get(metric)
+        delta = f"{(value / reference - 1) * 100:+.1f}%" if reference else ''
+        reference_text = f"{reference:.3f}" if reference else '-'
+        print(f"{metric:<28}{value:>12.3f}{reference_text:>12}{delta:>9}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'results': results}, f, indent=2)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'results': baseline}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nRéférence mise à jour : {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRégressions :")
+        for metric, value, reference in regressions:
+            print(f"  {metric}: {value:.3f} (référence {reference:.3f})")
+        return 1
+    print("\nAucune régression.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
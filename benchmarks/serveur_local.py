@@ -0,0 +1,159 @@
+"""
+Serveur HTTP local servant des fichiers média synthétiques (benchmarks hors ligne)
+
+Toute URL de la forme /media/<nom>?size=<octets> renvoie un contenu
+déterministe de la taille demandée, avec prise en charge des plages
+(Range) et un débit plafonné par connexion pour imiter un serveur distant.
+"""
+
+import hashlib
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+BLOCK_SIZE = 64 * 1024
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        # Un client qui interrompt son transfert (pause, annulation) n'est pas une erreur
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        parts = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parts.query)
+        if not parts.path.startswith('/media/') or 'size' not in query:
+            self.send_error(404)
+            return
+
+        size = int(query['size'][0])
+        start, end = 0, size - 1
+        status = 200
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), size - 1)
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        self.server.requests += 1
+        if send_body:
+            self._send_range(self.server.block_for(parts.path), start, end)
+
+    def _send_range(self, block, start, end):
+        rate = self.server.rate_per_connection
+        began = time.perf_counter()
+        sent = 0
+        position = start
+        try:
+            while position <= end:
+                offset = position % BLOCK_SIZE
+                length = min(BLOCK_SIZE - offset, end - position + 1)
+                self.wfile.write(block[offset:offset + length])
+                position += length
+                sent += length
+                if rate:
+                    # Débit plafonné : on attend que le temps écoulé rattrape les octets envoyés
+                    delay = sent / rate - (time.perf_counter() - began)
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class MediaServer:
+    """Serveur de médias synthétiques lancé dans un thread, sur un port libre"""
+
+    def __init__(self, rate_per_connection=None, host='127.0.0.1', port=0):
+        self.httpd = ThreadingHTTPServer((host, port), MediaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.rate_per_connection = rate_per_connection
+        self.httpd.requests = 0
+        self.httpd.block_for = self._block_for
+        self._blocks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def media_url(self, name, size):
+        return f'{self.url}/media/{name}?size={size}'
+
+    def _block_for(self, path):
+        # Un bloc pseudo-aléatoire par fichier, répété sur toute sa longueur
+        with self._lock:
+            block = self._blocks.get(path)
+            if block is None:
+                seed = hashlib.sha256(path.encode('utf-8')).digest()
+                block = b''.join(hashlib.sha256(seed + i.to_bytes(4, 'big')).digest()
+                                 for i in range(BLOCK_SIZE // 32))
+                self._blocks[path] = block
+            return block
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='serveur-media', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serveur de médias synthétiques pour les benchmarks")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate', type=float, default=None, help="débit par connexion en Mo/s")
+    args = parser.parse_args()
+
+    server = MediaServer(rate_per_connection=args.rate * 1024 * 1024 if args.rate else None, port=args.port)
+    print(f"Serveur de médias sur {server.url} (ex. {server.media_url('test.mp4', 1024 * 1024)})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
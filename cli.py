@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+YouTube Downloader Pro - Mode ligne de commande
+Télécharge une liste d'URLs sans interface graphique et écrit la progression
+et les résultats au format JSON lines sur la sortie standard.
+
+    python cli.py urls.txt -o telechargements -j 4
+    cat urls.txt | python cli.py - -f mp3
+    python cli.py --resume
+    python cli.py chaines.txt -p --sync --track-removals
+"""
+
+import argparse
+import contextlib
+import json
+import re
+import sys
+import threading
+import time
+
+from moteur import YouTubeDownloader
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Télécharge des vidéos YouTube sans interface graphique (sortie JSON lines)"
+    )
+    parser.add_argument('source', nargs='?', default=None,
+                        help="fichier contenant une URL par ligne ('-' ou absent : entrée standard, "
+                             "sauf avec --resume)")
+    parser.add_argument('-o', '--output', default='telechargements',
+                        help="dossier de destination (défaut : telechargements)")
+    parser.add_argument('-q', '--quality', default='720p',
+                        help="qualité vidéo : 144p ... 2160p ou best (défaut : 720p)")
+    parser.add_argument('-f', '--format', dest='format_type', default='mp4',
+                        choices=['mp4', 'webm', 'mp3', 'm4a'], help="format de sortie (défaut : mp4)")
+    parser.add_argument('-p', '--playlist', action='store_true',
+                        help="traiter les URLs comme des playlists complètes")
+    parser.add_argument('--sync', action='store_true',
+                        help="avec -p : ne télécharger que les vidéos apparues depuis la dernière synchronisation")
+    parser.add_argument('--track-removals', action='store_true',
+                        help="avec --sync : énumérer toute la playlist et noter les vidéos retirées")
+    parser.add_argument('-j', '--jobs', type=int, default=3,
+                        help="nombre de téléchargements simultanés (défaut : 3)")
+    parser.add_argument('--segments', type=int, default=0,
+                        help="connexions par fichier pour les formats progressifs (défaut : désactivé)")
+    parser.add_argument('--max-size', type=float, default=None,
+                        help="taille maximale estimée par fichier, en Mo (défaut : aucune)")
+    parser.add_argument('--prefer-efficient', action='store_true',
+                        help="préférer les codecs compacts (AV1/VP9) à qualité égale")
+    parser.add_argument('--limit-rate', type=parse_rate, default=None,
+                        help="débit total maximal, en octets/s avec suffixe K, M ou G (ex. 2M)")
+    parser.add_argument('--limit-rate-job', type=parse_rate, default=None,
+                        help="débit maximal par téléchargement (même syntaxe)")
+    parser.add_argument('--retries', type=int, default=4,
+                        help="nouveaux essais après une erreur temporaire (429, délai dépassé...) (défaut : 4)")
+    parser.add_argument('--store', action='store_true',
+                        help="stockage par contenu (.store) : une vidéo déjà téléchargée ailleurs "
+                             "devient un lien ; les fichiers fusionnés, convertis ou téléchargés sans "
+                             "--segments sont relus une fois pour calculer leur empreinte")
+    parser.add_argument('--resume', action='store_true',
+                        help="reprendre les téléchargements laissés inachevés par une session précédente")
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help="intervalle en secondes entre deux lignes de progression (défaut : 1)")
+    return parser.parse_args(argv)
+
+
+def parse_rate(value):
+    """Convertit un débit comme '500K' ou '2.5M' en octets/s"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kKmMgG]?)i?[bBoO]?\s*', value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"débit invalide : {value}")
+    multiplier = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}[match.group(2).lower()]
+    return int(float(match.group(1)) * multiplier)
+
+
+def read_urls(source):
+    """Lit les URLs (une par ligne, lignes vides et commentaires # ignorés)"""
+    if source in (None, '-'):
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+
+
+class JsonLinesWriter:
+    """Écrit un objet JSON par ligne sur un flux, de façon atomique entre threads"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps(dict(fields, event=event, time=time.time()), ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+def run(args, out):
+    """Lance les téléchargements et renvoie le code de sortie"""
+    writer = JsonLinesWriter(out)
+    urls = read_urls(args.source) if args.source or not args.resume else []
+    if not urls and not args.resume:
+        writer.emit('summary', total=0, finished=0, failed=0, skipped=0)
+        return 0
+
+    downloader = YouTubeDownloader(max_workers=args.jobs, segmented_connections=args.segments,
+                                   max_filesize_mb=args.max_size,
+                                   prefer_efficient_codecs=args.prefer_efficient,
+                                   max_rate=args.limit_rate, max_rate_per_job=args.limit_rate_job,
+                                   content_store=args.store, max_retries=args.retries)
+    downloader.ydl_opts_base.update({'quiet': True, 'noprogress': True})
+    channel = downloader.progress_bus.subscribe()
+
+    jobs = []
+    submit_errors = []
+
+    def submit_all():
+        if args.resume:
+            resumed = downloader.resume_interrupted()
+            for job in resumed:
+                # Sans interface pour les relancer, les jobs en pause reprennent aussi
+                downloader.resume(job)
+            jobs.extend(resumed)
+        for url in urls:
+            try:
+                if args.playlist and args.sync:
+                    result = downloader.sync_playlist(url, args.output, args.quality, args.format_type,
+                                                      track_removals=args.track_removals)
+                    jobs.extend(result['jobs'])
+                    writer.emit('sync', url=url, added=result['added'], retried=result['retried'],
+                                removed=result['removed'], enumerated=result['enumerated'],
+                                stopped_early=result['stopped_early'])
+                    continue
+                jobs.extend(downloader.submit(url, args.output, args.quality, args.format_type,
+                                              args.playlist))
+            except Exception as e:
+                submit_errors.append(url)
+                writer.emit('error', url=url, error=str(e))
+
+    submitter = threading.Thread(target=submit_all, daemon=True)
+    submitter.start()
+
+    reported = set()
+    jobs_by_id = {}
+
+    def job_metrics(job_id):
+        if job_id not in jobs_by_id:
+            jobs_by_id.update((job.id, job) for job in list(downloader.scheduler.jobs))
+        job = jobs_by_id.get(job_id)
+        return job.metrics.to_dict() if job else None
+
+    def flush_events():
+        allocation = downloader.bandwidth.allocation()
+        for state in channel.drain():
+            if state['status'] in ('finished', 'failed', 'cancelled'):
+                if state['id'] not in reported:
+                    reported.add(state['id'])
+                    writer.emit('result', metrics=job_metrics(state['id']), **state)
+            else:
+                writer.emit('progress', bandwidth=allocation.get(state['id']), **state)
+
+    try:
+        while submitter.is_alive() or downloader.scheduler.active_jobs():
+            time.sleep(args.interval)
+            flush_events()
+        flush_events()
+    finally:
+        downloader.close()
+
+    finished = [job for job in jobs if job.status == 'finished']
+    failed = [job for job in jobs if job.status == 'failed']
+    writer.emit('summary', total=len(jobs), finished=len(finished), failed=len(failed),
+                skipped=sum(1 for job in finished if job.skipped), errors=len(submit_errors))
+    return 1 if failed or submit_errors else 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # stdout est réservé au JSON : les messages du moteur et de yt-dlp vont sur stderr
+    out = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        return run(args, out)
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -1,12 +1,292 @@
 import customtkinter as ctk
 import tkinter as tk
+import tkinter.font as tkfont
 from tkinter import filedialog, messagebox
 import threading
+import queue
 import os
-from moteur import YouTubeDownloader
+from moteur import YouTubeDownloader, preload_yt_dlp
 import webbrowser
 
 
+# Période de rafraîchissement de la progression (~20 images/s)
+PROGRESS_REFRESH_MS = 50
+
+# Limites de débit total proposées (octets/s)
+RATE_LIMITS = {
+    "Illimité": None,
+    "500 Ko/s": 500 * 1024,
+    "1 Mo/s": 1024 ** 2,
+    "2 Mo/s": 2 * 1024 ** 2,
+    "5 Mo/s": 5 * 1024 ** 2,
+    "10 Mo/s": 10 * 1024 ** 2,
+}
+
+# Nature des échecs définitifs (RetryPolicy du moteur)
+FAILURE_LABELS = {
+    'throttled': "refusé par le serveur (trop de requêtes)",
+    'transient': "erreur réseau persistante",
+    'permanent': "vidéo ou format indisponible",
+}
+
+# Vue de playlist : vidéos par page et taille des miniatures
+PLAYLIST_PAGE_SIZE = 8
+PLAYLIST_THUMBNAIL_SIZE = (96, 54)
+INFO_THUMBNAIL_SIZE = (240, 135)
+
+# File d'attente : hauteur d'une ligne (pixels), lignes visibles et colonnes (clé, titre, largeur ; 0 = reste)
+QUEUE_ROW_HEIGHT = 24
+QUEUE_VISIBLE_ROWS = 10
+QUEUE_COLUMNS = (
+    ('title', "Titre", 0),
+    ('status', "Statut", 100),
+    ('progress', "Progression", 110),
+    ('speed', "Vitesse", 90),
+    ('eta', "Restant", 70),
+    ('size', "Taille", 90),
+)
+
+STATUS_LABELS = {
+    'queued': "En attente",
+    'running': "En cours",
+    'paused': "En pause",
+    'processing': "Conversion",
+    'finished': "Terminé",
+    'failed': "Échec",
+    'cancelled': "Annulé",
+}
+STATUS_COLORS = {'finished': "#51cf66", 'failed': "#ff6b6b", 'paused': "#fcc419", 'cancelled': "gray60"}
+DONE_STATUSES = ('finished', 'failed', 'cancelled')
+
+
+class JobQueueView:
+    """Liste virtualisée des jobs (plusieurs milliers sans ralentir la boucle Tk)
+
+    Le canevas ne contient que les lignes visibles, créées une fois et
+    réaffectées au défilement : seul leur texte change. Chaque job ne coûte
+    que son dernier état, et un événement ne redessine que s'il touche une
+    ligne affichée ou ajoute un job.
+    """
+
+    def __init__(self, master, format_size, on_action=None):
+        self.format_size = format_size
+        self.on_action = on_action
+        self.order = []   # ids des jobs, dans l'ordre d'arrivée
+        self.states = {}  # id -> dernier état publié
+        self.top = 0
+        self.selected = None
+        self.slots = []
+        self.rendered = []
+        self.width = 0
+
+        self.frame = ctk.CTkFrame(master, fg_color="transparent")
+        self.font = tkfont.Font(size=10)
+        self.char_width = max(self.font.measure("n"), 1)
+        self.canvas = tk.Canvas(self.frame, height=QUEUE_ROW_HEIGHT * (QUEUE_VISIBLE_ROWS + 1),
+                                bg="gray17", highlightthickness=0)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self.frame, command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.menu = tk.Menu(self.canvas, tearoff=0)
+        self.menu.add_command(label="⏸ Pause", command=lambda: self.action('pause'))
+        self.menu.add_command(label="▶ Reprendre", command=lambda: self.action('resume'))
+        self.menu.add_command(label="✖ Annuler", command=lambda: self.action('cancel'))
+
+        self.canvas.bind("<Configure>", self.layout)
+        self.canvas.bind("<Button-1>", self.select)
+        self.canvas.bind("<Button-3>", self.show_menu)
+        # Le défilement reste dans la liste au lieu de faire défiler la fenêtre
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        self.canvas.bind("<Button-4>", lambda e: self.scroll(-1))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll(1))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    @property
+    def visible_rows(self):
+        return len(self.slots)
+
+    def column_positions(self):
+        """Abscisse et largeur de chaque colonne pour la largeur actuelle du canevas"""
+        fixed = sum(width for _, _, width in QUEUE_COLUMNS)
+        x = 0
+        positions = {}
+        for key, _, width in QUEUE_COLUMNS:
+            width = width or max(self.width - fixed, 100)
+            positions[key] = (x, width)
+            x += width
+        return positions
+
+    def layout(self, event):
+        """(Re)crée les lignes visibles à la taille du canevas"""
+        self.width = event.width
+        rows = max(event.height // QUEUE_ROW_HEIGHT - 1, 1)
+        self.canvas.delete("all")
+        self.slots = []
+        positions = self.column_positions()
+
+        for key, title, _ in QUEUE_COLUMNS:
+            x, _ = positions[key]
+            self.canvas.create_text(x + 6, QUEUE_ROW_HEIGHT // 2, text=title, anchor="w",
+                                    fill="gray60", font=self.font)
+
+        for slot in range(rows):
+            top = (slot + 1) * QUEUE_ROW_HEIGHT
+            middle = top + QUEUE_ROW_HEIGHT // 2
+            x, width = positions['progress']
+            items = {
+                'background': self.canvas.create_rectangle(0, top, self.width, top + QUEUE_ROW_HEIGHT,
+                                                           width=0, fill="gray17"),
+                'track': self.canvas.create_rectangle(x + 6, middle - 4, x + width - 6, middle + 4,
+                                                      width=0, fill="gray30"),
+                'bar': self.canvas.create_rectangle(x + 6, middle - 4, x + 6, middle + 4,
+                                                    width=0, fill="#1f6aa5"),
+            }
+            for key, _, _ in QUEUE_COLUMNS:
+                if key != 'progress':
+                    items[key] = self.canvas.create_text(positions[key][0] + 6, middle, anchor="w",
+                                                         fill="gray90", font=self.font)
+            # Affichées au premier job qui occupe la ligne
+            for item in items.values():
+                self.canvas.itemconfigure(item, state="hidden")
+            self.slots.append(items)
+        self.rendered = [None] * rows
+        self.redraw()
+
+    def row_values(self, state):
+        """Textes d'une ligne, tronqués à la largeur de leur colonne"""
+        status = state['status']
+        label = STATUS_LABELS.get(status, status)
+        if status == 'queued' and state.get('retry_at'):
+            label = f"Essai {state['attempts'] + 1}"
+        running = status == 'running'
+        total = state.get('total_bytes')
+        eta = state.get('eta')
+        return {
+            'title': state.get('title') or state['url'],
+            'status': label,
+            'progress': 1.0 if status == 'finished' else state.get('progress') or 0.0,
+            'speed': f"{self.format_size(state['speed'])}/s" if running and state.get('speed') else "",
+            'eta': f"{int(eta) // 60}:{int(eta) % 60:02d}" if running and eta is not None else "",
+            'size': self.format_size(total) if total else "",
+        }
+
+    def truncate(self, text, width):
+        limit = max((width - 12) // self.char_width, 1)
+        return text if len(text) <= limit else text[:limit - 1] + "…"
+
+    def redraw(self):
+        """Met à jour les lignes visibles qui ont changé depuis le dernier dessin"""
+        count = len(self.order)
+        self.top = max(0, min(self.top, count - self.visible_rows))
+        positions = self.column_positions()
+
+        for slot, items in enumerate(self.slots):
+            index = self.top + slot
+            if index >= count:
+                if self.rendered[slot] is not None:
+                    for item in items.values():
+                        self.canvas.itemconfigure(item, state="hidden")
+                    self.rendered[slot] = None
+                continue
+
+            job_id = self.order[index]
+            state = self.states[job_id]
+            key = (job_id, job_id == self.selected, state['status'], state.get('progress'),
+                   state.get('speed'), state.get('eta'), state.get('total_bytes'), state.get('title'))
+            if self.rendered[slot] == key:
+                continue
+            if self.rendered[slot] is None:
+                for item in items.values():
+                    self.canvas.itemconfigure(item, state="normal")
+            self.rendered[slot] = key
+
+            values = self.row_values(state)
+            if job_id == self.selected:
+                background = "#1f538d"
+            else:
+                background = "gray20" if index % 2 else "gray17"
+            self.canvas.itemconfigure(items['background'], fill=background)
+            x, width = positions['progress']
+            x0, y0, _, y1 = self.canvas.coords(items['track'])
+            self.canvas.coords(items['bar'], x0, y0, x0 + (width - 12) * values['progress'], y1)
+            for column, text in values.items():
+                if column != 'progress':
+                    self.canvas.itemconfigure(items[column], text=self.truncate(text, positions[column][1]))
+            self.canvas.itemconfigure(items['status'], fill=STATUS_COLORS.get(state['status'], "gray90"))
+
+        if count:
+            self.scrollbar.set(self.top / count, min((self.top + self.visible_rows) / count, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def update(self, events):
+        """Applique les états publiés par le moteur (un par job, déjà fusionnés)"""
+        changed = False
+        visible = set(self.order[self.top:self.top + self.visible_rows])
+        for event in events:
+            job_id = event['id']
+            if job_id not in self.states:
+                self.order.append(job_id)
+                changed = True
+            elif job_id in visible:
+                changed = True
+            self.states[job_id] = event
+        if changed:
+            self.redraw()
+
+    def remove_done(self):
+        """Retire les jobs terminés, échoués ou annulés de la liste"""
+        self.order = [job_id for job_id in self.order if self.states[job_id]['status'] not in DONE_STATUSES]
+        self.states = {job_id: self.states[job_id] for job_id in self.order}
+        if self.selected not in self.states:
+            self.selected = None
+        self.rendered = [None] * len(self.slots)
+        self.redraw()
+
+    def counts(self):
+        """Nombre de jobs par statut"""
+        counts = {}
+        for state in self.states.values():
+            counts[state['status']] = counts.get(state['status'], 0) + 1
+        return counts
+
+    def yview(self, *args):
+        """Commandes de la barre de défilement ('moveto' fraction ou 'scroll' n unités/pages)"""
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.order))
+        elif args[0] == 'scroll':
+            step = self.visible_rows if args[2] == 'pages' else 1
+            self.top += int(args[1]) * step
+        self.redraw()
+
+    def scroll(self, units):
+        self.top += units * 3
+        self.redraw()
+        return "break"
+
+    def job_at(self, y):
+        index = self.top + int(y // QUEUE_ROW_HEIGHT) - 1
+        if y < QUEUE_ROW_HEIGHT or index >= len(self.order):
+            return None
+        return self.order[index]
+
+    def select(self, event):
+        self.selected = self.job_at(event.y)
+        self.redraw()
+
+    def show_menu(self, event):
+        self.select(event)
+        if self.selected is not None:
+            self.menu.tk_popup(event.x_root, event.y_root)
+
+    def action(self, name):
+        if self.selected is not None and self.on_action:
+            self.on_action(name, self.selected)
+
+
 class YouTubeDownloaderGUI:
     def __init__(self):
         # Configuration de CustomTkinter
@@ -25,6 +305,8 @@ class YouTubeDownloaderGUI:
         self.quality_var = tk.StringVar(value="720p")
         self.format_var = tk.StringVar(value="mp4")
         self.playlist_var = tk.BooleanVar()
+        self.sync_var = tk.BooleanVar()
+        self.rate_var = tk.StringVar(value="Illimité")
 
         # Créer le dossier de téléchargement s'il n'existe pas
         os.makedirs(self.download_path.get(), exist_ok=True)
@@ -32,9 +314,34 @@ class YouTubeDownloaderGUI:
         # Initialiser le moteur de téléchargement
         self.downloader = YouTubeDownloader()
 
+        # Dernière analyse, réutilisée au téléchargement pour éviter une seconde extraction
+        self.current_analysis = None
+
+        # Progression : les threads du moteur publient, la boucle Tk consomme
+        self.progress_channel = self.downloader.progress_bus.subscribe()
+        self.job_states = {}
+        self.ui_calls = queue.SimpleQueue()
+
+        # Annulation du téléchargement en cours (arrête aussi l'énumération d'une playlist)
+        self.stop_event = threading.Event()
+
+        # Arrêt de l'analyse détaillée d'une playlist (relancée à chaque analyse)
+        self.analysis_stop = threading.Event()
+
         # Créer l'interface
         self.create_widgets()
 
+        # Fermeture de la fenêtre : le moteur termine proprement sa session (journal, bases)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        self.root.after(PROGRESS_REFRESH_MS, self.poll_events)
+
+        # yt-dlp est chargé en arrière-plan une fois la fenêtre affichée
+        self.root.after(100, preload_yt_dlp)
+
+        # Téléchargements laissés inachevés par une session précédente
+        self.root.after(500, self.offer_resume)
+
     def create_widgets(self):
         # Frame principal avec scrollbar
         main_frame = ctk.CTkScrollableFrame(self.root, corner_radius=10)
@@ -54,7 +361,7 @@ class YouTubeDownloaderGUI:
 
         url_title = ctk.CTkLabel(
             url_frame,
-            text="📎 URL de la vidéo ou playlist",
+            text="📎 URL de la vidéo ou playlist (plusieurs URLs séparées par des espaces)",
             font=ctk.CTkFont(size=18, weight="bold")
         )
         url_title.pack(pady=(20, 10))
@@ -62,7 +369,7 @@ class YouTubeDownloaderGUI:
         self.url_entry = ctk.CTkEntry(
             url_frame,
             textvariable=self.url_var,
-            placeholder_text="Collez l'URL YouTube ici...",
+            placeholder_text="Collez une ou plusieurs URLs YouTube ici...",
             height=40,
             font=ctk.CTkFont(size=14)
         )
@@ -126,6 +433,28 @@ class YouTubeDownloaderGUI:
         )
         playlist_check.grid(row=1, column=0, columnspan=2, sticky="w", pady=10)
 
+        # Playlist déjà téléchargée : seulement les vidéos ajoutées depuis
+        sync_check = ctk.CTkCheckBox(
+            options_grid,
+            text="Nouvelles vidéos seulement",
+            variable=self.sync_var,
+            font=ctk.CTkFont(size=14)
+        )
+        sync_check.grid(row=2, column=0, columnspan=2, sticky="w", pady=10)
+
+        # Débit maximal, appliqué immédiatement aux téléchargements en cours
+        rate_label = ctk.CTkLabel(options_grid, text="Débit max:", font=ctk.CTkFont(size=14))
+        rate_label.grid(row=1, column=2, sticky="w", padx=(20, 10), pady=10)
+
+        rate_menu = ctk.CTkOptionMenu(
+            options_grid,
+            variable=self.rate_var,
+            values=list(RATE_LIMITS),
+            command=self.change_rate_limit,
+            width=100
+        )
+        rate_menu.grid(row=1, column=3, sticky="w", pady=10)
+
         # Section Dossier de destination
         path_frame = ctk.CTkFrame(main_frame, corner_radius=15)
         path_frame.pack(fill="x", pady=(0, 20))
@@ -201,12 +530,59 @@ class YouTubeDownloaderGUI:
         )
         info_title.pack(pady=(20, 10))
 
+        info_container = ctk.CTkFrame(self.info_frame, fg_color="transparent")
+        info_container.pack(fill="x", padx=20, pady=(0, 20))
+
+        # Miniature de la vidéo analysée
+        self.thumbnail_label = ctk.CTkLabel(info_container, text="", width=INFO_THUMBNAIL_SIZE[0])
+        self.thumbnail_label.pack(side="left", padx=(0, 10))
+
         self.info_text = ctk.CTkTextbox(
-            self.info_frame,
+            info_container,
             height=150,
             font=ctk.CTkFont(size=12)
         )
-        self.info_text.pack(fill="x", padx=20, pady=(0, 20))
+        self.info_text.pack(side="left", fill="x", expand=True)
+
+        # Vidéos de la playlist analysée, page par page (affichée après l'analyse)
+        self.playlist_frame = ctk.CTkFrame(main_frame, corner_radius=15)
+        self.playlist_videos = {}
+        self.playlist_total = 0
+        self.playlist_page = 0
+
+        playlist_header = ctk.CTkFrame(self.playlist_frame, fg_color="transparent")
+        playlist_header.pack(fill="x", padx=20, pady=(15, 10))
+
+        playlist_title = ctk.CTkLabel(
+            playlist_header,
+            text="📋 Vidéos de la playlist",
+            font=ctk.CTkFont(size=18, weight="bold")
+        )
+        playlist_title.pack(side="left")
+
+        self.next_page_btn = ctk.CTkButton(playlist_header, text="▶", width=40,
+                                           command=lambda: self.show_playlist_page(self.playlist_page + 1))
+        self.next_page_btn.pack(side="right")
+
+        self.page_label = ctk.CTkLabel(playlist_header, text="", font=ctk.CTkFont(size=12))
+        self.page_label.pack(side="right", padx=10)
+
+        self.prev_page_btn = ctk.CTkButton(playlist_header, text="◀", width=40,
+                                           command=lambda: self.show_playlist_page(self.playlist_page - 1))
+        self.prev_page_btn.pack(side="right")
+
+        # Lignes créées une fois et réutilisées d'une page à l'autre
+        self.playlist_rows = []
+        for _ in range(PLAYLIST_PAGE_SIZE):
+            row = ctk.CTkFrame(self.playlist_frame, fg_color="transparent")
+            row.pack(fill="x", padx=20, pady=2)
+            thumbnail = ctk.CTkLabel(row, text="", width=PLAYLIST_THUMBNAIL_SIZE[0],
+                                     height=PLAYLIST_THUMBNAIL_SIZE[1])
+            thumbnail.pack(side="left", padx=(0, 10))
+            text = ctk.CTkLabel(row, text="", anchor="w", justify="left", font=ctk.CTkFont(size=12))
+            text.pack(side="left", fill="x", expand=True)
+            self.playlist_rows.append((thumbnail, text))
+        ctk.CTkFrame(self.playlist_frame, fg_color="transparent", height=10).pack()
 
         # Barre de progression
         self.progress_frame = ctk.CTkFrame(main_frame, corner_radius=15)
@@ -219,6 +595,22 @@ class YouTubeDownloaderGUI:
         )
         progress_title.pack(pady=(20, 10))
 
+        # Contrôles du téléchargement en cours
+        controls = ctk.CTkFrame(self.progress_frame, fg_color="transparent")
+        controls.pack(pady=(0, 10))
+
+        self.pause_btn = ctk.CTkButton(controls, text="⏸ Pause", command=self.pause_download,
+                                       width=110, state="disabled")
+        self.pause_btn.pack(side="left", padx=5)
+
+        self.resume_btn = ctk.CTkButton(controls, text="▶ Reprendre", command=self.resume_download,
+                                        width=110, state="disabled")
+        self.resume_btn.pack(side="left", padx=5)
+
+        self.cancel_btn = ctk.CTkButton(controls, text="✖ Annuler", command=self.cancel_download,
+                                        width=110, state="disabled", fg_color="#c92a2a", hover_color="#e03131")
+        self.cancel_btn.pack(side="left", padx=5)
+
         self.progress_bar = ctk.CTkProgressBar(self.progress_frame, height=20)
         self.progress_bar.pack(fill="x", padx=20, pady=(0, 10))
         self.progress_bar.set(0)
@@ -230,6 +622,30 @@ class YouTubeDownloaderGUI:
         )
         self.progress_label.pack(pady=(0, 20))
 
+        # File d'attente de tous les téléchargements de la session
+        queue_frame = ctk.CTkFrame(main_frame, corner_radius=15)
+        queue_frame.pack(fill="x", pady=(0, 20))
+
+        queue_header = ctk.CTkFrame(queue_frame, fg_color="transparent")
+        queue_header.pack(fill="x", padx=20, pady=(15, 10))
+
+        queue_title = ctk.CTkLabel(
+            queue_header,
+            text="🗂️ File d'attente",
+            font=ctk.CTkFont(size=18, weight="bold")
+        )
+        queue_title.pack(side="left")
+
+        clear_btn = ctk.CTkButton(queue_header, text="🧹 Retirer les terminés", width=160,
+                                  command=self.clear_finished)
+        clear_btn.pack(side="right")
+
+        self.queue_label = ctk.CTkLabel(queue_header, text="", font=ctk.CTkFont(size=12))
+        self.queue_label.pack(side="right", padx=10)
+
+        self.queue_view = JobQueueView(queue_frame, self.downloader.format_size, on_action=self.job_action)
+        self.queue_view.pack(fill="x", padx=20, pady=(0, 20))
+
         # Footer
         footer_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
         footer_frame.pack(fill="x", pady=(20, 0))
@@ -246,7 +662,8 @@ class YouTubeDownloaderGUI:
         """Colle l'URL depuis le presse-papiers"""
         try:
             clipboard_content = self.root.clipboard_get()
-            self.url_var.set(clipboard_content)
+            # Une URL par ligne dans le presse-papiers : une seule ligne dans le champ
+            self.url_var.set(" ".join(clipboard_content.split()))
         except:
             pass
 
@@ -261,12 +678,229 @@ class YouTubeDownloaderGUI:
         self.info_text.delete("1.0", "end")
         self.info_text.insert("1.0", text)
 
+    def show_thumbnail(self, label, url, size):
+        """Affiche une miniature dans label : immédiatement si elle est en mémoire, sinon à son arrivée"""
+        label.thumbnail_url = url
+        if not url:
+            label.configure(image=None)
+            label.image = None
+            return
+
+        thumbnails = self.downloader.thumbnails
+        image = thumbnails.get_cached(url, size)
+        if image is not None:
+            self.set_thumbnail(label, url, image)
+            return
+
+        label.configure(image=None)
+        label.image = None
+        future = thumbnails.load(url, size)
+        future.add_done_callback(lambda f: self.call_in_ui(self.set_thumbnail, label, url, f.result()))
+
+    def set_thumbnail(self, label, url, image):
+        """Pose l'image décodée, sauf si le label affiche entre-temps une autre vidéo"""
+        if image is None or getattr(label, 'thumbnail_url', None) != url:
+            return
+        ctk_image = ctk.CTkImage(light_image=image, dark_image=image, size=image.size)
+        label.configure(image=ctk_image)
+        label.image = ctk_image
+
+    def reset_playlist_view(self, total=0):
+        """Vide la vue de playlist ; la masque si total vaut 0"""
+        self.playlist_videos = {}
+        self.playlist_total = total
+        self.playlist_page = 0
+        if total:
+            self.playlist_frame.pack(fill="x", pady=(0, 20), after=self.info_frame)
+            self.show_playlist_page(0)
+        else:
+            self.playlist_frame.pack_forget()
+
+    def add_playlist_video(self, video):
+        """Ajoute une vidéo analysée à la vue (rafraîchit la page si elle y figure)"""
+        self.playlist_videos[video['index']] = video
+        if video['index'] > self.playlist_total:
+            self.playlist_total = video['index']
+        first = self.playlist_page * PLAYLIST_PAGE_SIZE + 1
+        if first <= video['index'] < first + PLAYLIST_PAGE_SIZE:
+            self.show_playlist_page(self.playlist_page)
+        else:
+            self.update_page_controls()
+
+    def show_playlist_page(self, page):
+        """Affiche une page de la playlist et précharge les miniatures de la suivante"""
+        pages = max(1, -(-self.playlist_total // PLAYLIST_PAGE_SIZE))
+        page = max(0, min(page, pages - 1))
+        self.playlist_page = page
+        first = page * PLAYLIST_PAGE_SIZE + 1
+
+        for offset, (thumbnail, text) in enumerate(self.playlist_rows):
+            index = first + offset
+            video = self.playlist_videos.get(index)
+            if index > self.playlist_total:
+                text.configure(text="")
+                self.show_thumbnail(thumbnail, None, PLAYLIST_THUMBNAIL_SIZE)
+            elif video is None:
+                text.configure(text=f"{index}. …")
+                self.show_thumbnail(thumbnail, None, PLAYLIST_THUMBNAIL_SIZE)
+            else:
+                line = f"{index}. {video['title']}\n⏱️ {video['duration']}"
+                if video.get('size'):
+                    line += f"  •  {self.downloader.format_size(video['size'])}"
+                text.configure(text=line)
+                if getattr(thumbnail, 'thumbnail_url', None) != video.get('thumbnail'):
+                    self.show_thumbnail(thumbnail, video.get('thumbnail'), PLAYLIST_THUMBNAIL_SIZE)
+
+        # La page suivante s'affichera sans attendre le réseau
+        for index in range(first + PLAYLIST_PAGE_SIZE, first + 2 * PLAYLIST_PAGE_SIZE):
+            video = self.playlist_videos.get(index)
+            if video and video.get('thumbnail'):
+                self.downloader.thumbnails.load(video['thumbnail'], PLAYLIST_THUMBNAIL_SIZE)
+
+        self.update_page_controls()
+
+    def update_page_controls(self):
+        pages = max(1, -(-self.playlist_total // PLAYLIST_PAGE_SIZE))
+        self.page_label.configure(text=f"Page {self.playlist_page + 1}/{pages}")
+        self.prev_page_btn.configure(state="normal" if self.playlist_page > 0 else "disabled")
+        self.next_page_btn.configure(state="normal" if self.playlist_page < pages - 1 else "disabled")
+
     def update_progress(self, value, text=""):
         """Met à jour la barre de progression"""
         self.progress_bar.set(value)
         if text:
             self.progress_label.configure(text=text)
-        self.root.update_idletasks()
+
+    def change_rate_limit(self, choice):
+        """Change la limite de débit total"""
+        self.downloader.bandwidth.set_rate(RATE_LIMITS.get(choice))
+
+    def bandwidth_text(self):
+        """Débit mesuré et part allouée de chaque téléchargement actif"""
+        allocation = self.downloader.bandwidth.allocation()
+        if not allocation:
+            return ""
+        parts = []
+        for job_id, alloc in sorted(allocation.items()):
+            text = f"#{job_id} {alloc['rate'] / 1024 ** 2:.1f}"
+            if alloc['share']:
+                text += f"/{alloc['share'] / 1024 ** 2:.1f}"
+            parts.append(text + " Mo/s")
+        return "Débit: " + " · ".join(parts)
+
+    def set_controls_enabled(self, enabled):
+        state = "normal" if enabled else "disabled"
+        for button in (self.pause_btn, self.resume_btn, self.cancel_btn):
+            button.configure(state=state)
+
+    def pause_download(self):
+        """Met en pause les vidéos en attente ou en cours"""
+        for job_id, state in list(self.job_states.items()):
+            if state['status'] in ('queued', 'running'):
+                self.downloader.pause(job_id)
+
+    def resume_download(self):
+        """Reprend les vidéos en pause depuis leurs fichiers partiels"""
+        for job_id, state in list(self.job_states.items()):
+            if state['status'] == 'paused':
+                self.downloader.resume(job_id)
+
+    def cancel_download(self):
+        """Annule le téléchargement en cours et supprime les fichiers temporaires"""
+        self.stop_event.set()
+        self.update_progress(self.progress_bar.get(), "Annulation...")
+        for job_id, state in list(self.job_states.items()):
+            if state['status'] in ('queued', 'running', 'paused'):
+                self.downloader.cancel(job_id)
+
+    def job_action(self, action, job_id):
+        """Pause, reprise ou annulation d'un job choisi dans la file d'attente"""
+        {'pause': self.downloader.pause, 'resume': self.downloader.resume,
+         'cancel': self.downloader.cancel}[action](job_id)
+
+    def clear_finished(self):
+        self.queue_view.remove_done()
+        self.update_queue_label()
+
+    def update_queue_label(self):
+        counts = self.queue_view.counts()
+        total = sum(counts.values())
+        parts = [f"{total} vidéo(s)"]
+        for status in ('running', 'queued', 'paused', 'failed'):
+            if counts.get(status):
+                parts.append(f"{counts[status]} {STATUS_LABELS[status].lower()}")
+        self.queue_label.configure(text=" · ".join(parts) if total else "")
+
+    def call_in_ui(self, func, *args, **kwargs):
+        """Demande l'exécution de func dans le thread de Tk (depuis n'importe quel thread)"""
+        self.ui_calls.put((func, args, kwargs))
+
+    def poll_events(self):
+        """Applique, à cadence fixe, les appels en attente et la progression fusionnée"""
+        # La progression d'abord : un job publie son état final avant de rendre la main
+        events = self.progress_channel.drain()
+        if events:
+            for event in events:
+                self.job_states[event['id']] = event
+                # Jobs d'une playlist planifiés juste avant l'annulation
+                if self.stop_event.is_set() and event['status'] in ('queued', 'running', 'paused'):
+                    self.downloader.cancel(event['id'])
+            self.queue_view.update(events)
+            self.update_queue_label()
+            self.show_job_progress()
+
+        while True:
+            try:
+                func, args, kwargs = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args, **kwargs)
+
+        self.root.after(PROGRESS_REFRESH_MS, self.poll_events)
+
+    def show_job_progress(self):
+        """Affiche la progression globale des jobs du téléchargement en cours"""
+        states = list(self.job_states.values())
+        if not states:
+            return
+
+        done = sum(1 for s in states if s['status'] in ('finished', 'failed', 'cancelled'))
+        running = [s for s in states if s['status'] == 'running']
+        paused = [s for s in states if s['status'] == 'paused']
+
+        if len(states) == 1:
+            state = states[0]
+            if state['status'] == 'finished':
+                self.update_progress(1.0, "Téléchargement terminé !")
+            elif state['status'] == 'processing':
+                self.update_progress(1.0, "Conversion en cours...")
+            elif state['status'] == 'paused':
+                self.update_progress(state['progress'], f"En pause: {state['progress'] * 100:.1f}%")
+            elif state['total_bytes']:
+                text = f"Téléchargement: {state['progress'] * 100:.1f}%"
+                bandwidth = self.bandwidth_text()
+                if bandwidth:
+                    text += f"\n{bandwidth}"
+                self.update_progress(state['progress'], text)
+            elif state['status'] == 'running':
+                self.update_progress(0.5, "Téléchargement en cours...")
+            elif state['status'] == 'queued' and state.get('retry_at'):
+                self.update_progress(state['progress'], f"Nouvel essai ({state['attempts'] + 1}) après une erreur...")
+            return
+
+        # Plusieurs vidéos : moyenne des progressions, et vidéos terminées
+        value = sum(1.0 if s['status'] in ('finished', 'failed', 'cancelled') else s['progress']
+                    for s in states) / len(states)
+        text = f"Téléchargement: {value * 100:.1f}% ({done}/{len(states)} vidéos"
+        if running:
+            text += f", {len(running)} en cours"
+        if paused:
+            text += f", {len(paused)} en pause"
+        text += ")"
+        bandwidth = self.bandwidth_text()
+        if bandwidth:
+            text += f"\n{bandwidth}"
+        self.update_progress(value, text)
 
     def analyze_video(self):
         """Analyse la vidéo/playlist YouTube"""
@@ -274,17 +908,31 @@ class YouTubeDownloaderGUI:
         if not url:
             messagebox.showerror("Erreur", "Veuillez entrer une URL YouTube valide")
             return
+        if len(url.split()) > 1:
+            messagebox.showerror("Erreur", "Veuillez analyser une seule URL à la fois")
+            return
+
+        # Une nouvelle analyse interrompt le détail de la playlist précédente
+        self.analysis_stop.set()
+        self.analysis_stop = stop_event = threading.Event()
+
+        self.analyze_btn.configure(state="disabled", text="🔄 Analyse...")
+        self.update_info("Analyse de la vidéo en cours...\n")
+        self.show_thumbnail(self.thumbnail_label, None, INFO_THUMBNAIL_SIZE)
+        self.reset_playlist_view()
+        is_playlist = self.playlist_var.get()
+        quality = self.quality_var.get()
+        format_type = self.format_var.get()
 
         def analyze_thread():
             try:
-                self.analyze_btn.configure(state="disabled", text="🔄 Analyse...")
-                self.update_info("Analyse de la vidéo en cours...\n")
-
-                info = self.downloader.get_video_info(url, self.playlist_var.get())
+                analysis = self.downloader.analyze(url, is_playlist)
+                self.current_analysis = analysis
+                info = analysis.summary if analysis else None
 
                 if info:
                     info_text = f"✅ Analyse terminée !\n\n"
-                    if self.playlist_var.get() and 'playlist_count' in info:
+                    if is_playlist and 'playlist_count' in info:
                         info_text += f"📋 Playlist: {info.get('playlist_title', 'Sans titre')}\n"
                         info_text += f"📊 Nombre de vidéos: {info['playlist_count']}\n\n"
                         info_text += f"🎬 Première vidéo: {info.get('title', 'Titre non disponible')}\n"
@@ -300,17 +948,63 @@ class YouTubeDownloaderGUI:
                         for fmt in info['formats'][:5]:  # Afficher les 5 premiers formats
                             info_text += f"  • {fmt}\n"
 
-                    self.update_info(info_text)
+                    self.call_in_ui(self.update_info, info_text)
+                    self.call_in_ui(self.show_thumbnail, self.thumbnail_label, info.get('thumbnail'),
+                                    INFO_THUMBNAIL_SIZE)
+
+                    if is_playlist and 'playlist_count' in info:
+                        # Le détail vidéo par vidéo peut être long : le bouton reste utilisable
+                        # (une nouvelle analyse l'interrompt)
+                        self.call_in_ui(self.analyze_btn.configure, state="normal", text="🔍 Analyser la vidéo")
+                        self.analyze_playlist_details(url, info_text, quality, format_type, stop_event)
                 else:
-                    self.update_info("❌ Impossible d'analyser cette URL.\nVérifiez que l'URL est valide et accessible.")
+                    self.call_in_ui(self.update_info,
+                                    "❌ Impossible d'analyser cette URL.\n"
+                                    "Vérifiez que l'URL est valide et accessible.")
 
             except Exception as e:
-                self.update_info(f"❌ Erreur lors de l'analyse:\n{str(e)}")
+                self.call_in_ui(self.update_info, f"❌ Erreur lors de l'analyse:\n{str(e)}")
             finally:
-                self.analyze_btn.configure(state="normal", text="🔍 Analyser la vidéo")
+                self.call_in_ui(self.analyze_btn.configure, state="normal", text="🔍 Analyser la vidéo")
 
         threading.Thread(target=analyze_thread, daemon=True).start()
 
+    def analyze_playlist_details(self, url, info_text, quality, format_type, stop_event):
+        """Complète l'analyse d'une playlist vidéo par vidéo (depuis le thread d'analyse)
+
+        S'arrête dès que `stop_event` est levé ; l'affichage n'est alors plus modifié.
+        """
+        lock = threading.Lock()
+        progress = {'done': 0, 'seconds': 0, 'size': 0}
+        count = self.current_analysis.summary.get('playlist_count') if self.current_analysis else None
+        self.call_in_ui(self.reset_playlist_view, count if isinstance(count, int) else 1)
+
+        def on_entry(video):
+            if stop_event.is_set():
+                return
+            self.call_in_ui(self.add_playlist_video, dict(video))
+            with lock:
+                progress['done'] += 1
+                progress['seconds'] += video.get('duration_seconds') or 0
+                progress['size'] += video.get('size') or 0
+                text = (f"{info_text}\n🔎 Détails: {progress['done']} vidéos analysées, "
+                        f"durée {self.downloader.format_duration(progress['seconds'])}, "
+                        f"taille estimée {self.downloader.format_size(progress['size'])}")
+            self.call_in_ui(self.update_info, text)
+
+        details = self.downloader.analyze_playlist(url, quality, format_type, on_entry=on_entry,
+                                                   stop_event=stop_event)
+        if details and not stop_event.is_set():
+            text = (f"{info_text}\n📊 {details['playlist_count']} vidéos, "
+                    f"durée totale {self.downloader.format_duration(details['total_duration'])}")
+            if details['estimated_size']:
+                text += f", taille estimée {self.downloader.format_size(details['estimated_size'])}"
+                free = self.downloader.disk.free_space(self.download_path.get())
+                if details['estimated_size'] > free:
+                    text += (f"\n⚠️ Espace disque insuffisant : {self.downloader.format_size(max(free, 0))} "
+                             f"disponibles dans le dossier de destination")
+            self.call_in_ui(self.update_info, text)
+
     def start_download(self):
         """Démarre le téléchargement"""
         url = self.url_var.get().strip()
@@ -322,54 +1016,128 @@ class YouTubeDownloaderGUI:
         download_dir = self.download_path.get()
         os.makedirs(download_dir, exist_ok=True)
 
+        self.download_btn.configure(state="disabled", text="🔄 Téléchargement...")
+        self.update_progress(0, "Initialisation du téléchargement...")
+        self.job_states.clear()
+        self.stop_event = threading.Event()
+        stop_event = self.stop_event
+        self.set_controls_enabled(True)
+
+        # Réutiliser l'analyse si elle porte sur la même URL
+        analysis = self.current_analysis
+        urls = url.split()
+        if len(urls) > 1:
+            source = urls
+        elif analysis and analysis.url == url and analysis.is_playlist == self.playlist_var.get():
+            source = analysis
+        else:
+            source = url
+
+        quality = self.quality_var.get()
+        format_type = self.format_var.get()
+        is_playlist = self.playlist_var.get()
+        sync = self.sync_var.get()
+
         def download_thread():
             try:
-                self.download_btn.configure(state="disabled", text="🔄 Téléchargement...")
-                self.update_progress(0, "Initialisation du téléchargement...")
-
-                # Callback pour la progression
-                def progress_callback(d):
-                    if d['status'] == 'downloading':
-                        if 'total_bytes' in d and d['total_bytes']:
-                            percent = d['downloaded_bytes'] / d['total_bytes']
-                            self.update_progress(percent, f"Téléchargement: {percent * 100:.1f}%")
-                        else:
-                            self.update_progress(0.5, "Téléchargement en cours...")
-                    elif d['status'] == 'finished':
-                        self.update_progress(1.0, "Téléchargement terminé !")
-
-                # Télécharger
+                # Télécharger (la progression arrive par le bus du moteur)
                 success = self.downloader.download(
-                    url=url,
+                    url=source,
                     output_path=download_dir,
-                    quality=self.quality_var.get(),
-                    format_type=self.format_var.get(),
-                    is_playlist=self.playlist_var.get(),
-                    progress_callback=progress_callback
+                    quality=quality,
+                    format_type=format_type,
+                    is_playlist=is_playlist,
+                    stop_event=stop_event,
+                    sync=sync
                 )
-
-                if success:
-                    self.update_info(
-                        f"✅ Téléchargement terminé avec succès !\n\nFichiers sauvegardés dans:\n{download_dir}")
-                    messagebox.showinfo("Succès", "Téléchargement terminé avec succès !")
-
-                    # Proposer d'ouvrir le dossier
-                    if messagebox.askyesno("Ouvrir le dossier", "Voulez-vous ouvrir le dossier de téléchargement ?"):
-                        os.startfile(download_dir) if os.name == 'nt' else os.system(f'open "{download_dir}"')
-                else:
-                    self.update_info("❌ Échec du téléchargement.\nVérifiez l'URL et votre connexion internet.")
-                    messagebox.showerror("Erreur", "Échec du téléchargement")
+                self.call_in_ui(self.finish_download, success, download_dir)
 
             except Exception as e:
-                error_msg = f"❌ Erreur lors du téléchargement:\n{str(e)}"
-                self.update_info(error_msg)
-                messagebox.showerror("Erreur", f"Erreur lors du téléchargement:\n{str(e)}")
-            finally:
-                self.download_btn.configure(state="normal", text="⬇️ Télécharger")
-                self.update_progress(0, "Prêt à télécharger")
+                self.call_in_ui(self.finish_download, False, download_dir, str(e))
 
         threading.Thread(target=download_thread, daemon=True).start()
 
+    def offer_resume(self):
+        """Propose de reprendre le travail interrompu d'une session précédente (plantage, fermeture)"""
+        if not self.downloader.journal.has_interrupted():
+            return
+        if not messagebox.askyesno("Reprise",
+                                   "Des téléchargements ont été interrompus lors de la dernière session.\n"
+                                   "Voulez-vous les reprendre ?"):
+            self.downloader.discard_interrupted()
+            return
+
+        self.download_btn.configure(state="disabled", text="🔄 Téléchargement...")
+        self.update_progress(0, "Reprise des téléchargements interrompus...")
+        self.job_states.clear()
+        self.stop_event = threading.Event()
+        self.set_controls_enabled(True)
+
+        def resume_thread():
+            download_dir = self.download_path.get()
+            try:
+                jobs = self.downloader.resume_interrupted()
+                if jobs:
+                    download_dir = jobs[0].output_path
+                # Les jobs qui étaient en pause attendent le bouton « Reprendre »
+                self.downloader.scheduler.wait(jobs)
+                success = any(job.status == 'finished' for job in jobs)
+                self.call_in_ui(self.finish_download, success, download_dir)
+            except Exception as e:
+                self.call_in_ui(self.finish_download, False, download_dir, str(e))
+
+        threading.Thread(target=resume_thread, daemon=True).start()
+
+    def failure_text(self):
+        """Vidéos en échec définitif et leur cause, d'après les derniers états des jobs"""
+        failed = [s for s in self.job_states.values() if s['status'] == 'failed']
+        if not failed:
+            return ""
+        text = f"\n\n⚠️ {len(failed)} vidéo(s) en échec:\n"
+        for state in failed[:10]:
+            reason = FAILURE_LABELS.get(state.get('failure'), "erreur")
+            attempts = f", {state['attempts']} essais" if state.get('attempts', 0) > 1 else ""
+            text += f"  • {state.get('title') or state['url']}: {reason}{attempts}\n"
+        if len(failed) > 10:
+            text += f"  • ... et {len(failed) - 10} autre(s)\n"
+        return text
+
+    def finish_download(self, success, download_dir, error=None):
+        """Affiche le résultat d'un téléchargement (dans le thread de Tk)"""
+        try:
+            if self.stop_event.is_set():
+                self.update_info("⏹ Téléchargement annulé.\nLes fichiers temporaires ont été supprimés.")
+            elif error:
+                self.update_info(f"❌ Erreur lors du téléchargement:\n{error}")
+                messagebox.showerror("Erreur", f"Erreur lors du téléchargement:\n{error}")
+            elif success:
+                self.update_info(
+                    f"✅ Téléchargement terminé avec succès !\n\nFichiers sauvegardés dans:\n{download_dir}"
+                    + self.failure_text())
+                messagebox.showinfo("Succès", "Téléchargement terminé avec succès !")
+
+                # Proposer d'ouvrir le dossier
+                if messagebox.askyesno("Ouvrir le dossier", "Voulez-vous ouvrir le dossier de téléchargement ?"):
+                    os.startfile(download_dir) if os.name == 'nt' else os.system(f'open "{download_dir}"')
+            else:
+                self.update_info("❌ Échec du téléchargement.\nVérifiez l'URL et votre connexion internet."
+                                 + self.failure_text())
+                messagebox.showerror("Erreur", "Échec du téléchargement")
+        finally:
+            self.set_controls_enabled(False)
+            self.download_btn.configure(state="normal", text="⬇️ Télécharger")
+            self.update_progress(0, "Prêt à télécharger")
+
+    def on_close(self):
+        """Arrête les analyses et téléchargements en cours, ferme le moteur puis la fenêtre"""
+        self.analysis_stop.set()
+        self.stop_event.set()
+        try:
+            self.downloader.close()
+        except Exception as e:
+            print(f"Erreur lors de la fermeture du moteur: {e}")
+        self.root.destroy()
+
     def run(self):
         """Lance l'application"""
         self.root.mainloop()
@@ -1,12 +1,2709 @@
-import yt_dlp
 import os
 import re
+import glob
+import asyncio
 from pathlib import Path
 import json
+import copy
+import itertools
+import threading
+import time
+import queue
+import random
+import socket
+import sqlite3
+import hashlib
+import heapq
+import shutil
+import errno
+import io
+import subprocess
+import ssl
+import http.client
+import urllib.request
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+# yt_dlp est importé à la demande : son import charge tous les extracteurs et
+# prend une bonne partie du temps de démarrage
+_yt_dlp = None
+_yt_dlp_lock = threading.Lock()
+
+
+def load_yt_dlp():
+    """Renvoie le module yt_dlp, importé à la première utilisation"""
+    global _yt_dlp
+    if _yt_dlp is None:
+        with _yt_dlp_lock:
+            if _yt_dlp is None:
+                import yt_dlp
+                _yt_dlp = yt_dlp
+    return _yt_dlp
+
+
+def preload_yt_dlp():
+    """Importe yt_dlp en arrière-plan pour qu'il soit prêt au premier appel"""
+    thread = threading.Thread(target=load_yt_dlp, name='import-yt-dlp', daemon=True)
+    thread.start()
+    return thread
+
+
+class DownloadJob:
+    """Un téléchargement individuel (une vidéo) suivi par le planificateur"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    PAUSED = 'paused'
+    PROCESSING = 'processing'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url, output_path, quality='720p', format_type='mp4',
+                 subfolder=None, title=None, progress_callback=None, analysis=None,
+                 video_id=None, index_record=None):
+        self.id = next(self._ids)
+        self.url = url
+        self.analysis = analysis
+        self.video_id = video_id
+        self.index_record = index_record
+        self.output_path = Path(output_path)
+        self.quality = quality
+        self.format_type = format_type
+        self.subfolder = subfolder
+        self.title = title
+        self.progress_callback = progress_callback
+
+        self.status = self.QUEUED
+        self.progress = 0.0
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+        self.speed = None
+        self.eta = None
+        self.filename = None
+        self.digest = None
+        # Dossier temporaire où le job écrit ses fichiers (voir YouTubeDownloader.staging_dir)
+        self.staging_dir = None
+        self.error = None
+        self.skipped = False
+
+        # Tentatives : nombre d'essais, nature de la dernière erreur, prochain essai (time.time())
+        self.attempts = 0
+        self.failure = None
+        self.retry_at = None
+
+        # Ligne du journal des jobs (JobJournal), pour la reprise après redémarrage
+        self.journal_id = None
+
+        # Demande de pause ou d'annulation ('pause', 'cancel'), lue par les hooks de progression
+        self.control = None
+        self.partial_files = set()
+
+        self.metrics = JobMetrics()
+        self.future = None
+        self.progress_bus = None
+        self._done = threading.Event()
+        self._done_callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def update_progress(self, d):
+        """Met à jour l'état du job depuis un dictionnaire de progression yt-dlp"""
+        # Fichier partiel noté avant tout : une annulation dès le premier bloc doit le supprimer
+        if d['status'] == 'downloading':
+            self.partial_files.add(d.get('tmpfilename') or d.get('filename'))
+        self.check_control()
+        if d.get('filename'):
+            self.filename = d['filename']
+        self.metrics.observe_progress(d)
+        if self.video_id is None and d.get('info_dict'):
+            self.video_id = DownloadIndex.key_for(d['info_dict'])
+        if d['status'] == 'downloading':
+            self.downloaded_bytes = d.get('downloaded_bytes') or 0
+            self.total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
+            self.speed = d.get('speed')
+            self.eta = d.get('eta')
+            if self.total_bytes:
+                self.progress = min(self.downloaded_bytes / self.total_bytes, 1.0)
+        elif d['status'] == 'finished':
+            self.progress = 1.0
+
+        self.publish()
+        if self.progress_callback:
+            self.progress_callback(dict(d, job_id=self.id))
+
+    def check_control(self):
+        """Interrompt le transfert en cours si une pause ou une annulation est demandée"""
+        if self.control is not None:
+            raise JobInterrupted(self.control)
+
+    def mark_skipped(self, record):
+        """Termine le job sans rien télécharger : la vidéo est déjà dans l'index"""
+        self.skipped = True
+        self.filename = record['path']
+        self.total_bytes = self.downloaded_bytes = record['size']
+        self.progress = 1.0
+
+    def publish(self):
+        """Envoie l'état courant du job sur le bus de progression"""
+        if self.progress_bus is not None:
+            self.progress_bus.publish(self.to_dict())
+
+    def is_done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Attend la fin du job, renvoie True s'il est terminé"""
+        return self._done.wait(timeout)
+
+    def add_done_callback(self, callback):
+        """Appelle callback(job) à la fin du job (tout de suite s'il est déjà terminé)"""
+        with self._callbacks_lock:
+            if self._done_callbacks is not None:
+                self._done_callbacks.append(callback)
+                return
+        callback(self)
+
+    def set_done(self):
+        """Marque le job comme terminé et prévient les callbacks (appelé par le planificateur)
+
+        Les callbacks passent avant l'événement de fin : quand wait() rend la
+        main, leurs effets (entrée notée dans un instantané...) sont visibles.
+        """
+        with self._callbacks_lock:
+            callbacks, self._done_callbacks = self._done_callbacks or [], None
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Erreur dans un callback de fin de job: {e}")
+        self._done.set()
+
+    def to_dict(self):
+        """Résumé sérialisable de l'état du job"""
+        return {
+            'id': self.id,
+            'url': self.url,
+            'video_id': self.video_id,
+            'title': self.title,
+            'status': self.status,
+            'progress': self.progress,
+            'downloaded_bytes': self.downloaded_bytes,
+            'total_bytes': self.total_bytes,
+            'speed': self.speed,
+            'eta': self.eta,
+            'filename': self.filename,
+            'error': self.error,
+            'failure': self.failure,
+            'attempts': self.attempts,
+            'retry_at': self.retry_at,
+            'skipped': self.skipped,
+        }
+
+
+class JobInterrupted(Exception):
+    """Levée depuis un hook de progression pour arrêter le transfert d'un job"""
+
+    def __init__(self, action):
+        super().__init__("téléchargement en pause" if action == 'pause' else "téléchargement annulé")
+        self.action = action
+
+
+class JobMetrics:
+    """Mesures de performance d'un job : durée des phases, octets, débits, reprises
+
+    Phases (secondes) : queue (attente d'un worker, pauses exclues),
+    extraction (infos et choix du format), ttfb (du début du transfert au
+    premier octet), transfer, write (écritures disque du téléchargement
+    segmenté ; yt-dlp ne l'expose pas) et postprocess (attente comprise).
+    """
+
+    PHASES = ('queue', 'extraction', 'ttfb', 'transfer', 'write', 'postprocess')
+
+    def __init__(self):
+        self.created = time.perf_counter()
+        self.phases = {}
+        self.bytes = 0
+        self.peak_speed = None
+        self.retries = 0
+        self._transfer_start = None
+        self._last_bytes = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        """Chronomètre un bloc et ajoute sa durée à la phase `name`"""
+        start = time.perf_counter()
+        if name == 'transfer' and self._transfer_start is None:
+            self._transfer_start = start
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def observe_progress(self, d):
+        """Octets reçus, premier octet et débit de pointe d'après un rapport de progression"""
+        if d.get('status') != 'downloading':
+            return
+        key = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        with self._lock:
+            # Premier rapport d'un fichier : sert de référence (reprise d'un .part), sauf si
+            # le téléchargeur indique lui-même les octets déjà présents (SegmentedDownloader)
+            previous = self._last_bytes.get(key, d.get('resumed_bytes', downloaded))
+            self._last_bytes[key] = downloaded
+            self.bytes += max(downloaded - previous, 0)
+            if downloaded and 'ttfb' not in self.phases and self._transfer_start is not None:
+                self.phases['ttfb'] = time.perf_counter() - self._transfer_start
+            speed = d.get('speed')
+            if speed and (self.peak_speed is None or speed > self.peak_speed):
+                self.peak_speed = speed
+
+    def to_dict(self):
+        with self._lock:
+            transfer = self.phases.get('transfer')
+            return {
+                'phases': {phase: round(self.phases[phase], 6) for phase in self.PHASES
+                           if phase in self.phases},
+                'bytes': self.bytes,
+                'average_speed': self.bytes / transfer if transfer and self.bytes else None,
+                'peak_speed': self.peak_speed,
+                'retries': self.retries,
+            }
+
+
+class ProgressChannel:
+    """File d'événements d'un abonné au bus de progression"""
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def put(self, event):
+        self._queue.put(event)
+
+    def drain(self):
+        """Vide la file et renvoie le dernier état connu de chaque job
+
+        Les rafales d'événements d'un même job sont fusionnées : seul le plus
+        récent est conservé, dans l'ordre d'arrivée des jobs.
+        """
+        latest = OrderedDict()
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            latest[event['id']] = event
+        return list(latest.values())
+
+
+class ProgressBus:
+    """Diffuse les états des jobs du moteur vers des consommateurs (GUI, CLI...)
+
+    publish() est appelé depuis les threads de téléchargement et ne prend
+    aucun verrou : la liste des abonnés est remplacée, jamais modifiée.
+    Chaque abonné vide sa file à son rythme avec ProgressChannel.drain().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = ()
+
+    def subscribe(self, channel=None):
+        """Abonne un canal (ProgressChannel par défaut, ou tout objet ayant put())"""
+        if channel is None:
+            channel = ProgressChannel()
+        with self._lock:
+            self._channels = self._channels + (channel,)
+        return channel
+
+    def unsubscribe(self, channel):
+        with self._lock:
+            self._channels = tuple(c for c in self._channels if c is not channel)
+
+    def publish(self, event):
+        for channel in self._channels:
+            channel.put(event)
+
+
+class RetryPolicy:
+    """Classement des erreurs de téléchargement et délais avant un nouvel essai
+
+    Trois natures d'erreur : 'throttled' (le serveur demande de ralentir :
+    HTTP 429, 403 de YouTube, vérification anti-robot), 'transient' (délai
+    dépassé, connexion coupée, erreur 5xx) et 'permanent' (vidéo
+    indisponible, format absent, disque plein...). Seules les deux premières
+    sont réessayées, après un délai exponentiel avec gigue (la moitié du
+    délai plus une part aléatoire), plus long pour 'throttled'.
+    """
+
+    THROTTLED = 'throttled'
+    TRANSIENT = 'transient'
+    PERMANENT = 'permanent'
+
+    THROTTLED_PATTERNS = re.compile(
+        r"HTTP Error (?:403|429)|Too Many Requests|rate.?limit|confirm you.re not a bot", re.IGNORECASE)
+    TRANSIENT_PATTERNS = re.compile(
+        r"HTTP Error (?:408|5\d\d)|timed? ?out|Connection (?:reset|refused|aborted)|Remote end closed"
+        r"|IncompleteRead|temporarily unavailable|Temporary failure in name resolution", re.IGNORECASE)
+
+    def __init__(self, max_retries=4, base_delay=2.0, throttled_delay=15.0, max_delay=300.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.throttled_delay = throttled_delay
+        self.max_delay = max_delay
+
+    def classify(self, error):
+        """Nature d'une erreur ('throttled', 'transient' ou 'permanent')"""
+        for exc in self._chain(error):
+            if isinstance(exc, (DiskSpaceError, JobInterrupted)):
+                return self.PERMANENT
+            status = getattr(exc, 'status', None) or getattr(exc, 'code', None)
+            if isinstance(status, int) and 400 <= status < 600:
+                if status in (403, 429):
+                    return self.THROTTLED
+                if status == 408 or status >= 500:
+                    return self.TRANSIENT
+                return self.PERMANENT
+            if isinstance(exc, (TimeoutError, socket.timeout, ConnectionError, http.client.HTTPException)):
+                return self.TRANSIENT
+            if type(exc).__name__ in ('TransportError', 'IncompleteRead', 'URLError'):
+                return self.TRANSIENT
+
+        message = ' '.join(str(exc) for exc in self._chain(error))
+        if self.THROTTLED_PATTERNS.search(message):
+            return self.THROTTLED
+        if self.TRANSIENT_PATTERNS.search(message):
+            return self.TRANSIENT
+        return self.PERMANENT
+
+    @staticmethod
+    def _chain(error):
+        """L'erreur et celles qu'elle enveloppe (DownloadError de yt-dlp, __cause__...)"""
+        seen = []
+        while error is not None and error not in seen and len(seen) < 10:
+            seen.append(error)
+            exc_info = getattr(error, 'exc_info', None)
+            if isinstance(exc_info, tuple) and len(exc_info) > 1 and isinstance(exc_info[1], BaseException):
+                error = exc_info[1]
+            else:
+                error = error.__cause__ or error.__context__
+        return seen
+
+    def should_retry(self, kind, attempts):
+        return kind != self.PERMANENT and attempts <= self.max_retries
+
+    def delay(self, kind, attempts):
+        """Délai avant l'essai suivant le `attempts`-ième échec"""
+        base = self.throttled_delay if kind == self.THROTTLED else self.base_delay
+        ceiling = min(self.max_delay, base * 2 ** (attempts - 1))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+class AdaptiveConcurrency:
+    """Nombre de téléchargements simultanés ajusté aux réponses du serveur (AIMD)
+
+    La limite augmente d'un job par « tour » de succès (1/limite par job
+    réussi) jusqu'à `max_limit` et est divisée par deux quand le serveur
+    demande de ralentir. Les jobs lancés avant une réduction ne la
+    déclenchent pas une seconde fois : une rafale de refus ne compte qu'une fois.
+    """
+
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.active = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, interrupted=None, poll=0.5):
+        """Attend une place ; renvoie l'instant de départ, ou None si interrupted() devient vrai"""
+        with self._cond:
+            while self.active >= int(self.limit):
+                if interrupted is not None and interrupted():
+                    return None
+                self._cond.wait(poll)
+            self.active += 1
+            return time.monotonic()
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify()
+
+    def on_throttled(self, started):
+        with self._cond:
+            if started is not None and started < self._last_decrease:
+                return
+            self.limit = max(self.min_limit, self.limit / 2)
+            self._last_decrease = time.monotonic()
+
+
+class DownloadScheduler:
+    """Exécute les jobs de téléchargement sur un pool borné de workers
+
+    Un job en échec temporaire est remis en file après un délai (voir
+    RetryPolicy) ; le nombre de jobs actifs s'adapte aux refus du serveur
+    (voir AdaptiveConcurrency).
+    """
+
+    def __init__(self, worker, max_workers=3, progress_bus=None, on_finish=None, retry_policy=None):
+        self._worker = worker
+        self.max_workers = max_workers
+        self.progress_bus = progress_bus
+        self.on_finish = on_finish
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.concurrency = AdaptiveConcurrency(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='telechargement')
+        self._lock = threading.RLock()
+        self.jobs = []
+        self._jobs_by_id = {}
+        # Nouveaux essais programmés : un seul thread les relance à échéance
+        self._retries = {}  # job_id -> instant (time.monotonic()) du prochain essai
+        self._retry_heap = []  # (instant, job_id, job) ; les entrées annulées y restent jusqu'à leur tour
+        self._retry_cond = threading.Condition(self._lock)
+        self._retry_thread = None
+        self._closed = False
+
+    def submit(self, job, paused=False):
+        """Met un job en file d'attente (ou directement en pause) et le renvoie"""
+        if job.progress_bus is None:
+            job.progress_bus = self.progress_bus
+        with self._lock:
+            self.jobs.append(job)
+            self._jobs_by_id[job.id] = job
+            if paused:
+                job.control = 'pause'
+                job.status = DownloadJob.PAUSED
+        job.publish()
+        if not paused:
+            job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs_by_id.get(job_id)
+
+    def _run(self, job):
+        started = self.concurrency.acquire(lambda: job.control is not None)
+        try:
+            self._run_acquired(job, started)
+        finally:
+            if started is not None:
+                self.concurrency.release()
+
+    def _run_acquired(self, job, started):
+        job.metrics.add('queue', time.perf_counter() - job.metrics.created)
+        with self._lock:
+            if job.control == 'pause':
+                job.status = DownloadJob.PAUSED
+                job.publish()
+                return
+            if job.control == 'cancel':
+                self._finish(job, status=DownloadJob.CANCELLED)
+                return
+            job.status = DownloadJob.RUNNING
+        job.publish()
+        try:
+            pending = self._worker(job)
+        except JobInterrupted as e:
+            with self._lock:
+                if e.action == 'pause' and job.control == 'pause':
+                    # Le worker est libéré ; le fichier partiel attend la reprise
+                    job.status = DownloadJob.PAUSED
+                    job.speed = job.eta = None
+                    job.publish()
+                    return
+            self._finish(job, status=DownloadJob.CANCELLED)
+            return
+        except Exception as e:
+            kind = self.retry_policy.classify(e)
+            if kind == RetryPolicy.THROTTLED:
+                self.concurrency.on_throttled(started)
+            job.attempts += 1
+            job.failure = kind
+            if self.retry_policy.should_retry(kind, job.attempts):
+                self._retry_later(job, e, self.retry_policy.delay(kind, job.attempts))
+            else:
+                self._finish(job, e)
+            return
+
+        self.concurrency.on_success()
+        if pending is None:
+            self._finish(job)
+            return
+
+        # Post-traitement confié à une autre étape : ce worker passe au job suivant
+        job.status = DownloadJob.PROCESSING
+        job.publish()
+        pending.add_done_callback(lambda future: self._finish(job, future.exception()))
+
+    def _retry_later(self, job, error, delay):
+        """Remet le job en file après `delay` secondes, sans occuper de worker"""
+        with self._lock:
+            if job.control is not None:
+                # Pause ou annulation demandée pendant l'essai : elle l'emporte
+                if job.control == 'pause':
+                    job.status = DownloadJob.PAUSED
+                    job.publish()
+                else:
+                    self._finish(job, status=DownloadJob.CANCELLED)
+                return
+            job.error = str(error)
+            job.status = DownloadJob.QUEUED
+            job.retry_at = time.time() + delay
+            job.speed = job.eta = None
+            deadline = time.monotonic() + delay
+            self._retries[job.id] = deadline
+            heapq.heappush(self._retry_heap, (deadline, job.id, job))
+            if self._retry_thread is None:
+                self._retry_thread = threading.Thread(target=self._retry_loop, name='nouveaux-essais',
+                                                      daemon=True)
+                self._retry_thread.start()
+            self._retry_cond.notify()
+        print(f"Nouvel essai de {job.url} dans {delay:.0f} s ({job.failure}: {error})")
+        job.publish()
+
+    def _retry_loop(self):
+        """Relance les jobs dont le délai avant un nouvel essai est écoulé (jusqu'à shutdown)"""
+        with self._retry_cond:
+            while not self._closed:
+                heap = self._retry_heap
+                # Essais annulés ou reprogrammés : leur ancienne entrée est ignorée
+                while heap and self._retries.get(heap[0][1]) != heap[0][0]:
+                    heapq.heappop(heap)
+                if not heap:
+                    self._retry_cond.wait()
+                    continue
+                delay = heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._retry_cond.wait(delay)
+                    continue
+                _, job_id, job = heapq.heappop(heap)
+                del self._retries[job_id]
+                job.retry_at = None
+                job.metrics.created = time.perf_counter()
+                job.future = self._executor.submit(self._run, job)
+
+    def _cancel_retry(self, job):
+        """Annule l'essai programmé d'un job ; renvoie True s'il y en avait un"""
+        if self._retries.pop(job.id, None) is None:
+            return False
+        job.retry_at = None
+        return True
+
+    def _finish(self, job, error=None, status=None):
+        job.control = None
+        if status is not None:
+            job.status = status
+        elif error is None:
+            job.status = DownloadJob.FINISHED
+            # Réussi après un ou plusieurs essais : l'erreur passée n'a plus cours
+            job.error = job.failure = None
+        else:
+            job.error = str(error)
+            job.status = DownloadJob.FAILED
+            if job.failure is None:
+                job.failure = self.retry_policy.classify(error)
+            print(f"Erreur lors du téléchargement de {job.url}: {error}")
+        job.publish()
+        if self.on_finish is not None:
+            try:
+                self.on_finish(job)
+            except Exception as e:
+                print(f"Erreur après le téléchargement de {job.url}: {e}")
+        job.set_done()
+
+    def pause(self, job):
+        """Met un job en pause ; un transfert en cours s'arrête à son prochain bloc"""
+        with self._lock:
+            if job.status == DownloadJob.QUEUED and (self._cancel_retry(job) or
+                                                     (job.future is not None and job.future.cancel())):
+                job.control = 'pause'
+                job.status = DownloadJob.PAUSED
+                # Attente écoulée jusqu'ici ; la pause elle-même n'en fait pas partie
+                job.metrics.add('queue', time.perf_counter() - job.metrics.created)
+                job.publish()
+                return True
+            if job.status in (DownloadJob.QUEUED, DownloadJob.RUNNING):
+                job.control = 'pause'
+                return True
+            return False
+
+    def resume(self, job):
+        """Remet en file un job en pause (le transfert reprend depuis le fichier partiel)"""
+        with self._lock:
+            if job.control == 'pause' and job.status != DownloadJob.PAUSED:
+                # Pause demandée mais pas encore effective : on l'oublie
+                job.control = None
+                return True
+            if job.status != DownloadJob.PAUSED:
+                return False
+            job.control = None
+            job.status = DownloadJob.QUEUED
+            job.metrics.created = time.perf_counter()
+            job.publish()
+            job.future = self._executor.submit(self._run, job)
+            return True
+
+    def cancel(self, job):
+        """Annule un job : immédiatement s'il attend, à son prochain bloc s'il télécharge
+
+        Renvoie False si le job est déjà terminé ou en post-traitement.
+        """
+        with self._lock:
+            if job.is_done() or job.status == DownloadJob.PROCESSING:
+                return False
+            job.control = 'cancel'
+            if (job.status == DownloadJob.PAUSED or self._cancel_retry(job)
+                    or (job.future is not None and job.future.cancel())):
+                self._finish(job, status=DownloadJob.CANCELLED)
+            return True
+
+    def wait(self, jobs, timeout=None):
+        """Attend la fin d'une liste de jobs"""
+        for job in jobs:
+            job.wait(timeout)
+
+    def active_jobs(self):
+        with self._lock:
+            return [job for job in self.jobs if not job.is_done()]
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            # Les essais programmés sont abandonnés et le thread des essais s'arrête
+            self._closed = True
+            self._retries.clear()
+            self._retry_heap.clear()
+            self._retry_cond.notify_all()
+        self._executor.shutdown(wait=wait)
+
+
+class MetadataCache:
+    """Cache disque des métadonnées extraites, avec durée de vie et éviction LRU"""
+
+    def __init__(self, path=os.path.join('cache', 'metadata.json'), ttl=6 * 3600, max_entries=500):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._deferred = 0
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        # Le fichier est écrit du moins au plus récemment utilisé
+        for key, entry in data.get('entries', []):
+            self._entries[key] = entry
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': list(self._entries.items())}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key):
+        """Renvoie la valeur en cache, ou None si absente ou expirée"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if self.ttl is not None and time.time() - entry['stored_at'] > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['value']
+
+    def put(self, key, value):
+        """Enregistre une valeur et évince les entrées les moins récemment utilisées"""
+        with self._lock:
+            self._entries[key] = {'stored_at': time.time(), 'value': value}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._persist()
+
+    def _persist(self):
+        """Écrit le fichier, ou à la fin du bloc deferred() ; un échec d'écriture est signalé sans lever"""
+        if self._deferred:
+            self._dirty = True
+            return
+        try:
+            self._save()
+        except OSError as e:
+            print(f"Impossible d'écrire le cache des métadonnées: {e}")
+
+    @contextmanager
+    def deferred(self):
+        """Regroupe les écritures du fichier en une seule, à la fin du bloc with"""
+        with self._lock:
+            self._deferred += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deferred -= 1
+                if not self._deferred and self._dirty:
+                    self._dirty = False
+                    try:
+                        self._save()
+                    except OSError as e:
+                        print(f"Impossible d'écrire le cache des métadonnées: {e}")
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._persist()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._persist()
+
+    def stats(self):
+        """Compteurs de succès/échecs du cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+class DownloadIndex:
+    """Index local (SQLite) des vidéos déjà téléchargées
+
+    Associe un ID de vidéo et une variante (format/qualité) au fichier
+    produit, pour éviter tout accès réseau quand la vidéo est déjà là. Chaque
+    thread a sa propre connexion ; le mode WAL permet aux workers de lire
+    pendant qu'un autre écrit.
+    """
+
+    # Limite de paramètres d'une requête SQLite
+    LOOKUP_BATCH = 500
+
+    def __init__(self, path=os.path.join('cache', 'downloads.sqlite3')):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS downloads ('
+                ' video_id TEXT NOT NULL,'
+                ' variant TEXT NOT NULL,'
+                ' path TEXT NOT NULL,'
+                ' size INTEGER,'
+                ' completed_at REAL NOT NULL,'
+                ' digest TEXT,'
+                ' PRIMARY KEY (video_id, variant))'
+            )
+            # Index créé avant le stockage par contenu
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(downloads)')]
+            if 'digest' not in columns:
+                conn.execute('ALTER TABLE downloads ADD COLUMN digest TEXT')
+
+    @staticmethod
+    def key_for(info):
+        """ID indexé d'un dictionnaire d'infos : l'ID YouTube, ou extracteur:ID sinon"""
+        if not info.get('id'):
+            return None
+        extractor = info.get('extractor_key') or info.get('ie_key')
+        if extractor in (None, 'Youtube'):
+            return info['id']
+        return f"{extractor}:{info['id']}"
+
+    @staticmethod
+    def variant_for(quality, format_type):
+        # La qualité vidéo n'a pas de sens pour les formats audio
+        if format_type in ('mp3', 'm4a'):
+            return format_type
+        return f"{format_type}:{quality}"
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _valid(self, row):
+        """Vérifie que le fichier indexé existe toujours avec la bonne taille"""
+        try:
+            size = os.path.getsize(row['path'])
+        except OSError:
+            return False
+        return row['size'] is None or row['size'] == size
+
+    def lookup(self, video_id, variant):
+        """Renvoie l'enregistrement d'une vidéo déjà téléchargée, ou None"""
+        return self.lookup_many([video_id], variant).get(video_id)
+
+    def lookup_many(self, video_ids, variant):
+        """Recherche groupée : renvoie {video_id: enregistrement} pour les vidéos présentes"""
+        video_ids = [v for v in dict.fromkeys(video_ids) if v]
+        found = {}
+        stale = []
+        conn = self._connect()
+        for i in range(0, len(video_ids), self.LOOKUP_BATCH):
+            batch = video_ids[i:i + self.LOOKUP_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(
+                f'SELECT * FROM downloads WHERE variant = ? AND video_id IN ({placeholders})',
+                [variant] + batch
+            ).fetchall()
+            for row in rows:
+                if self._valid(row):
+                    found[row['video_id']] = dict(row)
+                else:
+                    stale.append(row['video_id'])
+
+        # Fichiers supprimés ou modifiés depuis : on les oublie
+        for video_id in stale:
+            self.forget(video_id, variant)
+        return found
+
+    def record(self, video_id, variant, path, size=None, digest=None):
+        """Enregistre un téléchargement terminé (avec son empreinte ContentHash si connue)"""
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = None
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO downloads (video_id, variant, path, size, completed_at, digest)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (video_id, variant, str(path), size, time.time(), digest)
+            )
+
+    def forget(self, video_id, variant=None):
+        with self._connect() as conn:
+            if variant is None:
+                conn.execute('DELETE FROM downloads WHERE video_id = ?', (video_id,))
+            else:
+                conn.execute('DELETE FROM downloads WHERE video_id = ? AND variant = ?',
+                             (video_id, variant))
+
+    def close(self):
+        """Ferme la connexion du thread courant"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class JobJournal:
+    """Journal des jobs (SQLite, mode WAL) pour reprendre le travail après un arrêt
+
+    Chaque job est inscrit avant d'être planifié, puis chacun de ses
+    changements d'état est ajouté au journal : le journal est abonné au bus
+    de progression et n'écrit que lorsque le statut ou le nombre d'essais
+    change. Les playlists en cours d'énumération sont suivies elles aussi.
+    Au démarrage suivant, les jobs et playlists inachevés d'une autre session
+    peuvent être repris (YouTubeDownloader.resume_interrupted) ; leurs
+    fichiers partiels sont restés dans le dossier temporaire.
+    """
+
+    UNFINISHED = ('queued', 'running', 'paused', 'processing')
+    TERMINAL = ('finished', 'failed', 'cancelled')
+
+    # Une session vivante signale sa présence toutes les HEARTBEAT secondes ;
+    # au-delà de STALE_AFTER sans signal, elle est considérée comme arrêtée
+    HEARTBEAT = 10
+    STALE_AFTER = 45
+
+    def __init__(self, path=os.path.join('cache', 'jobs.sqlite3'), keep_days=30):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Identifiant de cette session : ses jobs ne sont pas « interrompus »
+        self.session = f"{os.getpid()}-{time.time():.6f}"
+        self._local = threading.local()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self._rows = {}  # job.id -> journal_id
+        self._last = {}  # journal_id -> (statut, essais) déjà écrits
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' session TEXT NOT NULL,'
+                ' url TEXT NOT NULL,'
+                ' output_path TEXT NOT NULL,'
+                ' quality TEXT,'
+                ' format_type TEXT,'
+                ' subfolder TEXT,'
+                ' title TEXT,'
+                ' video_id TEXT,'
+                ' status TEXT NOT NULL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' filename TEXT,'
+                ' error TEXT,'
+                ' failure TEXT,'
+                ' created_at REAL NOT NULL,'
+                ' updated_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS job_events ('
+                ' job_id INTEGER NOT NULL,'
+                ' status TEXT NOT NULL,'
+                ' attempts INTEGER,'
+                ' error TEXT,'
+                ' at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS batches ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' session TEXT NOT NULL,'
+                ' url TEXT NOT NULL,'
+                ' output_path TEXT NOT NULL,'
+                ' quality TEXT,'
+                ' format_type TEXT,'
+                ' next_index INTEGER NOT NULL DEFAULT 1,'
+                ' finished INTEGER NOT NULL DEFAULT 0,'
+                ' created_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                ' session TEXT PRIMARY KEY,'
+                ' pid INTEGER NOT NULL,'
+                ' heartbeat REAL NOT NULL)'
+            )
+            conn.execute('INSERT OR REPLACE INTO sessions (session, pid, heartbeat) VALUES (?, ?, ?)',
+                         (self.session, os.getpid(), time.time()))
+        self.prune(keep_days)
+        threading.Thread(target=self._heartbeat, name='journal-heartbeat', daemon=True).start()
+
+    def _heartbeat(self):
+        while not self._closed.wait(self.HEARTBEAT):
+            try:
+                with self._connect() as conn:
+                    conn.execute('UPDATE sessions SET heartbeat = ? WHERE session = ?', (time.time(), self.session))
+            except sqlite3.Error as e:
+                print(f"Erreur lors de l'écriture du journal des jobs: {e}")
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+
+    @staticmethod
+    def _process_alive(pid):
+        """Indique si le processus existe encore (seulement vérifiable sous POSIX ; None sinon)"""
+        if os.name != 'posix':
+            return None
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+        return True
+
+    def _live_sessions(self, conn):
+        """Sessions dont le processus tourne encore (elle-même comprise)"""
+        limit = time.time() - self.STALE_AFTER
+        live = {self.session}
+        for row in conn.execute('SELECT session, pid, heartbeat FROM sessions WHERE session != ?',
+                                (self.session,)):
+            # Un processus disparu libère ses jobs sans attendre l'expiration du signal
+            if row['heartbeat'] >= limit and self._process_alive(row['pid']) is not False:
+                live.add(row['session'])
+        return live
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, job):
+        """Inscrit un nouveau job (avant sa planification)"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO jobs (session, url, output_path, quality, format_type, subfolder, title,'
+                ' video_id, status, attempts, created_at, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (self.session, job.url, str(job.output_path), job.quality, job.format_type, job.subfolder,
+                 job.title, job.video_id, job.status, job.attempts, now, now)
+            )
+            job.journal_id = cursor.lastrowid
+            conn.execute('INSERT INTO job_events (job_id, status, attempts, at) VALUES (?, ?, ?, ?)',
+                         (job.journal_id, job.status, job.attempts, now))
+        self.track(job)
+
+    def track(self, job):
+        """Suit les changements d'état d'un job déjà inscrit (repris d'une session précédente)"""
+        with self._lock:
+            self._rows[job.id] = job.journal_id
+            self._last.setdefault(job.journal_id, (job.status, job.attempts))
+
+    def put(self, event):
+        """Reçoit un événement du bus de progression ; n'écrit que les changements d'état"""
+        journal_id = self._rows.get(event['id'])
+        if journal_id is None:
+            return
+        state = (event['status'], event.get('attempts', 0))
+        with self._lock:
+            if self._last.get(journal_id) == state:
+                return
+            self._last[journal_id] = state
+            if event['status'] in self.TERMINAL:
+                # Plus aucun changement à suivre
+                del self._rows[event['id']]
+                del self._last[journal_id]
+
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'UPDATE jobs SET status = ?, attempts = ?, filename = ?, error = ?, failure = ?,'
+                    ' video_id = COALESCE(video_id, ?), updated_at = ? WHERE id = ?',
+                    (event['status'], state[1], event.get('filename'), event.get('error'),
+                     event.get('failure'), event.get('video_id'), now, journal_id)
+                )
+                conn.execute('INSERT INTO job_events (job_id, status, attempts, error, at) VALUES (?, ?, ?, ?, ?)',
+                             (journal_id, event['status'], state[1], event.get('error'), now))
+        except sqlite3.Error as e:
+            print(f"Erreur lors de l'écriture du journal des jobs: {e}")
+
+    def start_batch(self, url, output_path, quality, format_type, start=1):
+        """Inscrit une playlist en cours d'énumération ; renvoie son identifiant"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO batches (session, url, output_path, quality, format_type, next_index, created_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (self.session, url, str(output_path), quality, format_type, start, time.time())
+            )
+            return cursor.lastrowid
+
+    def batch_progress(self, batch_id, next_index):
+        """Position à partir de laquelle reprendre l'énumération de la playlist"""
+        with self._connect() as conn:
+            conn.execute('UPDATE batches SET next_index = ? WHERE id = ?', (next_index, batch_id))
+
+    def finish_batch(self, batch_id):
+        with self._connect() as conn:
+            conn.execute('UPDATE batches SET finished = 1 WHERE id = ?', (batch_id,))
+
+    def claim_interrupted(self):
+        """Jobs et playlists inachevés des sessions précédentes, réservés pour cette session
+
+        Renvoie (jobs, playlists) sous forme de dictionnaires. La réservation
+        empêche une autre instance de reprendre les mêmes jobs.
+        """
+        conn = self._connect()
+        placeholders = ','.join('?' * len(self.UNFINISHED))
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Les jobs d'une instance encore en marche ne sont pas interrompus
+            live = self._live_sessions(conn)
+            jobs = [dict(row) for row in conn.execute(
+                f'SELECT * FROM jobs WHERE status IN ({placeholders}) ORDER BY id', self.UNFINISHED)
+                if row['session'] not in live]
+            batches = [dict(row) for row in conn.execute(
+                'SELECT * FROM batches WHERE finished = 0 ORDER BY id') if row['session'] not in live]
+            conn.executemany('UPDATE jobs SET session = ? WHERE id = ?',
+                             [(self.session, job['id']) for job in jobs])
+            conn.executemany('UPDATE batches SET finished = 1 WHERE id = ?', [(b['id'],) for b in batches])
+        return jobs, batches
+
+    def has_interrupted(self):
+        """Indique si une session précédente a laissé des jobs ou des playlists inachevés"""
+        conn = self._connect()
+        placeholders = ','.join('?' * len(self.UNFINISHED))
+        live = self._live_sessions(conn)
+        sessions = [row[0] for row in conn.execute(
+            f'SELECT DISTINCT session FROM jobs WHERE status IN ({placeholders})'
+            ' UNION SELECT DISTINCT session FROM batches WHERE finished = 0', self.UNFINISHED)]
+        return any(session not in live for session in sessions)
+
+    def mark(self, journal_id, status):
+        """Change directement le statut d'un job inscrit (ex. job abandonné)"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?', (status, now, journal_id))
+            conn.execute('INSERT INTO job_events (job_id, status, at) VALUES (?, ?, ?)',
+                         (journal_id, status, now))
+
+    def prune(self, keep_days):
+        """Oublie les jobs terminés depuis plus de `keep_days` jours"""
+        if not keep_days:
+            return
+        limit = time.time() - keep_days * 86400
+        placeholders = ','.join('?' * len(self.TERMINAL))
+        with self._connect() as conn:
+            conn.execute(
+                f'DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE status IN ({placeholders})'
+                ' AND updated_at < ?)', self.TERMINAL + (limit,))
+            conn.execute(f'DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?',
+                         self.TERMINAL + (limit,))
+            conn.execute('DELETE FROM batches WHERE finished = 1 AND created_at < ?', (limit,))
+            conn.execute('DELETE FROM sessions WHERE heartbeat < ?', (limit,))
+
+    def close(self):
+        """Termine la session (ses jobs inachevés deviennent reprenables) et ferme la connexion du thread"""
+        self._closed.set()
+        try:
+            # Connexion ouverte au besoin : le thread qui ferme n'a pas forcément écrit dans le journal
+            with self._connect() as conn:
+                conn.execute('DELETE FROM sessions WHERE session = ?', (self.session,))
+        except sqlite3.Error as e:
+            print(f"Erreur lors de l'écriture du journal des jobs: {e}")
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class PlaylistSnapshots:
+    """Instantanés (SQLite) des entrées de chaque playlist synchronisée
+
+    Pour une playlist et une variante, garde l'ID de chaque vidéo déjà vue,
+    la date de sa première apparition et, si elle a disparu de la playlist,
+    la date où son absence a été constatée. Une vidéo reste « en attente »
+    tant que son téléchargement n'a pas abouti : la synchronisation suivante
+    la replanifie même si elle ne l'énumère plus.
+    """
+
+    def __init__(self, path=os.path.join('cache', 'playlists.sqlite3')):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS playlists ('
+                ' url TEXT NOT NULL,'
+                ' variant TEXT NOT NULL,'
+                ' title TEXT,'
+                ' synced_at REAL,'
+                ' entry_count INTEGER,'
+                ' PRIMARY KEY (url, variant))'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS playlist_entries ('
+                ' url TEXT NOT NULL,'
+                ' variant TEXT NOT NULL,'
+                ' video_id TEXT NOT NULL,'
+                ' entry_url TEXT NOT NULL,'
+                ' title TEXT,'
+                ' first_seen REAL NOT NULL,'
+                ' removed_at REAL,'
+                ' pending INTEGER NOT NULL DEFAULT 1,'
+                ' PRIMARY KEY (url, variant, video_id))'
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def load(self, url, variant):
+        """Playlist enregistrée (dict ou None) et {video_id: date de première apparition}"""
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM playlists WHERE url = ? AND variant = ?', (url, variant)).fetchone()
+        seen = dict(conn.execute('SELECT video_id, first_seen FROM playlist_entries'
+                                 ' WHERE url = ? AND variant = ?', (url, variant)).fetchall())
+        return (dict(row) if row else None), seen
+
+    def add(self, url, variant, entries):
+        """Ajoute des entrées nouvelles [(video_id, url, titre)], en attente de téléchargement"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO playlist_entries (url, variant, video_id, entry_url, title, first_seen)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                [(url, variant, video_id, entry_url, title, now) for video_id, entry_url, title in entries]
+            )
+
+    def pending(self, url, variant):
+        """Entrées dont le téléchargement n'a pas encore abouti : [(video_id, url, titre)]"""
+        rows = self._connect().execute(
+            'SELECT video_id, entry_url, title FROM playlist_entries'
+            ' WHERE url = ? AND variant = ? AND pending = 1 AND removed_at IS NULL ORDER BY first_seen',
+            (url, variant)).fetchall()
+        return [tuple(row) for row in rows]
+
+    def mark_done(self, url, variant, video_id):
+        with self._connect() as conn:
+            conn.execute('UPDATE playlist_entries SET pending = 0 WHERE url = ? AND variant = ? AND video_id = ?',
+                         (url, variant, video_id))
+
+    def finish(self, url, variant, title, present=None):
+        """Termine une synchronisation complète ; renvoie les IDs disparus de la playlist
+
+        `present` (ensemble des IDs énumérés) n'est fourni qu'après une
+        énumération intégrale : les entrées absentes sont alors notées comme
+        retirées, celles qui réapparaissent ne le sont plus.
+        """
+        now = time.time()
+        removed = []
+        with self._connect() as conn:
+            if present is not None:
+                rows = conn.execute('SELECT video_id, removed_at FROM playlist_entries'
+                                    ' WHERE url = ? AND variant = ?', (url, variant)).fetchall()
+                removed = [row['video_id'] for row in rows
+                           if row['video_id'] not in present and row['removed_at'] is None]
+                returned = [row['video_id'] for row in rows
+                            if row['video_id'] in present and row['removed_at'] is not None]
+                conn.executemany('UPDATE playlist_entries SET removed_at = ? WHERE url = ? AND variant = ?'
+                                 ' AND video_id = ?', [(now, url, variant, video_id) for video_id in removed])
+                conn.executemany('UPDATE playlist_entries SET removed_at = NULL WHERE url = ? AND variant = ?'
+                                 ' AND video_id = ?', [(url, variant, video_id) for video_id in returned])
+            count = conn.execute('SELECT COUNT(*) FROM playlist_entries WHERE url = ? AND variant = ?'
+                                 ' AND removed_at IS NULL', (url, variant)).fetchone()[0]
+            conn.execute('INSERT INTO playlists (url, variant, title, synced_at, entry_count)'
+                         ' VALUES (?, ?, ?, ?, ?) ON CONFLICT (url, variant) DO UPDATE SET'
+                         ' title = COALESCE(excluded.title, title), synced_at = excluded.synced_at,'
+                         ' entry_count = excluded.entry_count', (url, variant, title, now, count))
+        return removed
+
+    def removed(self, url, variant):
+        """Entrées retirées de la playlist depuis leur téléchargement : [(video_id, titre, date)]"""
+        rows = self._connect().execute(
+            'SELECT video_id, title, removed_at FROM playlist_entries'
+            ' WHERE url = ? AND variant = ? AND removed_at IS NOT NULL ORDER BY removed_at',
+            (url, variant)).fetchall()
+        return [tuple(row) for row in rows]
+
+    def close(self):
+        """Ferme la connexion du thread courant"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class MetricsSink:
+    """Exporte les mesures des jobs terminés
+
+    Chaque job ajoute une ligne au fichier JSON lines ; au-delà de
+    `max_bytes`, le fichier est renommé en `.1` (l'ancien `.1` est perdu) et
+    un nouveau commence. Le fichier texte Prometheus (pour le collecteur
+    textfile de node_exporter) est réécrit avec les totaux cumulés. Un
+    chemin à None désactive l'export correspondant.
+    """
+
+    def __init__(self, jsonl_path=os.path.join('cache', 'metrics.jsonl'),
+                 prometheus_path=os.path.join('cache', 'metrics.prom'), max_bytes=5 * 1024 * 1024):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._bytes = 0
+        self._retries = 0
+        self._job_retries = 0
+        self._failures = {}
+        self._phases = {}
+
+    def record(self, job):
+        """Enregistre les mesures d'un job terminé"""
+        metrics = job.metrics.to_dict()
+        entry = dict(metrics, time=time.time(), job_id=job.id, url=job.url, video_id=job.video_id,
+                     status=job.status, skipped=job.skipped, format=job.format_type,
+                     quality=job.quality, error=job.error, failure=job.failure, attempts=job.attempts)
+        with self._lock:
+            status = 'skipped' if job.skipped else job.status
+            self._jobs[status] = self._jobs.get(status, 0) + 1
+            self._bytes += metrics['bytes']
+            self._retries += metrics['retries']
+            # Essais ayant échoué avant le dernier, et cause des échecs définitifs
+            self._job_retries += max(job.attempts - (1 if job.status == DownloadJob.FAILED else 0), 0)
+            if job.status == DownloadJob.FAILED:
+                reason = job.failure or RetryPolicy.PERMANENT
+                self._failures[reason] = self._failures.get(reason, 0) + 1
+            for phase, seconds in metrics['phases'].items():
+                total, count = self._phases.get(phase, (0.0, 0))
+                self._phases[phase] = (total + seconds, count + 1)
+
+            try:
+                if self.jsonl_path:
+                    Path(self.jsonl_path).parent.mkdir(parents=True, exist_ok=True)
+                    self._rotate()
+                    with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                if self.prometheus_path:
+                    self._write_prometheus()
+            except OSError as e:
+                print(f"Erreur lors de l'écriture des mesures: {e}")
+
+    def _rotate(self):
+        """Archive le fichier JSON lines s'il a atteint `max_bytes`"""
+        try:
+            if self.max_bytes and os.path.getsize(self.jsonl_path) >= self.max_bytes:
+                os.replace(self.jsonl_path, f"{self.jsonl_path}.1")
+        except FileNotFoundError:
+            pass
+
+    def _write_prometheus(self):
+        lines = [
+            '# HELP ytdp_jobs_total Jobs terminés, par statut',
+            '# TYPE ytdp_jobs_total counter',
+        ]
+        lines += [f'ytdp_jobs_total{{status="{status}"}} {count}' for status, count in sorted(self._jobs.items())]
+        lines += [
+            '# HELP ytdp_downloaded_bytes_total Octets reçus',
+            '# TYPE ytdp_downloaded_bytes_total counter',
+            f'ytdp_downloaded_bytes_total {self._bytes}',
+            '# HELP ytdp_retries_total Reprises de transfert',
+            '# TYPE ytdp_retries_total counter',
+            f'ytdp_retries_total {self._retries}',
+            '# HELP ytdp_job_retries_total Nouveaux essais de jobs après une erreur temporaire',
+            '# TYPE ytdp_job_retries_total counter',
+            f'ytdp_job_retries_total {self._job_retries}',
+            '# HELP ytdp_failures_total Jobs en échec définitif, par nature de la dernière erreur',
+            '# TYPE ytdp_failures_total counter',
+        ]
+        lines += [f'ytdp_failures_total{{reason="{reason}"}} {count}'
+                  for reason, count in sorted(self._failures.items())]
+        lines += [
+            '# HELP ytdp_phase_seconds Durée des phases des jobs',
+            '# TYPE ytdp_phase_seconds summary',
+        ]
+        for phase, (total, count) in sorted(self._phases.items()):
+            lines.append(f'ytdp_phase_seconds_sum{{phase="{phase}"}} {total:.6f}')
+            lines.append(f'ytdp_phase_seconds_count{{phase="{phase}"}} {count}')
+
+        Path(self.prometheus_path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.prometheus_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.prometheus_path)
+
+
+class YoutubeDLPool:
+    """Pool d'instances YoutubeDL réutilisables, regroupées par options compatibles
+
+    Créer un YoutubeDL coûte cher (initialisation des extracteurs, cookies,
+    nouvelles connexions HTTP/TLS). Les instances sont donc gardées au chaud
+    et prêtées à un seul thread à la fois ; leur gestionnaire réseau conserve
+    ses connexions ouvertes d'un appel à l'autre. Les hooks de progression et
+    de fin de traitement, ainsi que les dossiers (`paths`), sont propres à
+    chaque appel et ne comptent pas dans la compatibilité des options.
+    `ydl_class` remplace yt_dlp.YoutubeDL (ex. extracteur factice des
+    benchmarks).
+    """
+
+    PER_CALL_OPTIONS = ('progress_hooks', 'post_hooks', 'paths')
+
+    def __init__(self, max_idle_per_key=4, max_idle=16, ydl_class=None):
+        self.max_idle_per_key = max_idle_per_key
+        self.max_idle = max_idle
+        self.ydl_class = ydl_class
+        self.created = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._idle = OrderedDict()  # clé d'options -> liste de _PooledYoutubeDL libres
+
+    def _key(self, ydl_opts):
+        shared = {k: v for k, v in ydl_opts.items() if k not in self.PER_CALL_OPTIONS}
+        return json.dumps(shared, sort_keys=True, default=repr)
+
+    def _acquire(self, key, ydl_opts):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+            self.created += 1
+
+        shared = {k: v for k, v in ydl_opts.items() if k not in self.PER_CALL_OPTIONS}
+        return _PooledYoutubeDL(shared, self.ydl_class)
+
+    def _release(self, key, pooled):
+        to_close = []
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if len(idle) < self.max_idle_per_key:
+                idle.append(pooled)
+            else:
+                to_close.append(pooled)
+
+            # Éviction des groupes d'options les moins récemment utilisés
+            while sum(len(v) for v in self._idle.values()) > self.max_idle:
+                old_key, old_idle = next(iter(self._idle.items()))
+                to_close.append(old_idle.pop(0))
+                if not old_idle:
+                    del self._idle[old_key]
+
+        for item in to_close:
+            item.close()
+
+    @contextmanager
+    def session(self, ydl_opts):
+        """Prête un YoutubeDL configuré avec ces options le temps d'un bloc with"""
+        key = self._key(ydl_opts)
+        pooled = self._acquire(key, ydl_opts)
+        pooled.prepare(ydl_opts.get('progress_hooks'), ydl_opts.get('post_hooks'), ydl_opts.get('paths'))
+        try:
+            yield pooled.ydl
+        except GeneratorExit:
+            # Générateur abandonné en cours de route (ex. énumération interrompue)
+            pooled.prepare(None, None)
+            self._release(key, pooled)
+            raise
+        except BaseException:
+            # Instance dans un état inconnu : on ne la remet pas dans le pool
+            pooled.close()
+            raise
+        else:
+            pooled.prepare(None, None)
+            self._release(key, pooled)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'created': self.created,
+                'reused': self.reused,
+                'idle': sum(len(v) for v in self._idle.values()),
+                'groups': len(self._idle),
+            }
+
+    def close(self):
+        """Ferme toutes les instances inactives"""
+        with self._lock:
+            items = [item for idle in self._idle.values() for item in idle]
+            self._idle.clear()
+        for item in items:
+            item.close()
+
+
+class _PooledYoutubeDL:
+    """Instance YoutubeDL du pool, avec des hooks redirigés vers l'appel en cours"""
+
+    def __init__(self, ydl_opts, ydl_class=None):
+        self.ydl = (ydl_class or load_yt_dlp().YoutubeDL)(ydl_opts)
+        self.progress_hooks = []
+        self.post_hooks = []
+        self.ydl.add_progress_hook(self._on_progress)
+        self.ydl.add_post_hook(self._on_post)
+
+    def _on_progress(self, d):
+        for hook in self.progress_hooks:
+            hook(d)
+
+    def _on_post(self, filename):
+        for hook in self.post_hooks:
+            hook(filename)
+
+    def prepare(self, progress_hooks, post_hooks, paths=None):
+        self.progress_hooks = list(progress_hooks or [])
+        self.post_hooks = list(post_hooks or [])
+        # yt-dlp relit 'paths' à chaque nom de fichier : modifiable entre deux appels
+        self.ydl.params['paths'] = dict(paths or {})
+        # Le code retour s'accumule sur la durée de vie de l'instance
+        self.ydl._download_retcode = 0
+
+    def close(self):
+        try:
+            self.ydl.__exit__(None, None, None)
+        except Exception:
+            pass
+
+
+def run_postprocess_task(task):
+    """Exécute une commande ffmpeg préparée par PostProcessingStage (dans un processus du pool)"""
+    result = subprocess.run(task['command'], capture_output=True, text=True,
+                            encoding='utf-8', errors='replace')
+    if result.returncode != 0:
+        if os.path.exists(task['temp_output']):
+            os.remove(task['temp_output'])
+        raise RuntimeError(f"ffmpeg a échoué: {result.stderr.strip()[-500:]}")
+
+    os.replace(task['temp_output'], task['output'])
+    for path in task['cleanup']:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return task['output']
+
+
+class PostProcessingStage:
+    """Étape de post-traitement (conversion audio, fusion vidéo+audio) hors des workers réseau
+
+    Les fichiers bruts téléchargés sont confiés à un pool de processus borné
+    au nombre de cœurs : les téléchargements suivants démarrent pendant que
+    ffmpeg travaille. Une simple copie des flux (remux) est utilisée chaque
+    fois qu'aucun réencodage n'est nécessaire.
+    """
+
+    AUDIO_CODECS = {
+        # format cible -> (préfixes des codecs compatibles, encodeur ffmpeg)
+        'mp3': (('mp3',), 'libmp3lame'),
+        'm4a': (('mp4a', 'aac'), 'aac'),
+    }
+
+    def __init__(self, max_workers=None, audio_quality='192'):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.audio_quality = audio_quality
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, task):
+        """Planifie une tâche ffmpeg, renvoie un Future du fichier produit"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor.submit(run_postprocess_task, task)
+
+    def audio_task(self, source, target_format, acodec=None):
+        """Tâche d'extraction audio, ou None si le fichier est déjà au bon format"""
+        base, ext = os.path.splitext(source)
+        output = f"{base}.{target_format}"
+        compatible, encoder = self.AUDIO_CODECS[target_format]
+        stream_copy = bool(acodec) and acodec.startswith(compatible)
+
+        if stream_copy and ext[1:] == target_format:
+            return None
+
+        if stream_copy:
+            codec_args = ['-c:a', 'copy']
+        else:
+            codec_args = ['-c:a', encoder, '-b:a', f'{self.audio_quality}k']
+
+        return self._task([source], output, ['-vn'] + codec_args)
+
+    def merge_task(self, parts, output):
+        """Tâche de fusion des flux vidéo et audio, toujours sans réencodage"""
+        maps = []
+        for index in range(len(parts)):
+            maps += ['-map', f'{index}:v:0?' if index == 0 else f'{index}:a:0?']
+        return self._task(parts, output, maps + ['-c', 'copy'])
+
+    def _task(self, inputs, output, args):
+        base, ext = os.path.splitext(output)
+        temp_output = f"{base}.temp{ext}"
+        command = ['ffmpeg', '-y', '-loglevel', 'error']
+        for path in inputs:
+            command += ['-i', path]
+        command += args + [temp_output]
+        return {
+            'command': command,
+            'output': output,
+            'temp_output': temp_output,
+            'cleanup': [path for path in inputs if path != output],
+        }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+class BandwidthGovernor:
+    """Limite le débit de tous les téléchargements du processus (seau à jetons)
+
+    Un seau global plafonne le débit total, un seau par job applique une
+    limite individuelle facultative. Chaque transfert consomme des jetons
+    pour les octets reçus et attend s'il n'y en a plus. Les jobs passent au
+    seau global chacun à leur tour (file FIFO, un seul ticket par job) : la
+    bande passante est partagée équitablement entre les jobs, quel que soit
+    leur nombre de connexions. Les limites sont en octets/s, None = illimité,
+    et modifiables à tout moment.
+    """
+
+    def __init__(self, rate=None, job_rate=None, burst=0.25):
+        self.rate = rate
+        self.job_rate = job_rate
+        self.burst = burst
+        self._cond = threading.Condition()
+        self._bucket = {'tokens': 0.0, 'last': time.monotonic()}
+        self._tickets = []
+        self._jobs = {}
+
+    def set_rate(self, rate):
+        """Change la limite globale (None = illimité)"""
+        with self._cond:
+            self.rate = rate or None
+            self._bucket['tokens'] = min(self._bucket['tokens'], self._capacity(self.rate))
+            self._cond.notify_all()
+
+    def set_job_rate(self, job_id, rate):
+        """Change la limite d'un job en cours (None = aucune limite propre)"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job['limit'] = rate or None
+                job['tokens'] = min(job['tokens'], self._capacity(job['limit']))
+            self._cond.notify_all()
+
+    def register(self, job_id, rate=None):
+        with self._cond:
+            if job_id not in self._jobs:
+                now = time.monotonic()
+                self._jobs[job_id] = {
+                    'limit': rate or self.job_rate, 'tokens': 0.0, 'last': now, 'queued': False,
+                    'bytes': 0, 'rate': 0.0, 'window_start': now, 'window_bytes': 0,
+                }
+
+    def release(self, job_id):
+        with self._cond:
+            self._jobs.pop(job_id, None)
+            self._cond.notify_all()
+
+    def consume(self, job_id, nbytes):
+        """Décompte `nbytes` reçus par un job, en attendant si une limite est atteinte"""
+        if nbytes <= 0:
+            return
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                self.register(job_id)
+                job = self._jobs[job_id]
+
+            # Limite propre au job, puis, un job à la fois, le seau global
+            while True:
+                if job['queued']:
+                    self._cond.wait(0.25)
+                    continue
+                wait = self._wait_time(job, job['limit'], nbytes) if job['limit'] else 0.0
+                if wait <= 0:
+                    break
+                self._cond.wait(min(wait, 0.25))
+            if job['limit']:
+                job['tokens'] -= nbytes
+
+            if self.rate:
+                job['queued'] = True
+                ticket = object()
+                self._tickets.append(ticket)
+                try:
+                    while True:
+                        wait = self._wait_time(self._bucket, self.rate, nbytes) if self.rate else 0.0
+                        if self._tickets[0] is ticket and wait <= 0:
+                            break
+                        self._cond.wait(min(wait, 0.25) if wait > 0 else 0.25)
+                    if self.rate:
+                        self._bucket['tokens'] -= nbytes
+                finally:
+                    self._tickets.remove(ticket)
+                    job['queued'] = False
+                    self._cond.notify_all()
+
+            self._account(job, nbytes)
+
+    def progress_hook(self, job_id):
+        """Hook de progression yt-dlp qui décompte les octets reçus par un job"""
+        last = {}
+
+        def hook(d):
+            if d.get('status') != 'downloading':
+                return
+            key = d.get('tmpfilename') or d.get('filename')
+            downloaded = d.get('downloaded_bytes') or 0
+            # Premier rapport d'un fichier : sert de référence (reprise d'un .part)
+            previous = last.get(key, downloaded)
+            last[key] = downloaded
+            self.consume(job_id, downloaded - previous)
+
+        return hook
+
+    def allocation(self):
+        """Limite, part équitable et débit mesuré (octets/s) de chaque job actif"""
+        with self._cond:
+            now = time.monotonic()
+            jobs = {job_id: dict(job) for job_id, job in self._jobs.items()}
+            rate = self.rate
+        shares = self._fair_shares(rate, {job_id: job['limit'] for job_id, job in jobs.items()})
+        return {
+            job_id: {
+                'limit': job['limit'],
+                'share': shares[job_id],
+                # Un job muet depuis plus de 2 s n'a plus de débit
+                'rate': job['rate'] if now - job['window_start'] < 2 else 0.0,
+                'bytes': job['bytes'],
+            }
+            for job_id, job in jobs.items()
+        }
+
+    def _capacity(self, rate):
+        return rate * self.burst if rate else 0.0
+
+    def _wait_time(self, bucket, rate, nbytes):
+        """Remplit le seau et renvoie l'attente nécessaire avant de prendre `nbytes`"""
+        now = time.monotonic()
+        capacity = self._capacity(rate)
+        bucket['tokens'] = min(capacity, bucket['tokens'] + (now - bucket['last']) * rate)
+        bucket['last'] = now
+        # Un bloc plus gros que le seau passe quand celui-ci est plein (dette ensuite)
+        needed = min(nbytes, capacity)
+        return (needed - bucket['tokens']) / rate if bucket['tokens'] < needed else 0.0
+
+    def _account(self, job, nbytes):
+        now = time.monotonic()
+        if not job['bytes']:
+            # La mesure commence au premier octet, pas à l'inscription du job
+            job['window_start'] = now
+        job['bytes'] += nbytes
+        job['window_bytes'] += nbytes
+        elapsed = now - job['window_start']
+        if elapsed >= 0.5:
+            measured = job['window_bytes'] / elapsed
+            job['rate'] = measured if not job['rate'] else 0.7 * job['rate'] + 0.3 * measured
+            job['window_start'] = now
+            job['window_bytes'] = 0
+
+    @staticmethod
+    def _fair_shares(rate, limits):
+        """Partage max-min du débit global entre les jobs, limites propres comprises"""
+        shares = {}
+        remaining = dict(limits)
+        budget = rate
+        while remaining:
+            if budget is None:
+                shares.update(remaining)
+                break
+            equal = budget / len(remaining)
+            capped = {job_id: limit for job_id, limit in remaining.items() if limit and limit < equal}
+            if not capped:
+                shares.update((job_id, equal) for job_id in remaining)
+                break
+            for job_id, limit in capped.items():
+                shares[job_id] = limit
+                budget -= limit
+                del remaining[job_id]
+        return shares
+
+
+class DiskSpaceError(OSError):
+    """Pas assez d'espace disque pour le fichier à télécharger"""
+
+
+class DiskSpaceGuard:
+    """Réservations d'espace disque des téléchargements en cours
+
+    Avant son transfert, chaque job réserve la taille estimée de ses
+    fichiers sur le système de fichiers de destination. Les octets déjà
+    écrits sont déduits de la réservation (ils apparaissent dans l'espace
+    libre). Un job qui ne tient qu'une fois les autres terminés attend ; un
+    job qui ne tiendrait pas même seul est refusé (DiskSpaceError).
+    `min_free` octets restent toujours libres.
+    """
+
+    def __init__(self, min_free=100 * 1024 * 1024):
+        self.min_free = min_free
+        self._cond = threading.Condition()
+        self._reservations = {}  # job_id -> {'device', 'bytes', 'written'}
+
+    @staticmethod
+    def _device(path):
+        path = Path(path)
+        while not path.exists() and path.parent != path:
+            path = path.parent
+        return os.stat(path).st_dev, path
+
+    def _reserved(self, device, exclude=None):
+        return sum(max(r['bytes'] - r['written'](), 0)
+                   for job_id, r in self._reservations.items()
+                   if r['device'] == device and job_id != exclude)
+
+    def free_space(self, path):
+        """Espace libre pour un nouveau fichier sous `path`, réservations déduites"""
+        device, existing = self._device(path)
+        with self._cond:
+            return shutil.disk_usage(existing).free - self._reserved(device) - self.min_free
+
+    def reserve(self, job_id, path, nbytes, written=None, check=None, poll=0.5):
+        """Réserve `nbytes` pour un job sous `path`, en attendant la fin des autres si besoin
+
+        `written()` renvoie les octets déjà écrits par le job ; `check()` est
+        appelé à chaque attente (et peut lever pour l'interrompre).
+        """
+        device, existing = self._device(path)
+        reservation = {'device': device, 'bytes': nbytes or 0, 'written': written or (lambda: 0)}
+        with self._cond:
+            while True:
+                free = shutil.disk_usage(existing).free - self.min_free
+                others = self._reserved(device, exclude=job_id)
+                if reservation['bytes'] <= free - others:
+                    self._reservations[job_id] = reservation
+                    return
+                if not others or reservation['bytes'] > free:
+                    raise DiskSpaceError(
+                        f"espace disque insuffisant : {reservation['bytes'] / 1024 ** 2:.0f} Mo nécessaires, "
+                        f"{max(free, 0) / 1024 ** 2:.0f} Mo disponibles")
+                self._cond.wait(poll)
+                if check is not None:
+                    self._cond.release()
+                    try:
+                        check()
+                    finally:
+                        self._cond.acquire()
+
+    def release(self, job_id):
+        with self._cond:
+            if self._reservations.pop(job_id, None) is not None:
+                self._cond.notify_all()
+
+    def reservations(self):
+        """Octets encore réservés par job"""
+        with self._cond:
+            return {job_id: max(r['bytes'] - r['written'](), 0) for job_id, r in self._reservations.items()}
+
+
+def preallocate(f, size):
+    """Alloue `size` octets au fichier ouvert `f` (les blocs sont réservés quand le système le permet)"""
+    if size and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except OSError as e:
+            # Espace insuffisant : l'erreur remonte ; système de fichiers sans fallocate : repli
+            if e.errno == errno.ENOSPC:
+                raise DiskSpaceError(f"espace disque insuffisant pour {size} octets") from e
+    f.truncate(size)
+
+
+class ContentHash:
+    """Empreinte d'un fichier calculée par blocs, à mesure que les octets sont écrits
+
+    Le fichier est découpé en blocs de BLOCK_SIZE octets ; l'empreinte est le
+    SHA-256 de la suite des SHA-256 des blocs. Seuls les octets d'un même bloc
+    doivent arriver dans l'ordre : des segments alignés sur les blocs,
+    téléchargés en parallèle, donnent la même empreinte qu'une lecture
+    séquentielle du fichier (file_digest).
+    """
+
+    BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self):
+        self.blocks = {}  # index -> empreinte hexadécimale des blocs terminés
+        self._partial = {}  # index -> [sha256, octets reçus]
+        self._lock = threading.Lock()
+        self.valid = True
+
+    def update(self, offset, data):
+        """Ajoute `data`, écrit à la position `offset` du fichier"""
+        view = memoryview(data)
+        while view:
+            index, position = divmod(offset, self.BLOCK_SIZE)
+            length = min(len(view), self.BLOCK_SIZE - position)
+            with self._lock:
+                state = self._partial.get(index)
+                if state is None:
+                    state = self._partial[index] = [hashlib.sha256(), 0]
+            if state[1] != position:
+                # Octets hors d'ordre : l'empreinte devra être recalculée depuis le fichier
+                self.valid = False
+                return
+            state[0].update(view[:length])
+            state[1] += length
+            if state[1] == self.BLOCK_SIZE:
+                with self._lock:
+                    self.blocks[index] = state[0].hexdigest()
+                    del self._partial[index]
+            view = view[length:]
+            offset += length
+
+    def snapshot(self):
+        """Copie des empreintes des blocs terminés"""
+        with self._lock:
+            return dict(self.blocks)
+
+    def reset(self, start, end):
+        """Oublie les blocs de la plage [start, end] (segment recommencé)"""
+        with self._lock:
+            for index in range(start // self.BLOCK_SIZE, end // self.BLOCK_SIZE + 1):
+                self._partial.pop(index, None)
+                self.blocks.pop(index, None)
+
+    def hexdigest(self, total):
+        """Empreinte d'un fichier de `total` octets, ou None s'il manque des blocs"""
+        count = -(-total // self.BLOCK_SIZE)
+        with self._lock:
+            if not self.valid:
+                return None
+            last = self._partial.get(count - 1)
+            if last is not None and last[1] == total - (count - 1) * self.BLOCK_SIZE:
+                self.blocks[count - 1] = last[0].hexdigest()
+                del self._partial[count - 1]
+            if any(index not in self.blocks for index in range(count)):
+                return None
+            leaves = b''.join(bytes.fromhex(self.blocks[index]) for index in range(count))
+        return hashlib.sha256(leaves).hexdigest()
+
+    @classmethod
+    def file_digest(cls, path):
+        """Empreinte d'un fichier existant (une lecture complète)"""
+        content_hash = cls()
+        offset = 0
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(cls.BLOCK_SIZE)
+                if not block:
+                    break
+                content_hash.update(offset, block)
+                offset += len(block)
+        return content_hash.hexdigest(offset)
+
+
+class ContentStore:
+    """Stockage des fichiers téléchargés adressé par leur contenu
+
+    Chaque contenu est rangé une seule fois sous son empreinte (ContentHash) ;
+    les fichiers des dossiers de téléchargement sont des liens physiques vers
+    cet exemplaire : une vidéo présente dans plusieurs playlists n'occupe
+    qu'une fois l'espace disque. Sans lien physique possible (autre disque,
+    système de fichiers qui ne les gère pas), le fichier reste une copie.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def object_path(self, digest, ext=''):
+        return self.root / digest[:2] / (digest + ext)
+
+    def add(self, path, digest):
+        """Range le fichier `path` ; renvoie True s'il partage désormais l'exemplaire stocké"""
+        stored = self.object_path(digest, os.path.splitext(path)[1])
+        try:
+            stored.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(path, stored)
+                return True
+            except FileExistsError:
+                pass
+            if os.path.samefile(stored, path):
+                return True
+            # Contenu déjà stocké : le fichier devient un lien vers l'exemplaire existant
+            return self._link(stored, path)
+        except OSError:
+            return False
+
+    def link(self, digest, ext, target):
+        """Crée `target`, lien vers le contenu stocké ; False si le contenu est absent"""
+        stored = self.object_path(digest, ext)
+        if not stored.exists():
+            return False
+        try:
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+            return self._link(stored, target)
+        except OSError:
+            return False
+
+    def _link(self, stored, target):
+        # Lien créé à côté puis renommé : `target` n'est jamais absent ni incomplet
+        tmp_path = f"{target}.lien"
+        try:
+            os.link(stored, tmp_path)
+            os.replace(tmp_path, target)
+            return True
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+
+    def verify(self, digest, ext=''):
+        """Vérifie que le contenu stocké correspond toujours à son empreinte"""
+        try:
+            return ContentHash.file_digest(self.object_path(digest, ext)) == digest
+        except OSError:
+            return False
+
+    def prune(self):
+        """Supprime les contenus qui ne sont plus liés à aucun fichier ; renvoie les octets libérés"""
+        freed = 0
+        for path in self.root.glob('*/*'):
+            try:
+                stat = path.stat()
+                if stat.st_nlink == 1:
+                    path.unlink()
+                    freed += stat.st_size
+            except OSError:
+                pass
+        return freed
+
+
+class RangeNotSupportedError(Exception):
+    """Le serveur ne gère pas les requêtes partielles (en-tête Range)"""
+
+
+class SegmentedDownloader:
+    """Téléchargement HTTP par plages d'octets sur plusieurs connexions
+
+    Le fichier est préalloué, puis découpé en segments récupérés en
+    parallèle ; chaque segment est écrit directement à sa position. Un petit
+    manifeste JSON à côté du fichier partiel liste les segments terminés : un
+    téléchargement interrompu ne reprend que les segments manquants.
+    """
+
+    def __init__(self, connections=4, segment_size=4 * 1024 * 1024, chunk_size=64 * 1024,
+                 timeout=30, retries=3):
+        self.connections = connections
+        self.segment_size = segment_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+
+    def probe(self, url, headers=None):
+        """Renvoie (URL finale après redirections, taille totale) ou lève RangeNotSupportedError"""
+        request = urllib.request.Request(url, headers=dict(headers or {}, Range='bytes=0-0'))
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            content_range = response.headers.get('Content-Range', '')
+            final_url = response.geturl()
+            status = response.status
+        match = re.match(r'bytes 0-0/(\d+)', content_range)
+        if status != 206 or not match:
+            raise RangeNotSupportedError(url)
+        return final_url, int(match.group(1))
+
+    def download(self, url, filename, headers=None, progress_hook=None, info_dict=None, throttle=None,
+                 metrics=None, content_hash=None):
+        """Télécharge `url` vers `filename` et renvoie le chemin du fichier final
+
+        `throttle(n)` est appelé pour chaque bloc reçu et peut bloquer pour
+        limiter le débit (voir BandwidthGovernor). `metrics` (JobMetrics)
+        reçoit le temps d'écriture disque et les reprises de segments.
+        `content_hash` (ContentHash) reçoit les octets au fil de l'écriture.
+        """
+        headers = dict(headers or {})
+        url, total = self.probe(url, headers)
+        if self.segment_size % ContentHash.BLOCK_SIZE:
+            # Segments non alignés sur les blocs : empreinte calculée après coup
+            content_hash = None
+
+        tmp_filename = filename + '.part'
+        manifest_path = filename + '.part.json'
+        segment_count = max(1, -(-total // self.segment_size))
+        done = self._load_manifest(manifest_path, total, tmp_filename, content_hash)
+
+        if done is None:
+            # Nouveau téléchargement : préallocation du fichier complet
+            Path(filename).parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_filename, 'wb') as f:
+                preallocate(f, total)
+            done = set()
+            self._save_manifest(manifest_path, total, done, content_hash)
+
+        state = {
+            'lock': threading.Lock(),
+            'done': done,
+            'downloaded': sum(self._segment_range(i, total)[1] - self._segment_range(i, total)[0] + 1
+                              for i in done),
+            'start_time': time.time(),
+            'start_bytes': None,
+            'last_report': 0.0,
+            'error': None,
+        }
+        state['start_bytes'] = state['downloaded']
+
+        def report(status='downloading'):
+            if progress_hook is None:
+                return
+            elapsed = time.time() - state['start_time']
+            speed = (state['downloaded'] - state['start_bytes']) / elapsed if elapsed > 0 else None
+            eta = (total - state['downloaded']) / speed if speed else None
+            progress_hook({
+                'status': status,
+                'filename': filename,
+                'tmpfilename': tmp_filename,
+                'downloaded_bytes': state['downloaded'],
+                'resumed_bytes': state['start_bytes'],
+                'total_bytes': total,
+                'speed': speed,
+                'eta': int(eta) if eta is not None else None,
+                'elapsed': elapsed,
+                'info_dict': info_dict or {},
+            })
+
+        pending = queue.SimpleQueue()
+        for index in range(segment_count):
+            if index not in done:
+                pending.put(index)
+
+        abort = threading.Event()
+
+        def worker():
+            connection = None
+            try:
+                with open(tmp_filename, 'r+b') as f:
+                    while not abort.is_set():
+                        try:
+                            index = pending.get_nowait()
+                        except queue.Empty:
+                            return
+                        connection = self._fetch_segment(url, headers, index, total, f,
+                                                         connection, state, report, abort, throttle,
+                                                         metrics, content_hash)
+                        with state['lock']:
+                            state['done'].add(index)
+                            self._save_manifest(manifest_path, total, state['done'], content_hash)
+            except BaseException as e:
+                # Une erreur sur un segment arrête les autres connexions
+                with state['lock']:
+                    if not abort.is_set():
+                        state['error'] = e
+                        abort.set()
+                raise
+            finally:
+                if connection is not None:
+                    connection.close()
+
+        workers = min(self.connections, segment_count - len(done)) or 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='segment') as executor:
+            futures = [executor.submit(worker) for _ in range(workers)]
+        if state['error'] is not None:
+            raise state['error']
+        for future in futures:
+            future.result()
+
+        if len(state['done']) != segment_count:
+            raise OSError(f"téléchargement incomplet : {len(state['done'])}/{segment_count} segments")
+
+        os.replace(tmp_filename, filename)
+        os.remove(manifest_path)
+        report('finished')
+        return filename
+
+    def _segment_range(self, index, total):
+        start = index * self.segment_size
+        return start, min(start + self.segment_size, total) - 1
+
+    def _connect(self, url):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme == 'https':
+            return http.client.HTTPSConnection(parts.hostname, parts.port, timeout=self.timeout,
+                                               context=ssl.create_default_context())
+        return http.client.HTTPConnection(parts.hostname, parts.port, timeout=self.timeout)
+
+    def _fetch_segment(self, url, headers, index, total, f, connection, state, report, abort,
+                       throttle=None, metrics=None, content_hash=None):
+        """Télécharge un segment et l'écrit à sa position ; renvoie la connexion à réutiliser"""
+        start, end = self._segment_range(index, total)
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        for attempt in range(self.retries + 1):
+            written = 0
+            write_time = 0.0
+            try:
+                if connection is None:
+                    connection = self._connect(url)
+                connection.request('GET', path, headers=dict(headers, Range=f'bytes={start}-{end}'))
+                response = connection.getresponse()
+                if response.status != 206:
+                    response.read()
+                    raise RangeNotSupportedError(f"HTTP {response.status} pour la plage {start}-{end}")
+
+                f.seek(start)
+                while not abort.is_set():
+                    chunk = response.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    write_start = time.perf_counter()
+                    f.write(chunk)
+                    write_time += time.perf_counter() - write_start
+                    if content_hash is not None:
+                        content_hash.update(start + written, chunk)
+                    written += len(chunk)
+                    with state['lock']:
+                        state['downloaded'] += len(chunk)
+                        now = time.time()
+                        if now - state['last_report'] >= 0.1:
+                            state['last_report'] = now
+                            report()
+                    if throttle is not None:
+                        throttle(len(chunk))
+
+                if written != end - start + 1:
+                    raise OSError(f"segment {index} incomplet ({written}/{end - start + 1} octets)")
+                if metrics is not None:
+                    metrics.add('write', write_time)
+                return connection
+
+            except (OSError, http.client.HTTPException):
+                # Segment à refaire en entier sur une nouvelle connexion
+                with state['lock']:
+                    state['downloaded'] -= written
+                if content_hash is not None:
+                    content_hash.reset(start, end)
+                if connection is not None:
+                    connection.close()
+                    connection = None
+                if attempt == self.retries or abort.is_set():
+                    raise
+                if metrics is not None:
+                    metrics.add_retry()
+                time.sleep(min(2 ** attempt, 10))
+
+    def _load_manifest(self, manifest_path, total, tmp_filename, content_hash=None):
+        """Segments déjà terminés d'un téléchargement interrompu, ou None"""
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (manifest.get('total') != total or manifest.get('segment_size') != self.segment_size
+                or not os.path.exists(tmp_filename)):
+            return None
+        if content_hash is not None:
+            content_hash.blocks.update((int(index), digest) for index, digest in manifest.get('blocks', {}).items())
+        return set(manifest.get('done', []))
+
+    def _save_manifest(self, manifest_path, total, done, content_hash=None):
+        manifest = {'total': total, 'segment_size': self.segment_size, 'done': sorted(done)}
+        if content_hash is not None:
+            # Empreintes des blocs terminés : une reprise n'a pas à relire le fichier
+            manifest['blocks'] = content_hash.snapshot()
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+
+class FormatRecord:
+    """Description compacte d'un format proposé par yt-dlp"""
+
+    __slots__ = ('format_id', 'ext', 'height', 'fps', 'vcodec', 'acodec', 'tbr', 'abr',
+                 'filesize', 'size_is_estimate')
+
+    def __init__(self, fmt, duration=None):
+        self.format_id = fmt.get('format_id')
+        self.ext = fmt.get('ext')
+        self.height = fmt.get('height')
+        self.fps = fmt.get('fps')
+        self.vcodec = fmt.get('vcodec') or 'none'
+        self.acodec = fmt.get('acodec') or 'none'
+        self.tbr = fmt.get('tbr') or ((fmt.get('vbr') or 0) + (fmt.get('abr') or 0)) or None
+        self.abr = fmt.get('abr')
+
+        # Taille exacte si connue, sinon estimée depuis le débit et la durée
+        self.filesize = fmt.get('filesize') or fmt.get('filesize_approx')
+        self.size_is_estimate = not fmt.get('filesize')
+        if not self.filesize and self.tbr and duration:
+            self.filesize = int(self.tbr * 1000 / 8 * duration)
+
+    @property
+    def has_video(self):
+        return self.vcodec != 'none' and bool(self.height)
+
+    @property
+    def has_audio(self):
+        return self.acodec != 'none'
+
+    def codec_family(self, codec):
+        return codec.split('.')[0].lower() if codec else 'none'
+
+    def __repr__(self):
+        return f"FormatRecord({self.format_id!r}, {self.height}p, {self.vcodec}/{self.acodec}, {self.filesize})"
+
+
+class FormatChoice:
+    """Un ou deux formats (vidéo + audio) retenus ensemble"""
+
+    def __init__(self, records):
+        self.records = records
+        sizes = [r.filesize for r in records]
+        self.estimated_size = sum(sizes) if all(sizes) else None
+
+    @property
+    def format_spec(self):
+        return '+'.join(r.format_id for r in self.records)
+
+    @property
+    def height(self):
+        return max((r.height or 0) for r in self.records)
+
+
+class FormatSelector:
+    """Classe les formats d'une vidéo selon la qualité demandée et des contraintes
+
+    Les candidats (formats progressifs et paires vidéo + audio) sont classés
+    par résolution la plus proche de la cible, puis conteneur, codec, débit et
+    taille estimée. `max_filesize` (octets) écarte les candidats trop gros ;
+    `prefer_efficient` choisit, à résolution égale, le plus petit fichier,
+    ce qui favorise AV1/VP9 quand ils sont effectivement plus légers.
+    """
+
+    VIDEO_CODEC_EFFICIENCY = {'av01': 3, 'vp09': 2, 'vp9': 2, 'hev1': 2, 'hvc1': 2, 'avc1': 1, 'h264': 1}
+    AUDIO_CODEC_PREFERENCE = {'mp4a': 2, 'aac': 2, 'opus': 1}
+
+    # Conteneur audio qui accompagne naturellement chaque conteneur vidéo
+    AUDIO_EXT_FOR = {'mp4': 'm4a', 'webm': 'webm'}
+
+    def __init__(self, quality='720p', format_type='mp4', max_filesize=None, prefer_efficient=False):
+        self.quality = quality
+        self.format_type = format_type
+        self.max_filesize = max_filesize
+        self.prefer_efficient = prefer_efficient
+
+    @property
+    def target_height(self):
+        if self.quality == 'best':
+            return None
+        try:
+            return int(self.quality.rstrip('p'))
+        except ValueError:
+            return None
+
+    def records(self, info):
+        duration = info.get('duration')
+        return [FormatRecord(f, duration) for f in info.get('formats') or []
+                if f.get('format_id') and f.get('protocol') != 'mhtml']
+
+    def rank(self, info):
+        """Renvoie les FormatChoice candidats, du meilleur au moins bon"""
+        records = self.records(info)
+        if self.format_type in ('mp3', 'm4a'):
+            candidates = self._audio_candidates(records)
+        else:
+            candidates = self._video_candidates(records)
+
+        if self.max_filesize:
+            fitting = [c for c in candidates
+                       if c.estimated_size is None or c.estimated_size <= self.max_filesize]
+            if fitting:
+                candidates = fitting
+            else:
+                # Rien ne tient dans la limite : le plus petit fichier disponible
+                candidates = sorted((c for c in candidates if c.estimated_size),
+                                    key=lambda c: c.estimated_size)[:1] or candidates
+
+        return candidates
+
+    def select(self, info):
+        """Spécification de format yt-dlp du meilleur candidat, ou None"""
+        candidates = self.rank(info)
+        return candidates[0].format_spec if candidates else None
+
+    def _audio_candidates(self, records):
+        audio = [r for r in records if r.has_audio and not r.has_video]
+        if not audio:
+            audio = [r for r in records if r.has_audio]
+
+        def key(r):
+            # Pour m4a, un flux AAC évite tout réencodage
+            codec_bonus = self.AUDIO_CODEC_PREFERENCE.get(r.codec_family(r.acodec), 0) \
+                if self.format_type == 'm4a' else 0
+            return (codec_bonus, r.abr or r.tbr or 0, -(r.filesize or 0))
+
+        return [FormatChoice([r]) for r in sorted(audio, key=key, reverse=True)]
+
+    def _video_candidates(self, records):
+        target = self.target_height
+        videos = [r for r in records if r.has_video]
+        if target is not None:
+            within = [r for r in videos if r.height <= target]
+            videos = within or sorted(videos, key=lambda r: r.height)[:1]
+
+        audio_only = [r for r in records if r.has_audio and not r.has_video]
+        wanted_audio_ext = self.AUDIO_EXT_FOR.get(self.format_type)
+        best_audio = sorted(audio_only, key=lambda r: (r.ext == wanted_audio_ext, r.abr or r.tbr or 0),
+                            reverse=True)[:1]
+
+        candidates = []
+        for video in videos:
+            if video.has_audio:
+                candidates.append(FormatChoice([video]))
+            elif best_audio:
+                candidates.append(FormatChoice([video, best_audio[0]]))
+
+        candidates.sort(key=self._video_key, reverse=True)
+        return candidates
+
+    def _video_key(self, choice):
+        video = choice.records[0]
+        efficiency = self.VIDEO_CODEC_EFFICIENCY.get(video.codec_family(video.vcodec), 0)
+        ext_match = video.ext == self.format_type
+        single_file = len(choice.records) == 1
+        size = choice.estimated_size or 0
+
+        if self.prefer_efficient:
+            return (choice.height, -size, efficiency, video.tbr or 0)
+        return (choice.height, ext_match, single_file, video.fps or 0, video.tbr or 0)
+
+
+class ThumbnailCache:
+    """Miniatures des vidéos : cache disque borné en taille et LRU mémoire d'images décodées
+
+    Les images sont téléchargées en arrière-plan par un petit pool de threads
+    partageant une session HTTP (connexions réutilisées), conservées telles
+    quelles sur disque (les plus anciennes sont évincées au-delà de
+    `max_bytes`), puis décodées et réduites une seule fois : revenir sur une
+    page déjà vue ne coûte ni téléchargement ni décodage. Pillow et requests
+    sont importés au premier usage.
+    """
+
+    def __init__(self, path=os.path.join('cache', 'miniatures'), max_bytes=50 * 1024 * 1024,
+                 memory_items=300, max_workers=4, timeout=10):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.hits = 0
+        self.disk_hits = 0
+        self.downloads = 0
+
+        self._lock = threading.Lock()
+        self._images = OrderedDict()  # (url, taille) -> image PIL réduite
+        self._pending = {}  # (url, taille) -> Future
+        self._files = None  # nom de fichier -> (taille, date d'accès), lu au premier usage
+        self._disk_bytes = 0
+        self._executor = None
+        self._session = None
+
+    def get_cached(self, url, size):
+        """Image déjà décodée à cette taille, ou None (sans bloquer)"""
+        with self._lock:
+            image = self._images.get((url, size))
+            if image is not None:
+                self._images.move_to_end((url, size))
+                self.hits += 1
+            return image
+
+    def load(self, url, size=(160, 90)):
+        """Renvoie un Future de l'image PIL réduite à `size` (None si indisponible)"""
+        key = (url, tuple(size))
+        image = self.get_cached(*key)
+        if image is not None:
+            future = Future()
+            future.set_result(image)
+            return future
+
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='miniature')
+                future = self._executor.submit(self._load, key)
+                self._pending[key] = future
+                future.add_done_callback(lambda _: self._forget_pending(key))
+            return future
+
+    def _forget_pending(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _load(self, key):
+        url, size = key
+        try:
+            data = self._read_disk(url)
+            if data is None:
+                data = self._download(url)
+                if data is None:
+                    return None
+                self._write_disk(url, data)
+
+            from PIL import Image
+            image = Image.open(io.BytesIO(data))
+            image.draft('RGB', size)  # décodage JPEG directement à échelle réduite
+            image = image.convert('RGB')
+            image.thumbnail(size)
+        except Exception as e:
+            print(f"Miniature indisponible ({url}): {e}")
+            return None
+
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self.memory_items:
+                self._images.popitem(last=False)
+        return image
+
+    def _download(self, url):
+        with self._lock:
+            if self._session is None:
+                import requests
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            session = self._session
+
+        response = session.get(url, timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        self.downloads += 1
+        return response.content
+
+    def _filename(self, url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest() + '.img'
+
+    def _scan(self):
+        """Inventaire du dossier de cache (appelé sous verrou)"""
+        if self._files is not None:
+            return
+        self._files = {}
+        self._disk_bytes = 0
+        try:
+            entries = list(os.scandir(self.path))
+        except OSError:
+            entries = []
+        for entry in entries:
+            if entry.name.endswith('.img'):
+                stat = entry.stat()
+                self._files[entry.name] = (stat.st_size, stat.st_mtime)
+                self._disk_bytes += stat.st_size
+
+    def _read_disk(self, url):
+        name = self._filename(url)
+        with self._lock:
+            self._scan()
+            if name not in self._files:
+                return None
+            size, _ = self._files[name]
+            self._files[name] = (size, time.time())
+        try:
+            with open(self.path / name, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        self.disk_hits += 1
+        return data
+
+    def _write_disk(self, url, data):
+        name = self._filename(url)
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path / (name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path / name)
+        except OSError as e:
+            print(f"Impossible d'écrire la miniature en cache: {e}")
+            return
+
+        to_remove = []
+        with self._lock:
+            self._scan()
+            previous = self._files.get(name)
+            if previous:
+                self._disk_bytes -= previous[0]
+            self._files[name] = (len(data), time.time())
+            self._disk_bytes += len(data)
+
+            # Éviction des miniatures les moins récemment utilisées
+            if self._disk_bytes > self.max_bytes:
+                for old_name, (old_size, _) in sorted(self._files.items(), key=lambda item: item[1][1]):
+                    if self._disk_bytes <= self.max_bytes:
+                        break
+                    if old_name == name:
+                        continue
+                    del self._files[old_name]
+                    self._disk_bytes -= old_size
+                    to_remove.append(old_name)
+
+        for old_name in to_remove:
+            try:
+                os.remove(self.path / old_name)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'memory_items': len(self._images),
+                'disk_bytes': self._disk_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'downloads': self.downloads,
+            }
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            session, self._session = self._session, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        if session is not None:
+            session.close()
+
+
+class VideoAnalysis:
+    """Résultat d'une analyse, réutilisable tel quel par download()
+
+    `info` contient le dictionnaire brut renvoyé par l'extracteur (formats
+    compris) : le téléchargement le fait traiter directement par yt-dlp au
+    lieu de ré-extraire la vidéo. `summary` est le résumé affiché à
+    l'utilisateur, identique au retour de get_video_info().
+    """
+
+    # Les URLs de flux YouTube expirent au bout d'environ 6 heures
+    MAX_AGE = 4 * 3600
+
+    def __init__(self, url, info, summary, is_playlist=False):
+        self.url = url
+        self.info = info
+        self.summary = summary
+        self.is_playlist = is_playlist
+        self.created_at = time.time()
+
+    @property
+    def video_id(self):
+        return self.info.get('id') if self.info else None
+
+    def is_reusable(self):
+        """Indique si les infos extraites peuvent encore servir au téléchargement"""
+        return self.info is not None and time.time() - self.created_at < self.MAX_AGE
 
 
 class YouTubeDownloader:
-    def __init__(self):
+    def __init__(self, max_workers=3, metadata_cache=None, max_analyses=50, ydl_pool=None,
+                 download_index=None, segmented_connections=0, post_processing_workers=None,
+                 max_filesize_mb=None, prefer_efficient_codecs=False, max_rate=None, max_rate_per_job=None,
+                 metrics_sink=None, thumbnail_cache=None, temp_dir=None, min_free_space_mb=100,
+                 content_store=False, max_retries=4, journal=None, playlist_snapshots=None):
         self.ydl_opts_base = {
             'outtmpl': '%(title)s.%(ext)s',
             'ignoreerrors': True,
@@ -17,6 +2714,60 @@ class YouTubeDownloader:
             'format': 'best',
             'noplaylist': True,
         }
+        self.progress_bus = ProgressBus()
+        self.scheduler = DownloadScheduler(self._run_job, max_workers=max_workers,
+                                           progress_bus=self.progress_bus, on_finish=self._job_finished,
+                                           retry_policy=RetryPolicy(max_retries=max_retries))
+        self.ydl_pool = ydl_pool if ydl_pool is not None else YoutubeDLPool()
+        self.metadata_cache = metadata_cache if metadata_cache is not None else MetadataCache()
+        self.download_index = download_index if download_index is not None else DownloadIndex()
+        self.metrics_sink = metrics_sink if metrics_sink is not None else MetricsSink()
+        self.thumbnails = thumbnail_cache if thumbnail_cache is not None else ThumbnailCache()
+
+        # Journal des jobs : chaque changement d'état est écrit, pour la reprise après un arrêt
+        self.journal = journal if journal is not None else JobJournal()
+        self.progress_bus.subscribe(self.journal)
+
+        # Entrées déjà vues des playlists synchronisées (sync_playlist)
+        self.playlist_snapshots = playlist_snapshots if playlist_snapshots is not None else PlaylistSnapshots()
+
+        self.post_processing = PostProcessingStage(max_workers=post_processing_workers)
+
+        # Débit total et par job (octets/s), partagé par tous les transferts
+        self.bandwidth = BandwidthGovernor(rate=max_rate, job_rate=max_rate_per_job)
+
+        # Fichiers en cours d'écriture : dossier temporaire sur le même disque que la
+        # destination, puis renommage atomique ; espace disque réservé par job.
+        # Par défaut à côté du journal, qui permet de retrouver ces fichiers au redémarrage,
+        # et en chemin absolu : un changement de dossier courant ne le déplace pas
+        if temp_dir is None:
+            temp_dir = self.journal.path.parent / 'temp'
+        self.temp_dir = Path(os.path.abspath(temp_dir))
+        self.disk = DiskSpaceGuard(min_free=min_free_space_mb * 1024 * 1024)
+
+        # Stockage par contenu, sur demande (dossier .store de chaque dossier de
+        # téléchargement) : une vidéo de plusieurs playlists n'est écrite qu'une fois,
+        # au prix d'une relecture des fichiers qui ne passent pas par le téléchargement segmenté
+        self.content_store = content_store
+        self._stores = {}
+        self._stores_lock = threading.Lock()
+
+        # Contraintes du choix de format (taille maximale, codecs plus efficaces)
+        self.max_filesize_mb = max_filesize_mb
+        self.prefer_efficient_codecs = prefer_efficient_codecs
+
+        # Téléchargement multi-connexions des formats progressifs (0 = désactivé)
+        self.segmented_downloader = (SegmentedDownloader(connections=segmented_connections)
+                                     if segmented_connections > 1 else None)
+
+        # Téléchargements en cours par (ID, variante), pour ne pas récupérer deux fois la même vidéo
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+        # Analyses de la session, par ID de vidéo, pour ne pas ré-extraire au téléchargement
+        self.max_analyses = max_analyses
+        self._analyses = OrderedDict()
+        self._analyses_lock = threading.Lock()
 
     def sanitize_filename(self, filename):
         """Nettoie le nom de fichier pour éviter les caractères problématiques"""
@@ -29,57 +2780,181 @@ class YouTubeDownloader:
             filename = filename[:200]
         return filename
 
+    def _cache_key(self, kind, url):
+        """Clé de cache basée sur l'ID YouTube, ou None si l'URL n'en contient pas"""
+        if kind == 'video':
+            item_id = self.extract_video_id(url)
+        else:
+            item_id = self.extract_playlist_id(url)
+        return f"{kind}:{item_id}" if item_id else None
+
     def get_video_info(self, url, is_playlist=False):
         """Récupère les informations d'une vidéo ou playlist YouTube"""
+        key = self._cache_key('playlist_preview' if is_playlist else 'video', url)
+        if key:
+            cached = self.metadata_cache.get(key)
+            if cached is not None:
+                return cached
+
+        if not is_playlist:
+            analysis = self.analyze(url)
+            return analysis.summary if analysis else None
+
+        result = self._fetch_video_info(url, is_playlist)
+        if key and result:
+            self.metadata_cache.put(key, result)
+        return result
+
+    def analyze(self, url, is_playlist=False):
+        """Analyse une URL et renvoie un VideoAnalysis utilisable par download()"""
+        if is_playlist:
+            summary = self.get_video_info(url, is_playlist=True)
+            return VideoAnalysis(url, None, summary, is_playlist=True) if summary else None
+
+        # Analyse encore valide de la session, puis résumé en cache : pas d'extraction
+        analysis = self._find_analysis(url)
+        if analysis is not None:
+            if analysis.url != url:
+                analysis = copy.copy(analysis)
+                analysis.url = url
+            return analysis
+        key = self._cache_key('video', url)
+        if key:
+            summary = self.metadata_cache.get(key)
+            if summary is not None:
+                # Sans infos brutes : le téléchargement fera l'extraction
+                return VideoAnalysis(url, None, summary)
+
         try:
             ydl_opts = {
                 'quiet': True,
                 'no_warnings': True,
-                'extract_flat': False,
-                'playliststart': 1,
-                'playlistend': 5 if is_playlist else 1,  # Limiter pour l'aperçu
+                'noplaylist': True,
             }
 
-            if not is_playlist:
-                ydl_opts['noplaylist'] = True
+            # process=False : on garde le résultat brut de l'extracteur, que
+            # process_ie_result() saura traiter plus tard pour le téléchargement
+            with self.ydl_pool.session(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False, process=False)
 
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            if not info:
+                return None
 
-                if not info:
+            if info.get('_type', 'video') == 'video':
+                info = load_yt_dlp().YoutubeDL.sanitize_info(info)
+                summary = self._summarize_video(info)
+            else:
+                # Redirection vers une autre URL : pas de résultat réutilisable
+                info = None
+                summary = self._fetch_video_info(url)
+                if not summary:
                     return None
 
-                # Si c'est une playlist
-                if is_playlist and 'entries' in info:
-                    first_video = None
-                    for entry in info['entries']:
-                        if entry:
-                            first_video = entry
-                            break
+        except Exception as e:
+            print(f"Erreur lors de l'extraction des informations: {e}")
+            return None
 
-                    if first_video:
-                        result = {
-                            'title': first_video.get('title', 'Titre non disponible'),
-                            'uploader': first_video.get('uploader', 'Auteur non disponible'),
-                            'duration_string': self.format_duration(first_video.get('duration', 0)),
-                            'view_count': first_video.get('view_count', 0),
-                            'playlist_title': info.get('title', 'Playlist sans titre'),
-                            'playlist_count': info.get('playlist_count', len([e for e in info['entries'] if e])),
-                            'formats': self.get_available_formats(first_video)
-                        }
-                    else:
-                        return None
-                else:
-                    # Vidéo simple
-                    result = {
-                        'title': info.get('title', 'Titre non disponible'),
-                        'uploader': info.get('uploader', 'Auteur non disponible'),
-                        'duration_string': self.format_duration(info.get('duration', 0)),
-                        'view_count': info.get('view_count', 0),
-                        'formats': self.get_available_formats(info)
-                    }
+        analysis = VideoAnalysis(url, info, summary)
+        self._remember_analysis(analysis)
 
-                return result
+        if key:
+            self.metadata_cache.put(key, summary)
+        return analysis
+
+    def _remember_analysis(self, analysis):
+        if not analysis.video_id:
+            return
+        with self._analyses_lock:
+            self._analyses[analysis.video_id] = analysis
+            self._analyses.move_to_end(analysis.video_id)
+            while len(self._analyses) > self.max_analyses:
+                self._analyses.popitem(last=False)
+
+    def _forget_analysis(self, url):
+        """Oublie l'analyse et le résumé en cache d'une URL (pour forcer une nouvelle extraction)"""
+        video_id = self.extract_video_id(url)
+        if video_id:
+            with self._analyses_lock:
+                self._analyses.pop(video_id, None)
+        key = self._cache_key('video', url)
+        if key:
+            self.metadata_cache.invalidate(key)
+
+    def _find_analysis(self, url):
+        """Retrouve une analyse encore valide de la session pour cette URL"""
+        video_id = self.extract_video_id(url)
+        if not video_id:
+            return None
+        with self._analyses_lock:
+            analysis = self._analyses.get(video_id)
+        if analysis and analysis.is_reusable():
+            return analysis
+        return None
+
+    def _summarize_video(self, info):
+        """Résumé affichable d'un dictionnaire d'informations de vidéo"""
+        return {
+            'title': info.get('title', 'Titre non disponible'),
+            'uploader': info.get('uploader', 'Auteur non disponible'),
+            'duration_string': self.format_duration(info.get('duration', 0)),
+            'view_count': info.get('view_count', 0),
+            'thumbnail': self.get_thumbnail_url(info['id'], 'hqdefault') if info.get('id') else info.get('thumbnail'),
+            'formats': self.get_available_formats(info)
+        }
+
+    def _fetch_video_info(self, url, is_playlist=False):
+        """Extrait les informations d'une vidéo ou playlist via yt-dlp (sans cache)"""
+        if is_playlist:
+            return self._fetch_playlist_preview(url)
+
+        try:
+            ydl_opts = {
+                'quiet': True,
+                'no_warnings': True,
+                'noplaylist': True,
+            }
+
+            with self.ydl_pool.session(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False)
+
+            if not info:
+                return None
+
+            return self._summarize_video(info)
+
+        except Exception as e:
+            print(f"Erreur lors de l'extraction des informations: {e}")
+            return None
+
+    def _fetch_playlist_preview(self, url):
+        """Aperçu d'une playlist : sa première vidéo, trouvée par énumération à plat"""
+        try:
+            entries = self.iter_playlist_entries(url)
+            try:
+                first_entry = next(entries, None)
+            finally:
+                entries.close()
+
+            if not first_entry:
+                return None
+
+            # Seule la première vidéo est extraite en détail
+            analysis = self.analyze(first_entry['url'])
+            if analysis:
+                result = dict(analysis.summary)
+            else:
+                result = {
+                    'title': first_entry['title'] or 'Titre non disponible',
+                    'uploader': 'Auteur non disponible',
+                    'duration_string': self.format_duration(first_entry['duration']),
+                    'view_count': 0,
+                    'thumbnail': self.get_thumbnail_url(first_entry['id'], 'hqdefault') if first_entry['id'] else None,
+                    'formats': [],
+                }
+
+            result['playlist_title'] = first_entry['playlist_title'] or 'Playlist sans titre'
+            result['playlist_count'] = first_entry['playlist_count'] or 'inconnu'
+            return result
 
         except Exception as e:
             print(f"Erreur lors de l'extraction des informations: {e}")
@@ -90,6 +2965,7 @@ class YouTubeDownloader:
         if not seconds:
             return "Durée inconnue"
 
+        seconds = int(seconds)
         hours = seconds // 3600
         minutes = (seconds % 3600) // 60
         seconds = seconds % 60
@@ -100,19 +2976,37 @@ class YouTubeDownloader:
             return f"{minutes:02d}:{seconds:02d}"
 
     def get_available_formats(self, info):
-        """Récupère les formats disponibles"""
+        """Récupère les formats disponibles (le meilleur candidat par résolution)"""
+        selector = FormatSelector('best', 'mp4')
         formats = []
-        if 'formats' in info:
-            seen_qualities = set()
-            for f in info['formats']:
-                if f.get('height') and f.get('ext'):
-                    quality = f"{f['height']}p"
-                    if quality not in seen_qualities:
-                        formats.append(f"{quality} ({f['ext']})")
-                        seen_qualities.add(quality)
+        seen_qualities = set()
+        for choice in selector.rank(info):
+            video = choice.records[0]
+            quality = f"{video.height}p"
+            if quality in seen_qualities:
+                continue
+            seen_qualities.add(quality)
+
+            details = [video.ext, video.codec_family(video.vcodec)]
+            if choice.estimated_size:
+                details.append(f"~{self.format_size(choice.estimated_size)}")
+            formats.append(f"{quality} ({', '.join(details)})")
 
         return formats[:10]  # Limiter à 10 formats
 
+    def format_size(self, size):
+        """Formate une taille en octets en format lisible"""
+        for unit in ('o', 'Ko', 'Mo', 'Go'):
+            if size < 1024 or unit == 'Go':
+                return f"{size:.0f} {unit}" if unit == 'o' else f"{size:.1f} {unit}"
+            size /= 1024
+
+    def format_selector(self, quality, format_type):
+        """FormatSelector configuré avec les contraintes du téléchargeur"""
+        max_filesize = self.max_filesize_mb * 1024 * 1024 if self.max_filesize_mb else None
+        return FormatSelector(quality, format_type, max_filesize=max_filesize,
+                              prefer_efficient=self.prefer_efficient_codecs)
+
     def get_format_selector(self, quality, format_type):
         """Retourne le sélecteur de format pour yt-dlp"""
 
@@ -139,99 +3033,868 @@ class YouTubeDownloader:
 
         return '/'.join(format_selectors)
 
-    def download(self, url, output_path, quality='720p', format_type='mp4', is_playlist=False, progress_callback=None):
-        """Télécharge une vidéo ou playlist YouTube"""
+    def build_ydl_opts(self, output_path, quality='720p', format_type='mp4', subfolder=None):
+        """Construit les options yt-dlp pour télécharger une seule vidéo"""
+        ydl_opts = self.ydl_opts_base.copy()
+
+        # Chemin de sortie (les '%' du sous-dossier sont échappés pour le modèle yt-dlp)
+        output_path = Path(output_path)
+        if subfolder:
+            output_path = output_path / subfolder.replace('%', '%%')
+        ydl_opts['outtmpl'] = str(output_path / '%(title)s.%(ext)s')
+        ydl_opts['noplaylist'] = True
+
+        # Format
+        ydl_opts['format'] = self.get_format_selector(quality, format_type)
+
+        # Formats audio : le flux brut est téléchargé, la conversion se fait
+        # ensuite dans l'étape de post-traitement
+        if format_type == 'mp3':
+            ydl_opts['format'] = 'bestaudio/best'
+        elif format_type == 'm4a':
+            ydl_opts['format'] = 'bestaudio[ext=m4a]/bestaudio/best'
+
+        # Sous limitation de débit, des blocs de taille fixe gardent un flux régulier
+        # (yt-dlp agrandit sinon ses blocs de lecture jusqu'à plusieurs Mo)
+        if self.bandwidth.rate or self.bandwidth.job_rate:
+            ydl_opts['buffersize'] = 64 * 1024
+            ydl_opts['noresizebuffer'] = True
+
+        return ydl_opts
+
+    def _run_job(self, job):
+        """Télécharge la vidéo d'un job (appelé depuis un worker du planificateur)"""
+        variant = DownloadIndex.variant_for(job.quality, job.format_type)
+
+        # Index local d'abord : aucune requête réseau si la vidéo est déjà là
+        if job.video_id:
+            self._claim_inflight(job, variant)
+        pending = None
         try:
-            # Créer le dossier de sortie
-            output_path = Path(output_path)
-            output_path.mkdir(parents=True, exist_ok=True)
+            if job.video_id:
+                record = job.index_record or self.download_index.lookup(job.video_id, variant)
+                if record:
+                    job.mark_skipped(self._link_existing(job, record))
+                    return None
+            self.bandwidth.register(job.id)
+            try:
+                pending = self._download_job(job, variant)
+            except JobInterrupted as e:
+                if e.action == 'cancel':
+                    self.remove_partial_files(job)
+                raise
+            finally:
+                self.bandwidth.release(job.id)
+                if pending is None:
+                    self.disk.release(job.id)
+            if pending is not None:
+                # Réservation gardée jusqu'à la fin de la fusion ou de la conversion
+                pending.add_done_callback(lambda future: self.disk.release(job.id))
+            return pending
+        finally:
+            if job.video_id:
+                if pending is None:
+                    self._release_inflight(job, variant)
+                else:
+                    pending.add_done_callback(lambda future: self._release_inflight(job, variant))
 
-            # Configuration yt-dlp
-            ydl_opts = self.ydl_opts_base.copy()
+    def _job_finished(self, job):
+        """Appelé par le planificateur à la fin de chaque job"""
+        self.metrics_sink.record(job)
+        if job.status == DownloadJob.FAILED and job.staging_dir is not None:
+            # Échec définitif (essais épuisés) : aucune reprise ne réutilisera les fichiers partiels
+            shutil.rmtree(job.staging_dir, ignore_errors=True)
 
-            # Chemin de sortie
-            if is_playlist:
-                ydl_opts['outtmpl'] = str(output_path / '%(playlist_title)s/%(title)s.%(ext)s')
-                ydl_opts['noplaylist'] = False
+    def _claim_inflight(self, job, variant):
+        """Réserve la vidéo pour ce job, après la fin d'un autre job qui la téléchargerait déjà"""
+        key = (job.video_id, variant)
+        while True:
+            with self._inflight_lock:
+                other = self._inflight.get(key)
+                if other is None:
+                    self._inflight[key] = job
+                    return
+            # Attente bornée : un job mis en pause libère la vidéo sans se terminer
+            other.wait(0.5)
+            job.check_control()
+
+    def _release_inflight(self, job, variant):
+        with self._inflight_lock:
+            if self._inflight.get((job.video_id, variant)) is job:
+                del self._inflight[(job.video_id, variant)]
+
+    def _download_job(self, job, variant):
+        """Transfert réseau d'un job ; renvoie un Future si un post-traitement reste à faire
+
+        Tous les fichiers du job (partiels, flux séparés, conversion) sont
+        écrits dans son dossier temporaire ; seul le fichier final est déplacé
+        dans le dossier de destination.
+        """
+        final_dir = self._final_dir(job)
+        staging_dir = self.staging_dir(job, final_dir)
+        ydl_opts = self.build_ydl_opts(job.output_path, job.quality, job.format_type)
+        # Les erreurs remontent telles quelles : le planificateur décide d'un nouvel essai
+        ydl_opts['ignoreerrors'] = False
+        # Modèle relatif et dossier passé à part : l'instance du pool reste la même d'un job à l'autre
+        ydl_opts['outtmpl'] = '%(title)s.%(ext)s'
+        ydl_opts['paths'] = {'home': str(staging_dir)}
+        ydl_opts['progress_hooks'] = [self.bandwidth.progress_hook(job.id), job.update_progress]
+        downloaded = []
+        ydl_opts['post_hooks'] = [downloaded.append]
+
+        if job.attempts:
+            # Nouvel essai : les URLs signées de l'analyse ont pu expirer (403, 429), on réextrait
+            analysis = job.analysis = None
+            self._forget_analysis(job.url)
+        else:
+            analysis = job.analysis if job.analysis and job.analysis.is_reusable() else None
+            if analysis is None:
+                analysis = self._find_analysis(job.url)
+
+        metrics = job.metrics
+        # Empreinte calculée pendant l'écriture, seulement si le stockage par contenu s'en sert
+        content_hash = ContentHash() if self.content_store else None
+        with self.ydl_pool.session(ydl_opts) as ydl:
+            # Une seule extraction (ou aucune avec une analyse), puis sélection du format
+            with metrics.phase('extraction'):
+                if analysis:
+                    raw_info = copy.deepcopy(analysis.info)
+                else:
+                    raw_info = ydl.extract_info(job.url, download=False, process=False)
+                if not raw_info or ydl._download_retcode:
+                    raise RuntimeError("yt-dlp a signalé une erreur de téléchargement")
+
+                # Le format classé est essayé en premier, le sélecteur habituel reste en secours.
+                # yt-dlp compile le sélecteur à la création de l'instance : on le remplace
+                # le temps de ce job (le téléchargement peut refaire la sélection)
+                format_spec = self.format_selector(job.quality, job.format_type).select(raw_info)
+                default_selector = ydl.format_selector
+                if format_spec:
+                    ydl.format_selector = ydl.build_format_selector(f"{format_spec}/{ydl.params['format']}")
+            try:
+                with metrics.phase('extraction'):
+                    info = ydl.process_ie_result(raw_info, download=False)
+                if not info or ydl._download_retcode:
+                    raise RuntimeError("yt-dlp a signalé une erreur de téléchargement")
+                job.check_control()
+
+                # Fichier déjà présent à destination (hors conversion audio) : rien à télécharger
+                existing = final_dir / os.path.basename(ydl.prepare_filename(info))
+                if job.format_type not in ('mp3', 'm4a') and existing.exists():
+                    self._record_download(job, variant, str(existing))
+                    return None
+
+                # Espace disque : la taille estimée est réservée avant le premier octet
+                self.disk.reserve(job.id, final_dir, self._estimated_disk_usage(info, job.format_type),
+                                  written=lambda: metrics.bytes, check=job.check_control)
+
+                with metrics.phase('transfer'):
+                    if info.get('requested_formats'):
+                        # Vidéo et audio séparés : fusion confiée à l'étape de post-traitement
+                        parts = self._download_parts(ydl, job, info)
+                        task = self.post_processing.merge_task(parts, ydl.prepare_filename(info))
+                    else:
+                        filename = self._transfer(ydl, job, info, downloaded, content_hash)
+                        task = None
+                        if job.format_type in ('mp3', 'm4a'):
+                            task = self.post_processing.audio_task(filename, job.format_type, info.get('acodec'))
+            finally:
+                ydl.format_selector = default_selector
+
+        if task is None:
+            digest = content_hash.hexdigest(os.path.getsize(filename)) if content_hash else None
+            self._record_download(job, variant, self._publish(job, filename, final_dir, staging_dir, digest))
+            return None
+
+        # Le Future renvoyé ne se termine qu'une fois le fichier final indexé
+        done = Future()
+        processing_start = time.perf_counter()
+
+        def on_processed(future):
+            metrics.add('postprocess', time.perf_counter() - processing_start)
+            try:
+                self._record_download(job, variant, self._publish(job, future.result(), final_dir, staging_dir))
+            except Exception as e:
+                done.set_exception(e)
             else:
-                ydl_opts['outtmpl'] = str(output_path / '%(title)s.%(ext)s')
-                ydl_opts['noplaylist'] = True
+                done.set_result(job.filename)
 
-            # Format
-            ydl_opts['format'] = self.get_format_selector(quality, format_type)
+        self.post_processing.submit(task).add_done_callback(on_processed)
+        return done
 
-            # Configuration audio pour MP3
-            if format_type == 'mp3':
-                ydl_opts.update({
-                    'format': 'bestaudio/best',
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'mp3',
-                        'preferredquality': '192',
-                    }],
-                })
-            elif format_type == 'm4a':
-                ydl_opts.update({
-                    'format': 'bestaudio[ext=m4a]/bestaudio/best',
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'm4a',
-                        'preferredquality': '192',
-                    }],
-                })
+    def pause(self, job):
+        """Met en pause un job (ou son ID) ; la connexion est libérée, le fichier partiel gardé"""
+        job = self._resolve_job(job)
+        return bool(job) and self.scheduler.pause(job)
+
+    def resume(self, job):
+        """Reprend un job en pause là où son fichier partiel s'est arrêté"""
+        job = self._resolve_job(job)
+        return bool(job) and self.scheduler.resume(job)
 
-            # Callback de progression
-            if progress_callback:
-                ydl_opts['progress_hooks'] = [progress_callback]
+    def cancel(self, job):
+        """Annule un job et supprime ses fichiers temporaires"""
+        job = self._resolve_job(job)
+        if not job or not self.scheduler.cancel(job):
+            return False
+        if job.status == DownloadJob.CANCELLED:
+            # Job qui n'était pas en cours : rien ne tourne, nettoyage immédiat
+            self.remove_partial_files(job)
+        return True
 
-            # Téléchargement
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+    def _resolve_job(self, job):
+        return self.scheduler.get(job) if isinstance(job, int) else job
 
-            return True
+    def remove_partial_files(self, job):
+        """Supprime les fichiers partiels, manifestes et fragments laissés par un job"""
+        for name in list(job.partial_files):
+            if not name:
+                continue
+            base = name[:-len('.part')] if name.endswith('.part') else name
+            candidates = {name, base + '.part', base + '.part.json', base + '.part.json.tmp', base + '.ytdl'}
+            candidates.update(glob.glob(glob.escape(base + '.part') + '-Frag*'))
+            for path in candidates:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            # Dossier temporaire du job, s'il ne contient plus rien
+            try:
+                os.rmdir(os.path.dirname(name))
+            except OSError:
+                pass
+        job.partial_files.clear()
+
+    def staging_dir(self, job, final_dir):
+        """Dossier temporaire du job, sur le même système de fichiers que `final_dir`
+
+        Le dossier `temp_dir` (à côté du journal par défaut) est utilisé s'il
+        est sur le même disque que la destination (le renommage final reste
+        atomique), sinon un dossier caché dans la destination. Le nom ne dépend que de la vidéo et de la
+        variante (ou de la ligne du journal) : un téléchargement interrompu
+        retrouve ses fichiers partiels, même après un redémarrage.
+        """
+        final_dir = Path(final_dir)
+        final_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            self.temp_dir.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            pass
+        path = self._staging_path(job, final_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        job.staging_dir = path
+        return path
+
+    def _staging_path(self, job, final_dir):
+        root = self.temp_dir
+        try:
+            if os.stat(root).st_dev != os.stat(final_dir).st_dev:
+                root = Path(final_dir) / '.temp'
+        except OSError:
+            root = Path(final_dir) / '.temp'
+        if job.video_id:
+            variant = re.sub(r'[^\w-]', '_', DownloadIndex.variant_for(job.quality, job.format_type))
+            video_id = job.video_id
+            if not re.fullmatch(r'[\w-]+', video_id):
+                # ID d'un autre site (« extracteur:ID », voire avec des « / ») : nom sûr sur tous
+                # les systèmes, l'empreinte évite que deux IDs nettoyés se confondent
+                digest = hashlib.sha1(video_id.encode('utf-8')).hexdigest()[:10]
+                video_id = re.sub(r'[^\w-]', '_', video_id)[:80] + '-' + digest
+            name = f"{video_id}-{variant}"
+        elif job.journal_id is not None:
+            name = f"job-{job.journal_id}"
+        else:
+            name = f"job-{os.getpid()}-{job.id}"
+        return Path(os.path.abspath(root / name))
+
+    def _final_dir(self, job):
+        final_dir = Path(job.output_path)
+        if job.subfolder:
+            final_dir = final_dir / job.subfolder
+        return final_dir
+
+    def _publish(self, job, filename, final_dir, staging_dir, digest=None):
+        """Déplace le fichier terminé du dossier temporaire vers la destination
+
+        Avec le stockage par contenu, le fichier y est aussi rangé sous son
+        empreinte. Seul le téléchargement segmenté la calcule pendant le
+        transfert : un fichier écrit par yt-dlp ou par ffmpeg (fusion,
+        conversion) est relu en entier, ce qui double les lectures disque.
+        """
+        target = Path(final_dir) / os.path.basename(filename)
+        os.replace(filename, target)
+        try:
+            os.rmdir(staging_dir)
+        except OSError:
+            pass
+
+        if self.content_store:
+            try:
+                job.digest = digest or ContentHash.file_digest(target)
+                self.store_for(job.output_path).add(target, job.digest)
+            except OSError as e:
+                print(f"Impossible de ranger {target} dans le stockage: {e}")
+        return str(target)
+
+    def store_for(self, output_path):
+        """Stockage par contenu d'un dossier de téléchargement (sur le même disque, pour les liens)
+
+        À sa première utilisation dans la session, le stockage est purgé des
+        contenus dont plus aucun fichier ne dépend (vidéos supprimées depuis).
+        """
+        root = os.path.abspath(output_path)
+        with self._stores_lock:
+            store = self._stores.get(root)
+            if store is None:
+                store = self._stores[root] = ContentStore(os.path.join(root, '.store'))
+                store.prune()
+        return store
+
+    def _link_existing(self, job, record):
+        """Place dans le dossier du job un lien vers une vidéo déjà téléchargée ailleurs"""
+        if not self.content_store or not record.get('digest'):
+            return record
+        target = self._final_dir(job) / os.path.basename(record['path'])
+        if target.exists() or self.store_for(job.output_path).link(
+                record['digest'], os.path.splitext(record['path'])[1], target):
+            job.digest = record['digest']
+            return dict(record, path=str(target))
+        return record
+
+    def _estimated_disk_usage(self, info, format_type):
+        """Octets à prévoir sur le disque pour un format résolu (0 si inconnu)
+
+        Une fusion ou une conversion écrit un second fichier avant de supprimer
+        les flux téléchargés : la taille compte alors double.
+        """
+        formats = info.get('requested_formats') or [info]
+        size = sum(f.get('filesize') or f.get('filesize_approx') or 0 for f in formats)
+        if info.get('requested_formats') or format_type in ('mp3', 'm4a'):
+            size *= 2
+        return size
+
+    def _record_download(self, job, variant, filename):
+        job.filename = filename
+        if job.video_id:
+            self.download_index.record(job.video_id, variant, os.path.abspath(filename), digest=job.digest)
+
+    def _transfer(self, ydl, job, info, downloaded, content_hash=None):
+        """Télécharge un format unique et renvoie le chemin du fichier obtenu
+
+        Les formats progressifs HTTP passent par le téléchargement segmenté
+        s'il est activé ; le reste (flux fragmentés, serveur sans Range) est
+        confié à yt-dlp avec les infos déjà résolues.
+        """
+        if self.segmented_downloader and info.get('protocol') in ('http', 'https') and info.get('url'):
+            filename = ydl.prepare_filename(info)
+            if os.path.exists(filename):
+                # Comme yt-dlp : un fichier déjà complet n'est pas retéléchargé
+                return filename
+            try:
+                return self.segmented_downloader.download(info['url'], filename,
+                                                          headers=info.get('http_headers'),
+                                                          progress_hook=job.update_progress,
+                                                          info_dict=info,
+                                                          throttle=self._throttle(job),
+                                                          metrics=job.metrics,
+                                                          content_hash=content_hash)
+            except RangeNotSupportedError:
+                pass
+
+        ydl.process_ie_result(info, download=True)
+        if ydl._download_retcode or not downloaded:
+            raise RuntimeError("yt-dlp a signalé une erreur de téléchargement")
+        return downloaded[-1]
+
+    def _throttle(self, job):
+        return lambda nbytes: self.bandwidth.consume(job.id, nbytes)
+
+    def _download_parts(self, ydl, job, info):
+        """Télécharge séparément les flux d'un format fusionné (sans les fusionner)"""
+        base = os.path.splitext(ydl.prepare_filename(info))[0]
+        parts = []
+        for fmt in info['requested_formats']:
+            part_info = dict(info)
+            part_info.pop('requested_formats', None)
+            part_info.update(fmt)
+            part = f"{base}.f{fmt['format_id']}.{fmt['ext']}"
+            # Flux intermédiaires : supprimés si le job est annulé
+            job.partial_files.add(part)
+            if not os.path.exists(part):
+                self._transfer_part(ydl, job, part_info, part)
+            parts.append(part)
+        return parts
+
+    def _transfer_part(self, ydl, job, part_info, part):
+        if self.segmented_downloader and part_info.get('protocol') in ('http', 'https'):
+            try:
+                self.segmented_downloader.download(part_info['url'], part,
+                                                   headers=part_info.get('http_headers'),
+                                                   progress_hook=job.update_progress,
+                                                   info_dict=part_info,
+                                                   throttle=self._throttle(job),
+                                                   metrics=job.metrics)
+                return
+            except RangeNotSupportedError:
+                pass
+
+        success, _ = ydl.dl(part, part_info)
+        if not success:
+            raise RuntimeError(f"échec du téléchargement du flux {part_info.get('format_id')}")
+
+    def iter_playlist_entries(self, url, start=1):
+        """Énumère une playlist au fil de l'eau, sans la charger entièrement en mémoire
+
+        Génère des entrées compactes à mesure que yt-dlp récupère les pages de
+        la playlist. `start` (à partir de 1) permet de reprendre une
+        énumération interrompue. Une URL de vidéo seule donne une entrée unique.
+        """
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',
+        }
+
+        with self.ydl_pool.session(ydl_opts) as ydl:
+            # process=False : les entrées restent un générateur paresseux
+            info = ydl.extract_info(url, download=False, process=False)
+
+            # Suivre les redirections (ex. watch?v=...&list=... vers la playlist)
+            for _ in range(5):
+                if not info or info.get('_type') not in ('url', 'url_transparent'):
+                    break
+                info = ydl.extract_info(info['url'], download=False, process=False,
+                                        ie_key=info.get('ie_key'))
+
+            if not info:
+                return
+
+            if info.get('_type', 'video') == 'video':
+                if start <= 1:
+                    yield self._compact_entry(info, 1, url, None)
+                return
+
+            entries = info.get('entries') or []
+            if isinstance(entries, load_yt_dlp().utils.PagedList):
+                entries = self._iter_paged_list(entries, start - 1)
+            else:
+                entries = itertools.islice(entries, start - 1, None)
+
+            for index, entry in enumerate(entries, start):
+                if not entry:
+                    continue
+                entry_url = entry.get('url') or entry.get('webpage_url')
+                if entry_url:
+                    yield self._compact_entry(entry, index, entry_url, info)
+
+    def iter_playlist_pages(self, url, start=1, page_size=50):
+        """Comme iter_playlist_entries(), mais par listes de `page_size` entrées"""
+        page = []
+        for entry in self.iter_playlist_entries(url, start):
+            page.append(entry)
+            if len(page) >= page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def _iter_paged_list(self, paged, offset, page_size=50):
+        """Parcourt un PagedList de yt-dlp tranche par tranche à partir de `offset`"""
+        while True:
+            chunk = paged.getslice(offset, offset + page_size)
+            if not chunk:
+                return
+            yield from chunk
+            offset += len(chunk)
+
+    def _compact_entry(self, entry, index, url, playlist):
+        return {
+            'index': index,
+            'id': entry.get('id'),
+            'title': entry.get('title'),
+            'url': url,
+            'duration': entry.get('duration'),
+            'playlist_id': playlist.get('id') if playlist else None,
+            'playlist_title': playlist.get('title') if playlist else None,
+            'playlist_count': playlist.get('playlist_count') if playlist else 1,
+        }
+
+    def submit(self, url, output_path, quality='720p', format_type='mp4', is_playlist=False,
+               progress_callback=None, playlist_start=1, stop_event=None):
+        """Planifie le téléchargement d'une URL et renvoie la liste des jobs créés
+
+        `url` peut aussi être un VideoAnalysis renvoyé par analyze(). Une
+        playlist est découpée en un job par vidéo, rangés dans un dossier au
+        nom de la playlist ; `playlist_start` permet de reprendre à une position.
+        Une fois `stop_event` levé, plus aucun job n'est créé.
+        """
+        output_path = Path(output_path)
+        output_path.mkdir(parents=True, exist_ok=True)
+
+        analysis = None
+        if isinstance(url, VideoAnalysis):
+            analysis = url
+            url = analysis.url
+
+        if not is_playlist:
+            job = DownloadJob(url, output_path, quality, format_type,
+                              progress_callback=progress_callback,
+                              analysis=analysis if analysis and not analysis.is_playlist else None,
+                              video_id=self.extract_video_id(url))
+            return [self._enqueue(job)]
+
+        # Les jobs partent page par page, sans attendre la fin de l'énumération,
+        # et l'index est consulté en une requête par page
+        jobs = []
+        subfolder = None
+        batch_id = self.journal.start_batch(url, output_path, quality, format_type, playlist_start)
+        for page in self.iter_playlist_pages(url, start=playlist_start):
+            if stop_event is not None and stop_event.is_set():
+                break
+            if page[0]['playlist_title'] and subfolder is None:
+                subfolder = self.sanitize_filename(page[0]['playlist_title'])
+
+            jobs.extend(self._submit_entries([(self.extract_video_id(entry['url']), entry['url'], entry['title'])
+                                              for entry in page],
+                                             output_path, quality, format_type, subfolder, progress_callback))
+            # Après un arrêt, l'énumération reprendra après cette page
+            self.journal.batch_progress(batch_id, page[-1]['index'] + 1)
+        self.journal.finish_batch(batch_id)
+        return jobs
+
+    def _submit_entries(self, entries, output_path, quality, format_type, subfolder, progress_callback=None):
+        """Planifie un job par entrée [(video_id, url, titre)], avec une seule requête à l'index"""
+        variant = DownloadIndex.variant_for(quality, format_type)
+        known = self.download_index.lookup_many([video_id for video_id, _, _ in entries], variant)
+        jobs = []
+        for video_id, url, title in entries:
+            job = DownloadJob(url, output_path, quality, format_type, subfolder=subfolder, title=title,
+                              progress_callback=progress_callback, video_id=video_id,
+                              index_record=known.get(video_id))
+            jobs.append(self._enqueue(job))
+        return jobs
+
+    def sync_playlist(self, url, output_path, quality='720p', format_type='mp4', progress_callback=None,
+                      stop_event=None, track_removals=False, newest_first=None, known_run=10, page_size=50):
+        """Synchronise une playlist : ne planifie que les vidéos absentes du dernier instantané
+
+        L'énumération (à plat) est comparée à l'instantané de la playlist pour
+        cette variante. Pour un flux trié du plus récent au plus ancien
+        (`newest_first`, déduit de l'URL par défaut : onglets d'une chaîne),
+        elle s'arrête après `known_run` entrées consécutives déjà vues lors
+        d'une synchronisation complète. `track_removals` impose une
+        énumération intégrale et note les vidéos disparues. Les vidéos dont
+        le téléchargement n'a pas abouti sont replanifiées.
+
+        Renvoie un dictionnaire : jobs, added, retried, removed, enumerated,
+        stopped_early.
+        """
+        output_path = Path(output_path)
+        output_path.mkdir(parents=True, exist_ok=True)
+        if isinstance(url, VideoAnalysis):
+            url = url.url
+        url = url.strip()
+        variant = DownloadIndex.variant_for(quality, format_type)
+        snapshots = self.playlist_snapshots
+        playlist, seen = snapshots.load(url, variant)
+        synced_at = playlist['synced_at'] if playlist else None
+        if newest_first is None:
+            newest_first = self.is_channel_url(url)
+        early_stop = newest_first and not track_removals and synced_at is not None
+
+        result = {'jobs': [], 'added': [], 'retried': [], 'removed': [], 'enumerated': 0,
+                  'stopped_early': False}
+        present = set()
+        title = None
+        # Dossier de la synchronisation précédente, si l'énumération ne donne rien
+        subfolder = self.sanitize_filename(playlist['title']) if playlist and playlist['title'] else None
+        run = 0
+
+        def on_done(job):
+            # Une vidéo supprimée ou privée n'est pas retentée à chaque synchronisation
+            if job.status == DownloadJob.FINISHED or job.failure == 'permanent':
+                snapshots.mark_done(url, variant, job.video_id)
+
+        def submit(entries):
+            jobs = self._submit_entries(entries, output_path, quality, format_type, subfolder, progress_callback)
+            for job in jobs:
+                job.add_done_callback(on_done)
+            result['jobs'].extend(jobs)
+
+        def flush(new):
+            # Inscrites avant d'être planifiées : un arrêt brutal les laisse en attente
+            snapshots.add(url, variant, new)
+            result['added'].extend(video_id for video_id, _, _ in new)
+            submit(new)
+
+        # Entrée par entrée : quitter la boucle referme la session yt-dlp,
+        # les pages suivantes de la playlist ne sont jamais demandées
+        new = []
+        for entry in self.iter_playlist_entries(url):
+            if stop_event is not None and stop_event.is_set():
+                return result
+            if title is None and entry['playlist_title']:
+                title = entry['playlist_title']
+                subfolder = self.sanitize_filename(title)
+
+            result['enumerated'] += 1
+            video_id = self.extract_video_id(entry['url']) or entry['id'] or entry['url']
+            present.add(video_id)
+            first_seen = seen.get(video_id)
+            if first_seen is None:
+                new.append((video_id, entry['url'], entry['title']))
+                seen[video_id] = time.time()
+                run = 0
+                if len(new) >= page_size:
+                    flush(new)
+                    new = []
+            elif early_stop and first_seen <= synced_at:
+                run += 1
+                if run >= known_run:
+                    result['stopped_early'] = True
+                    break
+            else:
+                run = 0
+        if new:
+            flush(new)
+
+        # Vidéos des synchronisations précédentes dont le téléchargement n'a pas abouti
+        added = set(result['added'])
+        retried = [entry for entry in snapshots.pending(url, variant) if entry[0] not in added]
+        if retried:
+            result['retried'] = [video_id for video_id, _, _ in retried]
+            submit(retried)
+        result['removed'] = snapshots.finish(url, variant, title, present if track_removals else None)
+        return result
+
+    def _enqueue(self, job, paused=False):
+        """Inscrit le job au journal puis le planifie"""
+        if job.journal_id is None:
+            self.journal.add(job)
+        return self.scheduler.submit(job, paused=paused)
+
+    def resume_interrupted(self, progress_callback=None):
+        """Replanifie les jobs et playlists laissés inachevés par une session précédente
+
+        Les jobs repartent de leurs fichiers partiels (dossier temporaire) ;
+        ceux qui étaient en pause le restent. L'énumération d'une playlist
+        interrompue reprend après la dernière page planifiée. Renvoie les jobs.
+        """
+        rows, batches = self.journal.claim_interrupted()
+        jobs = []
+        for row in rows:
+            job = DownloadJob(row['url'], row['output_path'], row['quality'], row['format_type'],
+                              subfolder=row['subfolder'], title=row['title'],
+                              progress_callback=progress_callback, video_id=row['video_id'])
+            job.journal_id = row['id']
+            job.attempts = row['attempts']
+            self.journal.track(job)
+            jobs.append(self._enqueue(job, paused=row['status'] == DownloadJob.PAUSED))
+
+        for batch in batches:
+            try:
+                jobs.extend(self.submit(batch['url'], batch['output_path'], batch['quality'], batch['format_type'],
+                                        is_playlist=True, progress_callback=progress_callback,
+                                        playlist_start=batch['next_index']))
+            except Exception as e:
+                print(f"Erreur lors de la reprise de la playlist {batch['url']}: {e}")
+        return jobs
+
+    def discard_interrupted(self):
+        """Abandonne le travail inachevé des sessions précédentes et supprime ses fichiers partiels"""
+        rows, _ = self.journal.claim_interrupted()
+        for row in rows:
+            job = DownloadJob(row['url'], row['output_path'], row['quality'], row['format_type'],
+                              subfolder=row['subfolder'], video_id=row['video_id'])
+            job.journal_id = row['id']
+            shutil.rmtree(self._staging_path(job, self._final_dir(job)), ignore_errors=True)
+            self.journal.mark(row['id'], DownloadJob.CANCELLED)
+        return len(rows)
+
+    def submit_many(self, urls, output_path, quality='720p', format_type='mp4', is_playlist=False,
+                    progress_callback=None, stop_event=None):
+        """Planifie plusieurs URLs d'un coup ; une URL en erreur n'empêche pas les suivantes"""
+        jobs = []
+        for url in urls:
+            if stop_event is not None and stop_event.is_set():
+                break
+            try:
+                jobs.extend(self.submit(url, output_path, quality, format_type, is_playlist,
+                                        progress_callback, stop_event=stop_event))
+            except Exception as e:
+                print(f"Erreur lors de la planification de {url}: {e}")
+        return jobs
+
+    def download(self, url, output_path, quality='720p', format_type='mp4', is_playlist=False, progress_callback=None,
+                 stop_event=None, sync=False, track_removals=False):
+        """Télécharge une vidéo ou playlist YouTube (URL, liste d'URLs ou résultat de analyze())
+
+        Avec `sync`, une playlist ne télécharge que ses nouvelles vidéos (voir sync_playlist).
+        """
+        try:
+            if is_playlist and sync:
+                jobs = []
+                for playlist_url in (url if isinstance(url, (list, tuple)) else [url]):
+                    jobs.extend(self.sync_playlist(playlist_url, output_path, quality, format_type, progress_callback,
+                                                   stop_event=stop_event, track_removals=track_removals)['jobs'])
+                self.scheduler.wait(jobs)
+                # Rien de nouveau dans la playlist : la synchronisation a réussi
+                return any(job.status == DownloadJob.FINISHED for job in jobs) or not jobs
+            if isinstance(url, (list, tuple)):
+                jobs = self.submit_many(url, output_path, quality, format_type, is_playlist, progress_callback,
+                                        stop_event=stop_event)
+            else:
+                jobs = self.submit(url, output_path, quality, format_type, is_playlist, progress_callback,
+                                   stop_event=stop_event)
+            self.scheduler.wait(jobs)
+
+            finished = [job for job in jobs if job.status == DownloadJob.FINISHED]
+            if is_playlist:
+                # Comme avant avec 'ignoreerrors', une vidéo indisponible ne fait pas échouer la playlist
+                return bool(finished)
+            return len(finished) == len(jobs) and bool(jobs)
 
         except Exception as e:
             print(f"Erreur lors du téléchargement: {e}")
             return False
 
+    def close(self):
+        """Arrête le planificateur, libère les sessions yt-dlp et ferme les bases locales
+
+        La session du journal est terminée : ses jobs inachevés sont
+        reprenables dès la session suivante, sans attendre l'expiration du
+        signal de vie.
+        """
+        self.scheduler.shutdown(wait=False)
+        self.post_processing.shutdown(wait=False)
+        self.ydl_pool.close()
+        self.thumbnails.close()
+        self.journal.close()
+        self.download_index.close()
+        self.playlist_snapshots.close()
+
     def get_playlist_info(self, url):
         """Récupère les informations détaillées d'une playlist"""
+        key = self._cache_key('playlist', url)
+        if key:
+            cached = self.metadata_cache.get(key)
+            if cached is not None:
+                return cached
+
+        result = self._fetch_playlist_info(url)
+        if key and result:
+            self.metadata_cache.put(key, result)
+        return result
+
+    def analyze_playlist(self, url, quality='720p', format_type='mp4', on_entry=None, max_workers=8,
+                         stop_event=None):
+        """Analyse une playlist en deux temps : énumération à plat, puis détail des vidéos en parallèle
+
+        Les vidéos sont connues dès l'énumération ; leur durée, leurs formats et
+        la taille estimée pour `quality`/`format_type` sont complétés par un
+        pool borné de threads. `on_entry(video)` est appelé (depuis le pool)
+        pour chaque vidéo complétée. Les analyses restent utilisables par
+        download(). Renvoie le dictionnaire de get_playlist_info(), détaillé.
+        """
+        selector = self.format_selector(quality, format_type)
+        # Analyses en attente bornées : l'énumération avance au rythme du pool
+        slots = threading.BoundedSemaphore(max_workers * 2)
+
+        def detail(video):
+            try:
+                if stop_event is not None and stop_event.is_set():
+                    return
+                analysis = self.analyze(video['url'])
+                if analysis:
+                    video.update({
+                        'title': analysis.summary['title'],
+                        'uploader': analysis.summary['uploader'],
+                        'duration': analysis.summary['duration_string'],
+                        'formats': analysis.summary['formats'],
+                        'analysed': True,
+                    })
+                if analysis and analysis.info:
+                    # Taille estimée : seulement avec les formats extraits (pas d'un résumé en cache)
+                    choices = selector.rank(analysis.info)
+                    video.update({
+                        'duration_seconds': analysis.info.get('duration'),
+                        'size': choices[0].estimated_size if choices else None,
+                    })
+                if on_entry is not None:
+                    on_entry(video)
+            finally:
+                slots.release()
+
         try:
-            ydl_opts = {
-                'quiet': True,
-                'extract_flat': True,
-                'playliststart': 1,
-                'playlistend': 100,  # Limiter pour éviter les très grosses playlists
+            playlist_title = None
+            videos = []
+            with self.metadata_cache.deferred(), \
+                    ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analyse') as executor:
+                for entry in self.iter_playlist_entries(url):
+                    if stop_event is not None and stop_event.is_set():
+                        break
+                    playlist_title = entry['playlist_title']
+                    video = {
+                        'index': entry['index'],
+                        'title': entry['title'] or 'Titre non disponible',
+                        'url': entry['url'],
+                        'duration': self.format_duration(entry['duration']),
+                        'duration_seconds': entry['duration'],
+                        'thumbnail': self.get_thumbnail_url(entry['id'], 'mqdefault') if entry['id'] else None,
+                        'formats': [],
+                        'size': None,
+                        'analysed': False,
+                    }
+                    videos.append(video)
+                    slots.acquire()
+                    executor.submit(detail, video)
+
+            if playlist_title is None:
+                return None
+
+            sizes = [video['size'] for video in videos]
+            return {
+                'playlist_title': playlist_title or 'Playlist sans titre',
+                'playlist_count': len(videos),
+                'videos': videos,
+                'total_duration': sum(video['duration_seconds'] or 0 for video in videos),
+                'estimated_size': sum(sizes) if sizes and all(sizes) else None,
             }
 
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+        except Exception as e:
+            print(f"Erreur lors de l'analyse de la playlist: {e}")
+            return None
 
-                if 'entries' in info:
-                    videos = []
-                    for entry in info['entries']:
-                        if entry:
-                            videos.append({
-                                'title': entry.get('title', 'Titre non disponible'),
-                                'url': entry.get('url', ''),
-                                'duration': self.format_duration(entry.get('duration', 0))
-                            })
-
-                    return {
-                        'playlist_title': info.get('title', 'Playlist sans titre'),
-                        'playlist_count': len(videos),
-                        'videos': videos
-                    }
+    def _fetch_playlist_info(self, url):
+        """Extrait les informations d'une playlist via yt-dlp (sans cache)"""
+        try:
+            playlist_title = None
+            videos = []
+            for entry in self.iter_playlist_entries(url):
+                playlist_title = entry['playlist_title']
+                videos.append({
+                    'title': entry['title'] or 'Titre non disponible',
+                    'url': entry['url'],
+                    'duration': self.format_duration(entry['duration'])
+                })
 
+            if playlist_title is None:
                 return None
 
+            return {
+                'playlist_title': playlist_title or 'Playlist sans titre',
+                'playlist_count': len(videos),
+                'videos': videos
+            }
+
         except Exception as e:
             print(f"Erreur lors de l'extraction de la playlist: {e}")
             return None
 
     def is_valid_url(self, url):
         """Vérifie si l'URL est une URL YouTube valide"""
-        youtube_regex = r'(https?://)?(www\.)?(youtube|youtu|youtube-nocookie)\.(com|be)/(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})'
+        youtube_regex = (r'(https?://)?(www\.)?(youtube|youtu|youtube-nocookie)\.(com|be)/'
+                         r'(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})')
         return re.match(youtube_regex, url) is not None
 
     def extract_video_id(self, url):
@@ -240,9 +3903,23 @@ class YouTubeDownloader:
         match = re.search(youtube_regex, url)
         return match.group(1) if match else None
 
-    def get_thumbnail_url(self, video_id):
-        """Retourne l'URL de la miniature de la vidéo"""
-        return f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
+    def extract_playlist_id(self, url):
+        """Extrait l'ID de la playlist depuis l'URL"""
+        match = re.search(r'[?&]list=([\w-]+)', url)
+        return match.group(1) if match else None
+
+    def is_channel_url(self, url):
+        """Indique si l'URL désigne une chaîne (ou un de ses onglets)
+
+        Une chaîne est listée de la vidéo la plus récente à la plus ancienne.
+        """
+        if self.extract_playlist_id(url):
+            return False
+        return re.search(r'youtube\.com/(@[^/?#]+|channel/|c/|user/)', url) is not None
+
+    def get_thumbnail_url(self, video_id, variant='maxresdefault'):
+        """Retourne l'URL de la miniature de la vidéo (variant : maxresdefault, hqdefault, mqdefault...)"""
+        return f"https://img.youtube.com/vi/{video_id}/{variant}.jpg"
 
     def check_ffmpeg(self):
         """Vérifie si FFmpeg est disponible"""
@@ -252,4 +3929,162 @@ class YouTubeDownloader:
                                     capture_output=True, text=True, timeout=5)
             return result.returncode == 0
         except:
-            return False
\ No newline at end of file
+            return False
+
+
+class AsyncProgressChannel:
+    """Canal du bus de progression lu depuis une boucle asyncio
+
+    Comme ProgressChannel.drain(), les rafales d'un même job sont fusionnées :
+    la mémoire reste bornée à un état par job quel que soit le rythme du
+    consommateur, et la boucle n'est réveillée qu'une fois par lot.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._latest = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self._scheduled = False
+
+    def put(self, event):
+        with self._lock:
+            self._latest[event['id']] = event
+            if self._scheduled:
+                return
+            self._scheduled = True
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass  # boucle fermée
+
+    async def get_batch(self):
+        """Attend et renvoie les derniers états arrivés"""
+        while True:
+            with self._lock:
+                if self._latest:
+                    batch = list(self._latest.values())
+                    self._latest.clear()
+                    self._scheduled = False
+                    self._wakeup.clear()
+                    return batch
+                self._scheduled = False
+                self._wakeup.clear()
+            await self._wakeup.wait()
+
+
+class AsyncDownloader:
+    """Façade asyncio de YouTubeDownloader
+
+    Les appels bloquants (extraction, planification) passent par un petit
+    pool de threads ; l'attente des téléchargements se fait par callbacks,
+    sans thread par job. `max_pending` borne le nombre d'appels à download()
+    en cours (au-delà, download() attend son tour), pas le nombre de jobs :
+    une playlist compte pour un appel. submit() n'est pas borné.
+
+        async with AsyncDownloader() as dl:
+            info = await dl.info(url)
+            jobs = await dl.download(url, 'telechargements')
+            async for event in dl.events():
+                ...
+    """
+
+    def __init__(self, downloader=None, max_pending=100, max_threads=4, **options):
+        self.downloader = downloader if downloader is not None else YouTubeDownloader(**options)
+        self.max_pending = max_pending
+        self._owns_downloader = downloader is None
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='async')
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def info(self, url, is_playlist=False):
+        """Informations résumées d'une vidéo ou playlist (comme get_video_info)"""
+        return await self._call(self.downloader.get_video_info, url, is_playlist)
+
+    async def analyze(self, url, is_playlist=False):
+        """VideoAnalysis réutilisable par download()"""
+        return await self._call(self.downloader.analyze, url, is_playlist)
+
+    async def analyze_playlist(self, url, quality='720p', format_type='mp4'):
+        """Playlist détaillée vidéo par vidéo (voir YouTubeDownloader.analyze_playlist)"""
+        return await self._call(self.downloader.analyze_playlist, url, quality, format_type)
+
+    async def submit(self, url, output_path, quality='720p', format_type='mp4', is_playlist=False):
+        """Planifie une vidéo ou playlist et renvoie ses jobs sans attendre leur fin
+
+        Si la coroutine est annulée pendant l'énumération d'une playlist,
+        l'énumération s'arrête et les jobs déjà créés sont annulés.
+        """
+        stop_event = threading.Event()
+        future = self._executor.submit(self.downloader.submit, url, output_path, quality, format_type,
+                                       is_playlist, stop_event=stop_event)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            stop_event.set()
+            future.add_done_callback(self._cancel_orphaned)
+            raise
+
+    def _cancel_orphaned(self, future):
+        """Annule les jobs d'un submit() dont la coroutine a été annulée"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        for job in future.result():
+            self.downloader.cancel(job)
+
+    async def wait(self, jobs):
+        """Attend la fin des jobs ; si la coroutine est annulée, les jobs le sont aussi"""
+        loop = asyncio.get_running_loop()
+        futures = [self._job_future(loop, job) for job in jobs]
+        try:
+            if futures:
+                await asyncio.gather(*futures)
+        except asyncio.CancelledError:
+            for job in jobs:
+                self.downloader.cancel(job)
+            raise
+        return jobs
+
+    async def download(self, url, output_path, quality='720p', format_type='mp4', is_playlist=False):
+        """Télécharge une vidéo ou playlist et renvoie ses jobs terminés
+
+        Les jobs ont un statut 'finished', 'failed' (voir job.error) ou 'cancelled'.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        async with self._semaphore:
+            jobs = await self.submit(url, output_path, quality, format_type, is_playlist)
+            return await self.wait(jobs)
+
+    async def events(self):
+        """Itérateur asynchrone des états de jobs publiés sur le bus de progression"""
+        channel = AsyncProgressChannel(asyncio.get_running_loop())
+        self.downloader.progress_bus.subscribe(channel)
+        try:
+            while True:
+                for event in await channel.get_batch():
+                    yield event
+        finally:
+            self.downloader.progress_bus.unsubscribe(channel)
+
+    def _job_future(self, loop, job):
+        future = loop.create_future()
+
+        def on_done(_job):
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(job))
+
+        job.add_done_callback(on_done)
+        return future
+
+    async def close(self):
+        if self._owns_downloader:
+            await self._call(self.downloader.close)
+        self._executor.shutdown(wait=False)
@@ -4,11 +4,30 @@ YouTube Downloader Pro - Script de démarrage
 Ce script vérifie les dépendances et lance l'application
 """
 
+import time
+
+# Instant de lancement, pour mesurer le temps de démarrage
+START_TIME = time.perf_counter()
+
 import sys
 import os
+import json
 import subprocess
 import importlib.util
 
+DEPENDENCIES = {
+    'customtkinter': 'customtkinter==5.2.2',
+    'yt_dlp': 'yt-dlp==2024.1.7',
+    'PIL': 'Pillow==10.2.0',
+    'requests': 'requests==2.31.0'
+}
+
+# Empreinte de la dernière vérification réussie des dépendances
+STAMP_FILE = os.path.join('cache', 'dependances.json')
+
+# Budget de temps entre le lancement et l'affichage de la fenêtre (--check-startup)
+STARTUP_BUDGET_MS = int(os.environ.get('YTDP_STARTUP_BUDGET_MS', '1500'))
+
 
 def check_dependency(module_name, install_name=None):
     """Vérifie si un module est installé"""
@@ -22,19 +41,70 @@ def check_dependency(module_name, install_name=None):
     return True
 
 
+def environment_key():
+    """Identifie l'interpréteur et les versions de dépendances demandées"""
+    return {
+        'executable': sys.executable,
+        'python': sys.version,
+        'dependencies': DEPENDENCIES,
+    }
+
+
+def package_dirs():
+    """Dossiers d'installation des dépendances (leur date change à chaque pip install)"""
+    dirs = set()
+    for module in DEPENDENCIES:
+        spec = importlib.util.find_spec(module)
+        if spec is not None and spec.origin:
+            # .../site-packages/<module>/__init__.py -> .../site-packages
+            dirs.add(os.path.dirname(os.path.dirname(spec.origin)))
+    return sorted(dirs)
+
+
+def read_dependency_stamp():
+    """Vérifie que l'empreinte enregistrée correspond toujours à l'environnement"""
+    try:
+        with open(STAMP_FILE, 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    if stamp.get('environment') != environment_key():
+        return False
+
+    for path, mtime in stamp.get('package_dirs', {}).items():
+        try:
+            if os.stat(path).st_mtime != mtime:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def write_dependency_stamp():
+    importlib.invalidate_caches()
+    stamp = {
+        'environment': environment_key(),
+        'package_dirs': {path: os.stat(path).st_mtime for path in package_dirs()},
+    }
+    try:
+        os.makedirs(os.path.dirname(STAMP_FILE), exist_ok=True)
+        with open(STAMP_FILE, 'w', encoding='utf-8') as f:
+            json.dump(stamp, f)
+    except OSError:
+        pass
+
+
 def install_missing_dependencies():
     """Installe automatiquement les dépendances manquantes"""
-    print("🔧 Installation des dépendances manquantes...")
+    if read_dependency_stamp():
+        print("✅ Dépendances déjà vérifiées")
+        return True
 
-    dependencies = {
-        'customtkinter': 'customtkinter==5.2.2',
-        'yt_dlp': 'yt-dlp==2024.1.7',
-        'PIL': 'Pillow==10.2.0',
-        'requests': 'requests==2.31.0'
-    }
+    print("🔧 Installation des dépendances manquantes...")
 
     missing_deps = []
-    for module, package in dependencies.items():
+    for module, package in DEPENDENCIES.items():
         if not check_dependency(module):
             missing_deps.append(package)
 
@@ -53,9 +123,11 @@ def install_missing_dependencies():
                 return False
 
         print("✅ Toutes les dépendances ont été installées!")
+        write_dependency_stamp()
         return True
     else:
         print("✅ Toutes les dépendances sont déjà installées")
+        write_dependency_stamp()
         return True
 
 
@@ -75,8 +147,15 @@ def create_folders():
         os.makedirs(folder, exist_ok=True)
 
 
+def elapsed_ms():
+    return (time.perf_counter() - START_TIME) * 1000
+
+
 def main():
     """Fonction principale"""
+    # --check-startup : mesure le temps d'affichage de la fenêtre puis quitte
+    check_startup = '--check-startup' in sys.argv[1:]
+
     print("🎥 YouTube Downloader Pro")
     print("=" * 40)
 
@@ -107,9 +186,27 @@ def main():
 
         # Créer et lancer l'application
         app = YouTubeDownloaderGUI()
+        startup = {}
+
+        def on_first_paint(event):
+            # <Map> arrive aussi pour chaque widget : seule la fenêtre principale compte
+            if event.widget is not app.root or 'ms' in startup:
+                return
+            # Fenêtre affichée à l'écran : les dessins en attente sont faits avant la mesure
+            app.root.update_idletasks()
+            startup['ms'] = elapsed_ms()
+            print(f"⏱️ Fenêtre affichée en {startup['ms']:.0f} ms (budget: {STARTUP_BUDGET_MS} ms)")
+            if check_startup:
+                app.root.after_idle(app.on_close)
+
+        # after_idle peut passer avant que la fenêtre soit affichée : on attend son <Map>
+        app.root.bind('<Map>', on_first_paint, add='+')
         print("✅ Application lancée avec succès!")
         app.run()
 
+        if check_startup:
+            return 0 if startup.get('ms', float('inf')) <= STARTUP_BUDGET_MS else 1
+
     except ImportError as e:
         print(f"❌ Erreur d'importation: {e}")
         print("💡 Vérifiez que tous les fichiers sont présents:")
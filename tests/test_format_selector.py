@@ -0,0 +1,101 @@
+"""
+Classement des formats (FormatSelector) sur des dictionnaires d'informations enregistrés
+
+Aucun accès réseau : les formats viennent de tests/fixtures/.
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moteur import FormatRecord, FormatSelector  # noqa: E402
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+MB = 1024 * 1024
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class FormatSelectorTest(unittest.TestCase):
+
+    def setUp(self):
+        # 213 s, H.264, VP9 et AV1 de 144p à 1080p ; tailles exactes, approchées ou absentes
+        self.info = load_fixture('video_av1.json')
+
+    def select(self, quality='720p', format_type='mp4', **options):
+        return FormatSelector(quality, format_type, **options).select(self.info)
+
+    def test_progressive_format_preferred_at_same_height(self):
+        self.assertEqual(self.select('720p'), '22')
+        self.assertEqual(self.select('360p'), '18')
+
+    def test_target_above_available_heights_takes_the_best(self):
+        self.assertEqual(self.select('1080p'), '137+140')
+        self.assertEqual(self.select('2160p'), '137+140')
+        self.assertEqual(self.select('best'), '137+140')
+
+    def test_missing_height_falls_back_below(self):
+        self.assertEqual(self.select('480p'), '18')
+
+    def test_container_and_audio_follow_format_type(self):
+        self.assertEqual(self.select('720p', 'webm'), '247+251')
+
+    def test_prefer_efficient_takes_the_smallest_file(self):
+        self.assertEqual(self.select('1080p', prefer_efficient=True), '399+140')
+        self.assertEqual(self.select('360p', prefer_efficient=True), '396+140')
+
+    def test_max_filesize_lowers_resolution(self):
+        self.assertEqual(self.select('1080p', max_filesize=20 * MB), '18')
+        choice = FormatSelector('1080p', 'mp4', max_filesize=20 * MB).rank(self.info)[0]
+        self.assertLessEqual(choice.estimated_size, 20 * MB)
+
+    def test_nothing_fits_takes_the_smallest_candidate(self):
+        self.assertEqual(self.select('1080p', max_filesize=1 * MB), '394+140')
+
+    def test_audio_formats(self):
+        self.assertEqual(self.select('720p', 'mp3'), '251')
+        # Pour m4a, le flux AAC évite un réencodage
+        self.assertEqual(self.select('720p', 'm4a'), '140')
+
+    def test_storyboards_are_ignored(self):
+        records = FormatSelector().records(self.info)
+        self.assertNotIn('sb0', [record.format_id for record in records])
+
+    def test_size_estimated_from_bitrate_and_duration(self):
+        fmt = next(f for f in self.info['formats'] if f['format_id'] == '22')
+        record = FormatRecord(fmt, self.info['duration'])
+        self.assertTrue(record.size_is_estimate)
+        self.assertEqual(record.filesize, int(1310.9 * 1000 / 8 * 213))
+
+        approx = next(f for f in self.info['formats'] if f['format_id'] == '398')
+        self.assertEqual(FormatRecord(approx, self.info['duration']).filesize, approx['filesize_approx'])
+
+    def test_no_formats(self):
+        self.assertIsNone(FormatSelector().select({'formats': []}))
+
+
+class BenchmarkFixtureTest(unittest.TestCase):
+    """Même classement sur la vidéo enregistrée des benchmarks"""
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(FIXTURES_DIR), os.pardir, 'benchmarks', 'fixtures', 'video.json')
+        with open(path, 'r', encoding='utf-8') as f:
+            self.info = json.load(f)
+
+    def test_selection(self):
+        self.assertEqual(FormatSelector('720p', 'mp4').select(self.info), '136+140')
+        self.assertEqual(FormatSelector('360p', 'mp4').select(self.info), '18')
+        self.assertEqual(FormatSelector('720p', 'mp4', prefer_efficient=True).select(self.info), '247+140')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Téléchargement segmenté (SegmentedDownloader) contre le serveur local des benchmarks
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from moteur import RangeNotSupportedError, SegmentedDownloader  # noqa: E402
+from serveur_local import MediaHandler, MediaServer  # noqa: E402
+
+
+SEGMENT = 64 * 1024
+
+
+class IgnoringRangeHandler(MediaHandler):
+    """Serveur qui ignore l'en-tête Range : toujours 200 et le fichier entier"""
+
+    def _serve(self, send_body):
+        del self.headers['Range']
+        super()._serve(send_body)
+
+
+class ProbeOnlyRangeHandler(MediaHandler):
+    """Serveur qui répond 206 à la sonde (octet 0) mais 200 aux vraies plages"""
+
+    def _serve(self, send_body):
+        if self.headers.get('Range') != 'bytes=0-0':
+            del self.headers['Range']
+        super()._serve(send_body)
+
+
+class Interrupted(Exception):
+    pass
+
+
+class SegmentedDownloaderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MediaServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='ytdp-test-')
+        self.server.httpd.RequestHandlerClass = MediaHandler
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def expected(self, url):
+        with urllib.request.urlopen(url) as response:
+            return response.read()
+
+    def download(self, name, size, **options):
+        url = self.server.media_url(name, size)
+        filename = os.path.join(self.tmp, name)
+        downloader = SegmentedDownloader(connections=3, segment_size=SEGMENT, **options)
+        return url, filename, downloader
+
+    def test_segment_boundaries(self):
+        for size in (1, SEGMENT - 1, SEGMENT, SEGMENT + 1, 5 * SEGMENT, 5 * SEGMENT + 17):
+            with self.subTest(size=size):
+                url, filename, downloader = self.download(f'bornes-{size}.mp4', size)
+                self.assertEqual(downloader.download(url, filename), filename)
+                with open(filename, 'rb') as f:
+                    self.assertEqual(f.read(), self.expected(url))
+                self.assertFalse(os.path.exists(filename + '.part'))
+                self.assertFalse(os.path.exists(filename + '.part.json'))
+
+    def test_server_ignoring_range(self):
+        self.server.httpd.RequestHandlerClass = IgnoringRangeHandler
+        url, filename, downloader = self.download('sans-plages.mp4', 3 * SEGMENT)
+        with self.assertRaises(RangeNotSupportedError):
+            downloader.download(url, filename)
+        # Refusé dès la sonde : rien n'a été écrit
+        self.assertFalse(os.path.exists(filename + '.part'))
+
+    def test_server_ignoring_range_after_probe(self):
+        self.server.httpd.RequestHandlerClass = ProbeOnlyRangeHandler
+        url, filename, downloader = self.download('plages-refusees.mp4', 3 * SEGMENT)
+        with self.assertRaises(RangeNotSupportedError):
+            downloader.download(url, filename)
+        self.assertFalse(os.path.exists(filename))
+
+    def test_resume_after_interrupted_segment(self):
+        size = 8 * SEGMENT + 100
+        url, filename, downloader = self.download('reprise.mp4', size, chunk_size=16 * 1024)
+        received = [0]
+
+        def interrupt(n):
+            # Arrêt au milieu d'un segment, après quelques segments complets
+            received[0] += n
+            if received[0] >= 3 * SEGMENT + SEGMENT // 2:
+                raise Interrupted()
+
+        with self.assertRaises(Interrupted):
+            downloader.download(url, filename, throttle=interrupt)
+        with open(filename + '.part.json', 'r', encoding='utf-8') as f:
+            done = set(json.load(f)['done'])
+        self.assertTrue(done)
+        self.assertLess(len(done), 9)
+
+        expected = self.expected(url)
+        requests = self.server.requests
+        self.assertEqual(downloader.download(url, filename), filename)
+        # La sonde, puis uniquement les segments manquants (le segment interrompu compris)
+        self.assertEqual(self.server.requests - requests, 1 + 9 - len(done))
+        with open(filename, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        self.assertFalse(os.path.exists(filename + '.part.json'))
+
+
+if __name__ == '__main__':
+    unittest.main()